@@ -0,0 +1,85 @@
+"""Measure event-loop lag for sync vs async DB access inside async handlers.
+
+Simulates `--concurrency` async handlers, each running `--queries` slow
+queries (`SELECT pg_sleep(--query-seconds)`), first with the sync
+SessionLocal called directly on the loop (what the async routes used to do)
+and then with AsyncSessionLocal. A ticker task sleeps `--tick` seconds in a
+loop and records how late it wakes up: that delay is the lag every other
+request and Gemini await would see.
+
+Usage:
+    python benchmarks/event_loop_lag.py --concurrency 20 --queries 10
+"""
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from sqlalchemy import text
+from database.db import SessionLocal, AsyncSessionLocal, async_engine
+
+
+async def measure_lag(tick: float, samples: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(tick)
+        samples.append(time.perf_counter() - start - tick)
+
+
+async def sync_handler(queries: int, query_seconds: float):
+    with SessionLocal() as db:
+        for _ in range(queries):
+            db.execute(text("SELECT pg_sleep(:s)"), {"s": query_seconds})
+
+
+async def async_handler(queries: int, query_seconds: float):
+    async with AsyncSessionLocal() as db:
+        for _ in range(queries):
+            await db.execute(text("SELECT pg_sleep(:s)"), {"s": query_seconds})
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))] if ordered else 0.0
+
+
+async def run(label: str, handler, args) -> dict:
+    samples, stop = [], asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(args.tick, samples, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*[handler(args.queries, args.query_seconds) for _ in range(args.concurrency)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    return {
+        "mode": label,
+        "wall_time_s": round(elapsed, 2),
+        "lag_p50_ms": round(percentile(samples, 0.50) * 1000, 1),
+        "lag_p99_ms": round(percentile(samples, 0.99) * 1000, 1),
+        "lag_max_ms": round(max(samples, default=0.0) * 1000, 1),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=10)
+    parser.add_argument("--query-seconds", type=float, default=0.02)
+    parser.add_argument("--tick", type=float, default=0.01)
+    args = parser.parse_args()
+
+    results = [
+        await run("sync session", sync_handler, args),
+        await run("async session", async_handler, args),
+    ]
+
+    print(f"\n{'mode':<16}{'wall(s)':>10}{'lag p50(ms)':>14}{'lag p99(ms)':>14}{'lag max(ms)':>14}")
+    for r in results:
+        print(f"{r['mode']:<16}{r['wall_time_s']:>10}{r['lag_p50_ms']:>14}{r['lag_p99_ms']:>14}{r['lag_max_ms']:>14}")
+
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""Serial vs concurrent vs batched Facebook publishing against the fake Graph API.
+
+Starts benchmarks/fake_graph_api.py in-process, then publishes:
+
+- serially with blocking requests.post, the way run_daily_schedule used to
+  (timed on `--serial-sample` posts and extrapolated to `--posts`)
+- all `--posts` through FacebookPublisher.publish_many (one call per post)
+- all `--posts` through FacebookPublisher.publish_batch (50 per call)
+
+Usage:
+    python benchmarks/facebook_publish.py --posts 1000 --latency 0.2 --throttle-rate 0.02
+"""
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+import requests
+from benchmarks.fake_graph_api import create_app, start_server
+from services.facebook_publisher import FacebookPublisher, PublishItem
+
+
+def publish_serially(url: str, count: int) -> int:
+    ok = 0
+    with requests.Session() as session:
+        for i in range(count):
+            response = session.post(f"{url}/page/feed", data={"message": f"post {i}", "access_token": "token"})
+            ok += response.status_code == 200
+    return ok
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=1000)
+    parser.add_argument("--serial-sample", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--page-rps", type=float, default=50)
+    parser.add_argument("--port", type=int, default=8090)
+    args = parser.parse_args()
+
+    app = create_app(args.latency, args.throttle_rate)
+    server = await start_server(app, args.port)
+    url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        start = time.perf_counter()
+        serial_ok = await asyncio.to_thread(publish_serially, url, args.serial_sample)
+        serial_time = (time.perf_counter() - start) * args.posts / args.serial_sample
+
+        items = [
+            PublishItem(i, f"post {i}", f"page{i % args.pages}", f"token{i % args.pages}")
+            for i in range(args.posts)
+        ]
+        runs = []
+        for label, method in (("publisher", "publish_many"), ("batched publisher", "publish_batch")):
+            publisher = FacebookPublisher(
+                graph_url=url, concurrency=args.concurrency,
+                page_rps=args.page_rps, token_rps=args.page_rps, retry_base=0.2, retry_max=2,
+            )
+            start = time.perf_counter()
+            results = await getattr(publisher, method)(items)
+            runs.append((label, sum(r.ok for r in results), time.perf_counter() - start, publisher.stats()))
+            await publisher.aclose()
+    finally:
+        server.should_exit = True
+        await server.task
+
+    print(f"\n{'mode':<22}{'posts':>8}{'ok':>8}{'time(s)':>10}{'speedup':>10}")
+    print(f"{'serial (extrapolated)':<22}{args.posts:>8}{'-':>8}{serial_time:>10.1f}{'1.0x':>10}")
+    for label, ok, elapsed, _ in runs:
+        print(f"{label:<22}{args.posts:>8}{ok:>8}{elapsed:>10.1f}{serial_time / elapsed:>9.1f}x")
+    print(f"\nserial sample: {serial_ok}/{args.serial_sample} ok; http calls: {app.state.batches} batch")
+    for label, _, _, stats in runs:
+        print(f"{label}: {stats}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
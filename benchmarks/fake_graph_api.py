@@ -0,0 +1,118 @@
+"""Local stand-in for the Facebook Graph API feed endpoint.
+
+POST /{page_id}/feed sleeps `--latency` seconds and returns {"id": ...}.
+POST / implements the batch contract: a JSON `batch` of up to 50
+{"method", "relative_url", "body"} requests answered, in order, with
+{"code", "body"} entries after a single `--latency` sleep.
+
+A fraction `--throttle-rate` of posts, plus every post beyond `--page-rps`
+per page in a one-second window, get the Graph "page request limit reached"
+error (code 32) so retry and rate-limit handling can be exercised.
+
+Usage:
+    python benchmarks/fake_graph_api.py --port 8090 --latency 0.2
+    FACEBOOK_GRAPH_URL=http://127.0.0.1:8090 python -m worker
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import itertools
+from collections import defaultdict
+from urllib.parse import parse_qs
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def create_app(latency: float = 0.2, throttle_rate: float = 0.0, page_rps: float = 0.0) -> FastAPI:
+    app = FastAPI()
+    ids = itertools.count(1)
+    windows = defaultdict(lambda: [0.0, 0])
+    app.state.calls = 0
+    app.state.batches = 0
+    app.state.throttled = 0
+
+    def post_to_feed(page_id: str):
+        """(status, body) for one feed post, applying the throttling rules."""
+        window = windows[page_id]
+        now = time.monotonic()
+        if now - window[0] >= 1.0:
+            window[0], window[1] = now, 0
+        window[1] += 1
+        if (page_rps and window[1] > page_rps) or random.random() < throttle_rate:
+            app.state.throttled += 1
+            return 400, {"error": {"message": "(#32) Page request limit reached", "code": 32, "is_transient": True}}
+        return 200, {"id": f"{page_id}_{next(ids)}"}
+
+    def missing_token():
+        return JSONResponse({"error": {"message": "An access token is required", "code": 104}}, status_code=400)
+
+    @app.post("/{page_id}/feed")
+    async def feed(page_id: str, request: Request):
+        app.state.calls += 1
+        form = await request.form()
+        if not form.get("access_token"):
+            return missing_token()
+        status, body = post_to_feed(page_id)
+        if status == 200:
+            await asyncio.sleep(latency)
+        return JSONResponse(body, status_code=status)
+
+    @app.post("/")
+    async def batch(request: Request):
+        app.state.batches += 1
+        form = await request.form()
+        if not form.get("access_token"):
+            return missing_token()
+        try:
+            batch_requests = json.loads(form.get("batch") or "")
+        except ValueError:
+            batch_requests = None
+        if not isinstance(batch_requests, list) or not batch_requests or len(batch_requests) > 50:
+            return JSONResponse(
+                {"error": {"message": "(#100) The batch parameter must be a JSON array of 1-50 requests", "code": 100}},
+                status_code=400,
+            )
+
+        responses = []
+        for item in batch_requests:
+            app.state.calls += 1
+            parts = str(item.get("relative_url", "")).strip("/").split("/")
+            message = parse_qs(item.get("body", "")).get("message")
+            if item.get("method") != "POST" or len(parts) != 2 or parts[1] != "feed" or not message:
+                status, body = 400, {"error": {"message": "(#100) Unsupported request", "code": 100}}
+            else:
+                status, body = post_to_feed(parts[0])
+            responses.append({"code": status, "body": json.dumps(body)})
+        await asyncio.sleep(latency)
+        return responses
+
+    return app
+
+
+async def start_server(app: FastAPI, port: int) -> uvicorn.Server:
+    """Serve `app` on the running loop; stop with `server.should_exit = True`."""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    server.task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--page-rps", type=float, default=0.0)
+    args = parser.parse_args()
+    app = create_app(args.latency, args.throttle_rate, args.page_rps)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="info")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
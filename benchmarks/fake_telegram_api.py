@@ -0,0 +1,121 @@
+"""Local stand-in for the Telegram Bot API (sendMessage and getUpdates).
+
+POST /bot{token}/sendMessage sleeps `--latency` seconds and returns
+{"ok": true, "result": {...}}. Like Telegram, it answers 429 with
+{"parameters": {"retry_after": N}} when the bot exceeds `--global-rps`
+messages per second, or one chat exceeds `--chat-rps`. Sliding one-second
+windows are used for both.
+
+POST /bot{token}/getUpdates long-polls the updates queued through
+POST /updates (or app.state.push_update), honouring offset, limit and
+timeout, so TELEGRAM_MODE=polling can be load tested locally.
+
+Usage:
+    python benchmarks/fake_telegram_api.py --port 8091
+    TELEGRAM_API_URL=http://127.0.0.1:8091 TELEGRAM_BOT_TOKEN=test uvicorn main:app
+"""
+import sys
+import time
+import asyncio
+import argparse
+import itertools
+from collections import defaultdict, deque
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def create_app(latency: float = 0.05, global_rps: float = 30, chat_rps: float = 1,
+               retry_after: int = 1) -> FastAPI:
+    app = FastAPI()
+    ids = itertools.count(1)
+    sent = deque()
+    per_chat = defaultdict(deque)
+    app.state.calls = 0
+    app.state.delivered = 0
+    app.state.throttled = 0
+    app.state.delivered_by_chat = defaultdict(list)
+    updates = []
+    update_ids = itertools.count(1)
+    arrived = asyncio.Event()
+
+    def push_update(update: dict) -> dict:
+        update = {"update_id": next(update_ids), **update}
+        updates.append(update)
+        arrived.set()
+        return update
+
+    app.state.push_update = push_update
+
+    def over_limit(window: deque, limit: float, now: float) -> bool:
+        while window and now - window[0] >= 1.0:
+            window.popleft()
+        return len(window) >= limit
+
+    @app.post("/bot{token}/sendMessage")
+    async def send_message(token: str, request: Request):
+        app.state.calls += 1
+        body = await request.json()
+        chat_id, text = body.get("chat_id"), body.get("text")
+        if not chat_id or not text:
+            return JSONResponse(
+                {"ok": False, "error_code": 400, "description": "Bad Request: chat_id and text are required"},
+                status_code=400,
+            )
+        now = time.monotonic()
+        chat_window = per_chat[str(chat_id)]
+        if over_limit(sent, global_rps, now) or over_limit(chat_window, chat_rps, now):
+            app.state.throttled += 1
+            return JSONResponse(
+                {"ok": False, "error_code": 429, "description": f"Too Many Requests: retry after {retry_after}",
+                 "parameters": {"retry_after": retry_after}},
+                status_code=429,
+            )
+        sent.append(now)
+        chat_window.append(now)
+        await asyncio.sleep(latency)
+        app.state.delivered += 1
+        app.state.delivered_by_chat[str(chat_id)].append(text)
+        return {"ok": True, "result": {"message_id": next(ids), "chat": {"id": chat_id}, "text": text}}
+
+    @app.post("/bot{token}/getUpdates")
+    async def get_updates(token: str, request: Request):
+        body = await request.json()
+        offset, limit = body.get("offset"), min(int(body.get("limit", 100)), 100)
+        if offset is not None:
+            # Everything below the offset is confirmed and forgotten
+            updates[:] = [u for u in updates if u["update_id"] >= offset]
+        if not updates and body.get("timeout"):
+            arrived.clear()
+            try:
+                await asyncio.wait_for(arrived.wait(), timeout=float(body["timeout"]))
+            except asyncio.TimeoutError:
+                pass
+        return {"ok": True, "result": updates[:limit]}
+
+    @app.post("/bot{token}/deleteWebhook")
+    async def delete_webhook(token: str):
+        return {"ok": True, "result": True}
+
+    @app.post("/updates")
+    async def queue_update(request: Request):
+        """Queue an update ({"message": {...}}) for getUpdates; update_id is assigned here."""
+        return push_update(await request.json())
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--global-rps", type=float, default=30)
+    parser.add_argument("--chat-rps", type=float, default=1)
+    args = parser.parse_args()
+    app = create_app(args.latency, args.global_rps, args.chat_rps)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="info")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""Compare per-item fan-out with batched post generation.
+
+Runs process_with_semaphore twice over the same content plan (once with
+batch_size=1, once with the requested batch size) and reports wall time,
+Gemini request count and prompt/output tokens for each run.
+
+Usage:
+    python benchmarks/post_generation.py --items 30 --batch-size 5
+    python benchmarks/post_generation.py --theme-id 12 --batch-size 5
+"""
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from services.content_generator import process_with_semaphore
+from services.gemini_client import gemini_clients, API_KEY
+
+
+def synthetic_plan(num_items: int) -> dict:
+    return {
+        "items": [
+            {
+                "goal": "Truyền cảm hứng sống chậm",
+                "title": f"Buổi sáng thứ {i + 1} bên tách trà",
+                "format": "Storytelling",
+                "content_idea": "Một người trẻ tìm lại nhịp sống chậm qua thói quen pha trà mỗi sáng.",
+                "hook_suggestions": "Có bao lâu rồi bạn chưa ngồi yên năm phút?",
+            }
+            for i in range(num_items)
+        ]
+    }
+
+
+def load_theme(theme_id: int):
+    from database.db import SessionLocal
+    from database.models import Theme, Campaign
+    with SessionLocal() as db:
+        theme = db.query(Theme).filter(Theme.id == theme_id).first()
+        if not theme:
+            raise SystemExit(f"Theme {theme_id} not found")
+        campaign = db.query(Campaign).filter(Campaign.id == theme.campaign_id).first()
+        return theme.title, theme.story, campaign.description if campaign else "", theme.content_plan
+
+
+def usage_snapshot() -> dict:
+    return gemini_clients.stats().get(API_KEY, {"total_calls": 0, "prompt_tokens": 0, "output_tokens": 0})
+
+
+async def run(label: str, batch_size: int, theme_title, theme_story, campaign_desc, content_plan) -> dict:
+    before = usage_snapshot()
+    start = time.perf_counter()
+    posts = await process_with_semaphore(theme_title, theme_story, campaign_desc, content_plan, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    after = usage_snapshot()
+    return {
+        "mode": label,
+        "posts": len(posts),
+        "wall_time_s": round(elapsed, 2),
+        "requests": after["total_calls"] - before["total_calls"],
+        "prompt_tokens": after["prompt_tokens"] - before["prompt_tokens"],
+        "output_tokens": after["output_tokens"] - before["output_tokens"],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=30)
+    parser.add_argument("--batch-size", type=int, default=5)
+    parser.add_argument("--theme-id", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.theme_id:
+        theme_title, theme_story, campaign_desc, content_plan = load_theme(args.theme_id)
+    else:
+        theme_title = "Slow Start"
+        theme_story = "Mỗi ngày bắt đầu chậm lại một chút để sống trọn vẹn hơn."
+        campaign_desc = "Thương hiệu trà thảo mộc cho người trẻ bận rộn ở thành phố."
+        content_plan = synthetic_plan(args.items)
+
+    results = [
+        await run("fan-out", 1, theme_title, theme_story, campaign_desc, content_plan),
+        await run(f"batched(k={args.batch_size})", args.batch_size, theme_title, theme_story, campaign_desc, content_plan),
+    ]
+
+    print(f"\n{'mode':<16}{'posts':>7}{'wall(s)':>10}{'requests':>10}{'prompt_tok':>12}{'output_tok':>12}")
+    for r in results:
+        print(f"{r['mode']:<16}{r['posts']:>7}{r['wall_time_s']:>10}{r['requests']:>10}{r['prompt_tokens']:>12}{r['output_tokens']:>12}")
+
+    await gemini_clients.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
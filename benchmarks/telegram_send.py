@@ -0,0 +1,103 @@
+"""Unpaced vs paced Telegram broadcasts against the fake Bot API.
+
+Starts benchmarks/fake_telegram_api.py in-process and sends a BULK
+broadcast of `--messages` notifications spread over `--chats` chats:
+
+- unpaced: every message posted at once, the way send_telegram_message
+  used to, so 429s are only logged and the message is lost
+- paced: the same broadcast through TelegramSender, plus `--replies`
+  INTERACTIVE replies submitted halfway through, to show they overtake it
+
+Usage:
+    python benchmarks/telegram_send.py --messages 300 --chats 50
+"""
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from benchmarks.fake_graph_api import start_server
+from benchmarks.fake_telegram_api import create_app
+from services.http_clients import http_clients, TELEGRAM
+from services.telegram_sender import TelegramSender, INTERACTIVE, BULK
+
+
+async def send_unpaced(url: str, messages) -> int:
+    client = http_clients.get(TELEGRAM)
+
+    async def post(chat_id, text):
+        response = await client.post(f"{url}/sendMessage", json={"chat_id": chat_id, "text": text})
+        return response.status_code == 200
+
+    return sum(await asyncio.gather(*[post(chat_id, text) for chat_id, text in messages]))
+
+
+async def send_paced(sender: TelegramSender, messages, replies: int, chats: int):
+    start = time.perf_counter()
+    broadcast = [asyncio.create_task(sender.send(chat_id, {"text": text}, priority=BULK))
+                 for chat_id, text in messages]
+    await asyncio.sleep(0.5)
+
+    async def reply(i):
+        submitted = time.perf_counter()
+        result = await sender.send(f"chat{i % chats}", {"text": f"reply {i}"}, priority=INTERACTIVE)
+        return result.ok, time.perf_counter() - submitted
+
+    reply_results = await asyncio.gather(*[reply(i) for i in range(replies)])
+    results = await asyncio.gather(*broadcast)
+    return sum(r.ok for r in results), time.perf_counter() - start, reply_results
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--replies", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--global-rps", type=float, default=30)
+    parser.add_argument("--chat-rps", type=float, default=1)
+    parser.add_argument("--port", type=int, default=8091)
+    args = parser.parse_args()
+
+    messages = [(f"chat{i % args.chats}", f"notice {i}") for i in range(args.messages)]
+    url = f"http://127.0.0.1:{args.port}/bottest"
+    rows = []
+    try:
+        app = create_app(args.latency, args.global_rps, args.chat_rps)
+        server = await start_server(app, args.port)
+        start = time.perf_counter()
+        ok = await send_unpaced(url, messages)
+        rows.append(("unpaced", ok, time.perf_counter() - start, app.state.throttled, None))
+        server.should_exit = True
+        await server.task
+
+        app = create_app(args.latency, args.global_rps, args.chat_rps)
+        server = await start_server(app, args.port)
+        # Stay a little under the server's limits so clock skew between the two doesn't cause 429s
+        sender = TelegramSender(base_url=url, global_rps=args.global_rps * 0.95,
+                                chat_rps=args.chat_rps * 0.95, max_attempts=5)
+        await sender.start()
+        ok, elapsed, replies = await send_paced(sender, messages, args.replies, args.chats)
+        rows.append(("paced", ok, elapsed, app.state.throttled, replies))
+        notices = [[t for t in texts if t.startswith("notice")] for texts in app.state.delivered_by_chat.values()]
+        ordered = all(texts == sorted(texts, key=lambda t: int(t.split()[-1])) for texts in notices)
+        stats = sender.stats()
+        await sender.stop()
+        server.should_exit = True
+        await server.task
+    finally:
+        await http_clients.aclose()
+
+    print(f"\n{'mode':<10}{'messages':>10}{'delivered':>11}{'429s':>7}{'time(s)':>10}{'msg/s':>8}")
+    for label, ok, elapsed, throttled, _ in rows:
+        print(f"{label:<10}{args.messages:>10}{ok:>11}{throttled:>7}{elapsed:>10.1f}{ok / elapsed:>8.1f}")
+    latencies = sorted(latency for _, latency in rows[-1][4])
+    print(f"\ninteractive replies: {sum(ok for ok, _ in rows[-1][4])}/{args.replies} ok, "
+          f"max latency {latencies[-1]:.2f}s while the broadcast was draining")
+    print(f"per-chat order preserved: {ordered}")
+    print(f"sender: {stats}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,5 +1,8 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from sqlalchemy.ext.declarative import declarative_base
 from dotenv import load_dotenv
 import os
@@ -8,12 +11,24 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Sync engine: the remaining def routes and scripts
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Async engine: besides async routes, each process's job worker runs a poll
+# loop per job type (5) and a lease heartbeat, and the notification
+# dispatcher drains the outbox; these check connections out at the same
+# time, so the steady pool covers them with room for requests and running
+# jobs. Size DB_* x processes below the server's max_connections.
+ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", "10"))
+ASYNC_DB_MAX_OVERFLOW = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "10"))
+
 engine = create_engine(
     DATABASE_URL,
     pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10,
-    pool_timeout=30,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
     pool_recycle=1800,
     connect_args={
         "sslmode": "require",
@@ -27,6 +42,43 @@ engine = create_engine(
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+
+def async_database_url(url: str):
+    """Point DATABASE_URL at asyncpg; libpq-only query options like sslmode are dropped."""
+    url = make_url(url)
+    return url.set(drivername="postgresql+asyncpg").difference_update_query(["sslmode"])
+
+
+# Async engine for async def handlers and background jobs, so queries
+# don't block the event loop.
+async_engine = create_async_engine(
+    async_database_url(DATABASE_URL),
+    pool_pre_ping=True,
+    pool_size=ASYNC_DB_POOL_SIZE,
+    max_overflow=ASYNC_DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=1800,
+    connect_args={
+        "ssl": "require",
+        "timeout": 10
+    }
+)
+# Advisory-lock leaders (campaign scheduler, Telegram poller) hold one
+# connection each for as long as they lead. They get their own unpooled
+# engine so they never take a slot from async_engine's pool, and closing
+# the connection is guaranteed to drop the session lock.
+leader_engine = create_async_engine(
+    async_database_url(DATABASE_URL),
+    poolclass=NullPool,
+    connect_args={
+        "ssl": "require",
+        "timeout": 10
+    }
+)
+# expire_on_commit=False: attributes stay readable after commit without
+# an implicit (and, under asyncio, illegal) lazy refresh
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -34,3 +86,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Async dependency
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,129 @@
+"""Versioned schema migrations.
+
+Each module in database/migrations is named NNNN_description.py and defines
+`upgrade(conn)`. Applied versions are recorded in schema_migrations. A
+module that sets `transactional = False` runs on an autocommit connection,
+which CREATE INDEX CONCURRENTLY requires; write those to be re-runnable.
+
+Usage:
+    python database/migrate.py          # apply pending migrations
+    python database/migrate.py --list   # show applied / pending
+"""
+import sys
+import argparse
+import importlib.util
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+# Arbitrary key so concurrent deploys don't run migrations twice
+MIGRATION_LOCK_ID = 72_001_009
+
+
+def load_migrations():
+    migrations = []
+    for path in sorted(MIGRATIONS_DIR.glob("[0-9][0-9][0-9][0-9]_*.py")):
+        spec = importlib.util.spec_from_file_location(f"migrations.{path.stem}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        migrations.append((path.stem, module))
+    return migrations
+
+
+def create_index_concurrently(conn, name: str, definition: str):
+    """Build an index without blocking writes.
+
+    `definition` is everything after the index name, e.g.
+    "ON themes (campaign_id, id)". A previous interrupted CONCURRENTLY build
+    leaves an INVALID index behind, which is dropped and rebuilt.
+    """
+    invalid = conn.execute(text("""
+        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = :name AND NOT i.indisvalid
+    """), {"name": name}).first()
+    if invalid:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}"))
+
+
+def applied_versions(conn) -> set:
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR PRIMARY KEY,
+            applied_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+    """))
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def pending_versions(conn) -> list:
+    """Versions not applied yet; read-only, unlike applied_versions."""
+    if conn.execute(text("SELECT to_regclass('schema_migrations')")).scalar() is None:
+        done = set()
+    else:
+        done = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+    return [version for version, _ in load_migrations() if version not in done]
+
+
+async def ensure_migrated(async_engine):
+    """Refuse to start a web or worker process on a schema missing migrations.
+
+    Tables such as jobs exist only once migrations have run (the Procfile's
+    release step), and without them every enqueue and claim would fail.
+    """
+    async with async_engine.connect() as conn:
+        pending = await conn.run_sync(pending_versions)
+    if pending:
+        raise RuntimeError(
+            f"Database has unapplied migrations ({', '.join(pending)}); run `python database/migrate.py` first"
+        )
+
+
+def migrate(engine: Engine) -> list:
+    """Apply pending migrations in order; returns the versions applied."""
+    applied = []
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_conn:
+        lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        try:
+            done = applied_versions(lock_conn)
+            for version, module in load_migrations():
+                if version in done:
+                    continue
+                print(f"⏳ Applying {version}")
+                if getattr(module, "transactional", True):
+                    with engine.begin() as conn:
+                        module.upgrade(conn)
+                        conn.execute(text("INSERT INTO schema_migrations (version) VALUES (:v)"), {"v": version})
+                else:
+                    module.upgrade(lock_conn)
+                    lock_conn.execute(text("INSERT INTO schema_migrations (version) VALUES (:v)"), {"v": version})
+                print(f"✅ Applied {version}")
+                applied.append(version)
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--list", action="store_true", help="show applied and pending migrations")
+    args = parser.parse_args()
+
+    from database.db import engine
+    if args.list:
+        with engine.connect() as conn:
+            done = applied_versions(conn)
+            conn.commit()
+        for version, _ in load_migrations():
+            print(f"{'applied' if version in done else 'pending':<9}{version}")
+        return
+
+    applied = migrate(engine)
+    if not applied:
+        print("Database is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+"""Create any tables missing from the models (existing ones are left alone).
+
+Later migrations must be idempotent (IF NOT EXISTS) since a fresh database
+gets the current models' columns and indexes from this step.
+"""
+from database.models import Base
+
+
+def upgrade(conn):
+    Base.metadata.create_all(bind=conn, checkfirst=True)
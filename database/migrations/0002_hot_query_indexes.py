@@ -0,0 +1,22 @@
+"""Indexes for the hot content/theme/campaign queries.
+
+- content_posts (campaign_id, created_at, id): list_campaign_posts
+- content_posts partial on status = 'scheduled': run_daily_schedule
+- content_posts (theme_id): posts of a theme
+- themes (campaign_id, id): list_themes_by_campaign, select_theme updates
+- campaigns (last_run_date): /campaigns/top
+- campaigns partial on is_active: run_daily_schedule
+"""
+from database.migrate import create_index_concurrently
+
+transactional = False
+
+
+def upgrade(conn):
+    create_index_concurrently(conn, "ix_content_posts_campaign_created", "ON content_posts (campaign_id, created_at, id)")
+    create_index_concurrently(conn, "ix_content_posts_scheduled", "ON content_posts (campaign_id, created_at, id) WHERE status = 'scheduled'")
+    create_index_concurrently(conn, "ix_content_posts_theme_id", "ON content_posts (theme_id)")
+    create_index_concurrently(conn, "ix_themes_campaign_id", "ON themes (campaign_id, id)")
+    create_index_concurrently(conn, "ix_campaigns_last_run_date", "ON campaigns (last_run_date)")
+    create_index_concurrently(conn, "ix_campaigns_active", "ON campaigns (id) WHERE is_active")
+    create_index_concurrently(conn, "ix_jobs_type_status_run_at", "ON jobs (job_type, status, run_at)")
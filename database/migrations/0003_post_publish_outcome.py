@@ -0,0 +1,7 @@
+"""Record the Facebook outcome of each scheduled post."""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE content_posts ADD COLUMN IF NOT EXISTS facebook_post_id VARCHAR"))
+    conn.execute(text("ALTER TABLE content_posts ADD COLUMN IF NOT EXISTS publish_error TEXT"))
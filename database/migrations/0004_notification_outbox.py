@@ -0,0 +1,6 @@
+"""Outbox table for Telegram notifications written alongside state changes."""
+from database.models import NotificationOutbox
+
+
+def upgrade(conn):
+    NotificationOutbox.__table__.create(bind=conn, checkfirst=True)
@@ -0,0 +1,6 @@
+"""Persisted getUpdates offset for the long-polling Telegram mode."""
+from database.models import TelegramPollOffset
+
+
+def upgrade(conn):
+    TelegramPollOffset.__table__.create(bind=conn, checkfirst=True)
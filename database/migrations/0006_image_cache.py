@@ -0,0 +1,6 @@
+"""Index of the content-addressed generated-image cache."""
+from database.models import ImageCacheEntry
+
+
+def upgrade(conn):
+    ImageCacheEntry.__table__.create(bind=conn, checkfirst=True)
@@ -0,0 +1,6 @@
+"""Tag posts claimed for publishing with the run that claimed them."""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE content_posts ADD COLUMN IF NOT EXISTS publish_claim VARCHAR"))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, Enum, DateTime, ForeignKey, Date
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Boolean, Enum, DateTime, ForeignKey, Date, Index, text
 from sqlalchemy.orm import relationship
 from database.db import Base
 import enum
@@ -48,6 +48,12 @@ class Campaign(Base):
     themes = relationship("Theme", back_populates="campaign")
     posts = relationship("ContentPost", back_populates="campaign")
 
+    # Kept in sync with database/migrations
+    __table_args__ = (
+        Index("ix_campaigns_last_run_date", "last_run_date"),
+        Index("ix_campaigns_active", "id", postgresql_where=text("is_active")),
+    )
+
 class User(Base):
     __tablename__ = "users"
 
@@ -83,6 +89,10 @@ class Theme(Base):
     campaign = relationship("Campaign", back_populates="themes")
     posts = relationship("ContentPost", back_populates="theme")
 
+    __table_args__ = (
+        Index("ix_themes_campaign_id", "campaign_id", "id"),
+    )
+
 class CreditLog(Base):
     __tablename__ = "credit_logs"
 
@@ -117,6 +127,93 @@ class ContentPost(Base):
     video_status = Column(String, nullable=True) # New column for video status
     video_error = Column(Text, nullable=True) # New column for video error messages
     post_metadata = Column(JSONB, nullable=True)
+    facebook_post_id = Column(String, nullable=True)
+    publish_error = Column(Text, nullable=True)
+    # Run that moved the post to "publishing"; see services/scheduler.py
+    publish_claim = Column(String, nullable=True)
 
     campaign = relationship("Campaign", back_populates="posts")
     theme = relationship("Theme", back_populates="posts")
+
+    __table_args__ = (
+        Index("ix_content_posts_campaign_created", "campaign_id", "created_at", "id"),
+        Index("ix_content_posts_theme_id", "theme_id"),
+        Index(
+            "ix_content_posts_scheduled",
+            "campaign_id", "created_at", "id",
+            postgresql_where=text("status = 'scheduled'"),
+        ),
+    )
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_type = Column(String, nullable=False)
+    payload = Column(JSONB, nullable=True)
+    status = Column(String, default="queued", nullable=False)  # queued running succeeded failed
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=3, nullable=False)
+    run_at = Column(DateTime, default=datetime.now, nullable=False)
+    locked_by = Column(String, nullable=True)
+    locked_until = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    result = Column(JSONB, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_type_status_run_at", "job_type", "status", "run_at"),
+    )
+
+
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    chat_id = Column(String, nullable=False)
+    kind = Column(String, nullable=False)  # coalescing key, see services/notifications.py
+    message = Column(Text, nullable=False)
+    status = Column(String, default="pending", nullable=False)  # pending sent failed
+    attempts = Column(Integer, default=0, nullable=False)
+    available_at = Column(DateTime, default=datetime.now, nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_notification_outbox_pending",
+            "available_at", "id",
+            postgresql_where=text("status = 'pending'"),
+        ),
+    )
+
+
+class TelegramPollOffset(Base):
+    """Next getUpdates offset per bot, so a restarted poller neither replays nor skips updates."""
+    __tablename__ = "telegram_poll_offsets"
+
+    bot_id = Column(String, primary_key=True)
+    next_offset = Column(BigInteger, nullable=False)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+
+class ImageCacheEntry(Base):
+    """Generated image reused for identical requests; see services/image_cache.py."""
+    __tablename__ = "image_cache"
+
+    # sha256 of provider, model, prompt, aspect ratio and style
+    key = Column(String(64), primary_key=True)
+    provider = Column(String, nullable=False)
+    model = Column(String, nullable=False)
+    aspect_ratio = Column(String, nullable=True)
+    style = Column(String, nullable=True)
+    prompt = Column(Text, nullable=False)
+    url = Column(Text, nullable=False)
+    hits = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.now, nullable=False)
+    last_used_at = Column(DateTime, default=datetime.now, nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
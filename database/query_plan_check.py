@@ -0,0 +1,164 @@
+"""Query-plan regression check for the hot content/theme/campaign queries.
+
+Migrates the target database, seeds a large synthetic dataset inside a
+transaction, ANALYZEs, runs EXPLAIN on each hot query and exits non-zero if
+any of them reads one of its tables with a sequential scan. The transaction
+is rolled back, so nothing is left behind, but point it at a scratch
+database: the seed holds row locks on the tables while it runs.
+
+Usage:
+    python database/query_plan_check.py --database-url postgresql://.../scratch
+    QUERY_PLAN_DATABASE_URL=... python database/query_plan_check.py --campaigns 50000
+"""
+import os
+import sys
+import json
+import argparse
+from datetime import datetime
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from sqlalchemy import create_engine, select, update, and_, or_, text
+from sqlalchemy.dialects import postgresql
+from database.models import Campaign, Theme, ContentPost, Job, ThemeStatus
+from database.migrate import migrate
+from services.pagination import encode_cursor, keyset
+from services.scheduler import due_posts
+
+SEED_SQL = [
+    """
+    INSERT INTO campaigns (title, repeat_every_days, status, is_active, current_step, last_run_date)
+    SELECT 'Campaign ' || g, 7, 'active'::campaignstatus, g % 20 = 0, 3, CURRENT_DATE - (g % 365)
+    FROM generate_series(1, :campaigns) g
+    """,
+    """
+    INSERT INTO themes (campaign_id, title, story, is_selected, status, created_at)
+    SELECT c.id, 'Theme ' || t, 'story', t = 1, 'pending'::themestatus, now()
+    FROM campaigns c CROSS JOIN generate_series(1, :themes_per_campaign) t
+    """,
+    """
+    INSERT INTO content_posts (campaign_id, theme_id, title, content, status, created_at, image_status)
+    SELECT th.campaign_id, th.id, 'Post ' || p, 'content',
+           CASE WHEN p % 10 = 0 THEN 'scheduled' WHEN p % 10 = 1 THEN 'posted' ELSE 'approved' END,
+           now() - make_interval(mins => p), 'pending'
+    FROM themes th CROSS JOIN generate_series(1, :posts_per_theme) p
+    """,
+    """
+    INSERT INTO jobs (job_type, payload, status, attempts, max_attempts, run_at, created_at)
+    SELECT (ARRAY['generate_posts', 'generate_images', 'generate_video', 'campaign_meta'])[1 + g % 4],
+           '{}'::jsonb, CASE WHEN g % 50 = 0 THEN 'queued' ELSE 'succeeded' END, 1, 3, now(), now()
+    FROM generate_series(1, :jobs) g
+    """,
+]
+
+
+def hot_queries(campaign_id: int, theme_id: int):
+    """(name, statement, tables that must not be sequentially scanned)"""
+    now = datetime.now()
+    return [
+        ("list_campaign_posts",
+         select(ContentPost).where(ContentPost.campaign_id == campaign_id).order_by(ContentPost.created_at),
+         {"content_posts"}),
+        ("list_campaign_posts: next page",
+         keyset(select(ContentPost).where(ContentPost.campaign_id == campaign_id),
+                [ContentPost.created_at, ContentPost.id], encode_cursor([now, 0]), 50),
+         {"content_posts"}),
+        ("list_campaigns: next page",
+         keyset(select(Campaign), [Campaign.id], encode_cursor([campaign_id]), 50, descending=True),
+         {"campaigns"}),
+        ("run_daily_schedule: due posts",
+         due_posts(),
+         {"content_posts"}),
+        ("list_themes_by_campaign",
+         select(Theme).where(Theme.campaign_id == campaign_id).order_by(Theme.id),
+         {"themes"}),
+        ("select_theme: discard siblings",
+         update(Theme)
+         .where(Theme.campaign_id == campaign_id, Theme.id != theme_id)
+         .values(is_selected=False, status=ThemeStatus.discarded),
+         {"themes"}),
+        ("get_top_campaigns",
+         select(Campaign).order_by(Campaign.last_run_date.desc()).limit(5),
+         {"campaigns"}),
+        ("posts of a theme",
+         select(ContentPost).where(ContentPost.theme_id == theme_id),
+         {"content_posts"}),
+        ("claim_jobs",
+         select(Job)
+         .where(
+             Job.job_type == "generate_images",
+             or_(
+                 and_(Job.status == "queued", Job.run_at <= now),
+                 and_(Job.status == "running", Job.locked_until < now),
+             ),
+         )
+         .order_by(Job.run_at, Job.id)
+         .limit(3)
+         .with_for_update(skip_locked=True),
+         {"jobs"}),
+    ]
+
+
+def seq_scans(plan: dict) -> list:
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("QUERY_PLAN_DATABASE_URL"))
+    parser.add_argument("--campaigns", type=int, default=20000)
+    parser.add_argument("--themes-per-campaign", type=int, default=5)
+    parser.add_argument("--posts-per-theme", type=int, default=4)
+    parser.add_argument("--jobs", type=int, default=100000)
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url or QUERY_PLAN_DATABASE_URL is required")
+
+    engine = create_engine(args.database_url)
+    migrate(engine)
+
+    failures = []
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            print(f"🌱 Seeding {args.campaigns} campaigns ...")
+            params = {
+                "campaigns": args.campaigns,
+                "themes_per_campaign": args.themes_per_campaign,
+                "posts_per_theme": args.posts_per_theme,
+                "jobs": args.jobs,
+            }
+            for sql in SEED_SQL:
+                conn.execute(text(sql), params)
+            for table in ("campaigns", "themes", "content_posts", "jobs"):
+                conn.execute(text(f"ANALYZE {table}"))
+
+            campaign_id = conn.execute(text("SELECT max(id) FROM campaigns")).scalar()
+            theme_id = conn.execute(text("SELECT max(id) FROM themes WHERE campaign_id = :c"), {"c": campaign_id}).scalar()
+
+            for name, statement, tables in hot_queries(campaign_id, theme_id):
+                sql = str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+                plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                scanned = sorted(set(seq_scans(plan[0]["Plan"])) & tables)
+                if scanned:
+                    failures.append(name)
+                    print(f"❌ {name}: Seq Scan on {', '.join(scanned)}")
+                else:
+                    print(f"✅ {name}")
+        finally:
+            trans.rollback()
+
+    if failures:
+        print(f"\n{len(failures)} hot query plan(s) regressed to a sequential scan")
+        sys.exit(1)
+    print("\nAll hot queries use indexes")
+
+
+if __name__ == "__main__":
+    main()
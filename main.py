@@ -6,10 +6,24 @@ from routers.themes import router as themes_router
 from routers.scheduler import router as scheduler_router
 from routers.content import router as content_router
 from routers.video import router as video_router
+from routers.metrics import router as metrics_router
+from routers.jobs import router as jobs_router
 
 from routers.bot import telegram_router , telegram_lifespan
 
 from services.init_gemini import init_vertexai
+from database.db import async_engine, leader_engine
+from database.migrate import ensure_migrated
+from services.gemini_client import gemini_clients
+from services.facebook_publisher import facebook_publisher
+from services.job_worker import JobWorker
+from services.campaign_scheduler import campaign_scheduler
+from services.notifications import notification_dispatcher
+from services.http_clients import http_clients
+from services.executors import executors
+from services.gcs_uploader import gcs_uploader
+from services.telegram_sender import telegram_sender
+import services.job_handlers  # noqa: F401  registers job handlers
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import os
@@ -20,15 +34,45 @@ load_dotenv()
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 # TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "your-telegram-chat-id")
 TELEGRAM_WEBHOOK_URL = os.getenv("TELEGRAM_WEBHOOK_URL")
+# Run queued jobs inside the web process; set to false when `python -m worker` runs them
+RUN_JOB_WORKER = os.getenv("RUN_JOB_WORKER", "true").lower() == "true"
+# Off by default so deploys don't start auto-publishing; every replica may run it,
+# an advisory lock lets only one of them publish
+RUN_CAMPAIGN_SCHEDULER = os.getenv("RUN_CAMPAIGN_SCHEDULER", "false").lower() == "true"
 
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    await ensure_migrated(async_engine)
     # Initialize Vertex AI before starting the app
     init_vertexai()
-    async with telegram_lifespan(app):
-        yield
+    # Long-lived Gemini clients shared by every service
+    gemini_clients.start()
+    http_clients.start()
+    app.state.job_worker = JobWorker() if RUN_JOB_WORKER else None
+    if app.state.job_worker:
+        await app.state.job_worker.start()
+    if RUN_CAMPAIGN_SCHEDULER:
+        await campaign_scheduler.start()
+    await telegram_sender.start()
+    await notification_dispatcher.start()
+    try:
+        async with telegram_lifespan(app):
+            yield
+    finally:
+        await campaign_scheduler.stop()
+        if app.state.job_worker:
+            await app.state.job_worker.stop()
+        await notification_dispatcher.stop()
+        await telegram_sender.stop()
+        await gemini_clients.aclose()
+        await facebook_publisher.aclose()
+        await http_clients.aclose()
+        await executors.shutdown()
+        gcs_uploader.close()
+        await async_engine.dispose()
+        await leader_engine.dispose()
 
 app = FastAPI(lifespan=lifespan)
 # Remove init_vertexai() from here since it's now in lifespan
@@ -40,6 +84,8 @@ app.include_router(scheduler_router)
 app.include_router(content_router)
 app.include_router(video_router)
 app.include_router(telegram_router)
+app.include_router(metrics_router)
+app.include_router(jobs_router)
 
 @app.get("/")
 def read_root():
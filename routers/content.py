@@ -1,22 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException, Response, Query
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from database.db import get_db
-from database.models import ContentPost, Theme, Campaign
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.db import get_db, get_async_db
+from database.models import ContentPost, Campaign
 from schemas import ContentPostResponse
 from typing import List, Dict
-from services.telegram_handler import send_telegram_message
+from services.notifications import notify
 from services.content_generator import approve_post as approve_post_logic
-from services.image_prompt_generator import generate_image_prompts
 from services.gemini_image_handler import generate_and_upload_async
 from services.ideogram_handler import generate_and_upload_ideogram
-from services.image_service_switcher import generate_image
+from services.image_prompt_generator import generate_image_prompts
+from services.job_queue import enqueue_job, notify_job_enqueued
+from services.facebook_publisher import facebook_batcher
+from services import workflow
+from services.workflow import POST_SUMMARY_FIELDS
+from services.pagination import MAX_PAGE_SIZE, select_fields, paginated
+from services.executors import executors, EXCEL
 
-from fastapi import BackgroundTasks
 import pandas as pd
 from io import BytesIO
+from datetime import datetime
 
 
-import asyncio
 import requests
 import os
 from dotenv import load_dotenv
@@ -25,11 +31,11 @@ load_dotenv()
 router = APIRouter(prefix="/content", tags=["Content"])
 
 @router.get("/export")
-def export_posts(format: str = "excel", db: Session = Depends(get_db)):
+async def export_posts(format: str = "excel", db: Session = Depends(get_db)):
     from services.data_export_service import export_to_excel
     
     if format.lower() == "excel":
-        buffer, filename = export_to_excel(db)
+        buffer, filename = await executors.run(EXCEL, export_to_excel, db)
         media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     else:
         raise HTTPException(status_code=400, detail="Only Excel export is supported")
@@ -43,15 +49,23 @@ def export_posts(format: str = "excel", db: Session = Depends(get_db)):
     )
 
 @router.get("/posts/{post_id}", response_model=ContentPostResponse)
-def get_post(post_id: int, db: Session = Depends(get_db)):
-    post = db.query(ContentPost).filter(ContentPost.id == post_id).first()
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
-    return post
+async def get_post(post_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await workflow.get_post(db, post_id)
 
 @router.get("/campaigns/{campaign_id}/posts", response_model=List[ContentPostResponse])
-def list_campaign_posts(campaign_id: int, db: Session = Depends(get_db)):
-    return db.query(ContentPost).filter(ContentPost.campaign_id == campaign_id).order_by(ContentPost.created_at).all()
+async def list_campaign_posts(
+    campaign_id: int,
+    response: Response,
+    cursor: str = None,
+    limit: int = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    fields: str = None,
+    view: str = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Oldest first, keyset-paged on (created_at, id); see list_campaigns for the parameters."""
+    names = select_fields(ContentPost, fields, view, POST_SUMMARY_FIELDS, always=("id", "created_at"))
+    rows, next_cursor = await workflow.list_posts(db, campaign_id, names, cursor, limit)
+    return paginated(response, rows, names, next_cursor)
 
 @router.post("/{post_id}/disapprove", response_model=ContentPostResponse)
 def disapprove_post(post_id: int, db: Session = Depends(get_db)):
@@ -59,25 +73,13 @@ def disapprove_post(post_id: int, db: Session = Depends(get_db)):
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     post.status = "disapproved"
+    notify(db, f"❌ Post {post.id} has been disapproved.", kind="post_disapproved")
     db.commit()
-    send_telegram_message(f"❌ Post {post.id} has been disapproved.")
     return post
 
 @router.post("/{post_id}/redo", response_model=ContentPostResponse)
-def redo_post(post_id: int, db: Session = Depends(get_db)):
-    post = db.query(ContentPost).filter(ContentPost.id == post_id).first()
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
-
-    theme = db.query(Theme).filter(Theme.id == post.theme_id).first()
-    if not theme:
-        raise HTTPException(status_code=404, detail="Theme not found")
-
-    post.content = f"[REGENERATED] Content based on theme '{theme.title}': {theme.story}"
-    post.status = "scheduled"
-    db.commit()
-    send_telegram_message(f"🔁 Post {post.id} has been regenerated and rescheduled.")
-    return post
+async def redo_post(post_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await workflow.redo_post(db, post_id)
 
 @router.post("/{post_id}/approve", response_model=ContentPostResponse)
 def approve_post(post_id: int, db: Session = Depends(get_db)):
@@ -88,19 +90,25 @@ def approve_post(post_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail=str(e))
 
 @router.post("/{post_id}/post_to_facebook", response_model=ContentPostResponse)
-def post_to_facebook(post_id: int, db: Session = Depends(get_db)):
-    post = db.query(ContentPost).filter(ContentPost.id == post_id).first()
+async def post_to_facebook(post_id: int, db: AsyncSession = Depends(get_async_db)):
+    post = await db.get(ContentPost, post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
 
-    from services.facebook_handler import post_to_facebook
-    success = post_to_facebook(post.content)
-    if success:
-        post.status = "posted"
-        db.commit()
-        return post
-    else:
-        raise HTTPException(status_code=400, detail="Failed to post to Facebook")
+    # Concurrent requests are coalesced into one Graph batch call
+    result = await facebook_batcher.submit(post.content)
+    if not result.ok:
+        post.publish_error = result.error
+        notify(db, f"❌ Failed to post {post.id} to Facebook: {result.error}", kind="publish_failed")
+        await db.commit()
+        raise HTTPException(status_code=400, detail=f"Failed to post to Facebook: {result.error}")
+    post.status = "posted"
+    post.posted_at = datetime.now()
+    post.facebook_post_id = result.facebook_post_id
+    post.publish_error = None
+    notify(db, f"📢 Post {post.id} sent to Facebook!\n\n{post.content}", kind="post_published")
+    await db.commit()
+    return post
 
 @router.get("/{post_id}/image_prompts")
 def get_image_prompts(post_id: int, db: Session = Depends(get_db)):
@@ -130,18 +138,18 @@ logging.basicConfig(
 @router.post("/{post_id}/generate_images_real")
 async def generate_real_images_for_post(
     post_id: int, 
-    background_tasks: BackgroundTasks, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_async_db), 
     num_images: int = None, 
     style: str = None, 
-    image_service: str = "gemini"
+    image_service: str = "gemini",
+    force_regenerate: bool = False
 ):
     # Get values from query parameters or use defaults
     num_images = num_images if num_images is not None else 1
     style = style if style is not None else "realistic"
     logger.info(f"Received request with style: {style}, num_images: {num_images}, service: {image_service}")
     
-    post = db.query(ContentPost).filter(ContentPost.id == post_id).first()
+    post = await db.get(ContentPost, post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
 
@@ -149,213 +157,56 @@ async def generate_real_images_for_post(
     post.image_status = "generating"
     post.image_progress = 0  # Assuming you've added this field to your model
     post.image_status_detail = "Queued for processing"
-    db.commit()
-    db.refresh(post)
+    job = await enqueue_job(db, "generate_images", {
+        "post_id": post_id,
+        "num_images": num_images,
+        "style": style,
+        "image_service": image_service,
+        "force_regenerate": force_regenerate
+    }, commit=False)
+    await db.commit()
+    notify_job_enqueued("generate_images")
 
-    # Create a task that will run in the background
-    asyncio.create_task(process_image_generation(post_id, num_images, style, image_service))
-    
     return {
         "status": "processing", 
-        "message": "Image generation started in background",
-        "post_id": post_id
+        "message": "Image generation queued",
+        "post_id": post_id,
+        "job_id": job.id
     }
 
-# This function runs as a separate task in the event loop
-async def process_image_generation(post_id: int, num_images: int, style: str, image_service: str):
-    # Create a new session for database updates
-    from database.db import SessionLocal
-    async_db = None
-    
-    try:
-        async_db = SessionLocal()
-        
-        # Get fresh post instance in this session
-        post_instance = async_db.query(ContentPost).filter(ContentPost.id == post_id).first()
-        if not post_instance:
-            logger.error(f"Post {post_id} not found in background task")
-            return
-
-        try:
-            # Update progress
-            await update_progress(async_db, post_instance, 10, "Generating prompts")
-            
-            # Directly await the async function - no run_in_executor needed
-            prompt_tuples = await generate_image_prompts(
-                post_instance.content, 
-                style=style, 
-                num_prompts=num_images
-            )
-            
-            # Extract only english_prompts for image generation
-            prompts = [eng for _, eng, _ in prompt_tuples]
-            
-            logger.info(f"Generated {len(prompts)} prompts with style '{style}'")
-            
-            await update_progress(async_db, post_instance, 20, f"Starting generation of {len(prompts)} images")
-            
-            # Process images in parallel with semaphore to limit concurrency
-            semaphore = asyncio.Semaphore(3)  # Limit to 3 concurrent image generations
-            
-            async def process_single_image(idx, prompt):
-                async with semaphore:
-                    try:
-                        # Generate image
-                        url = await generate_image(
-                            prompt,
-                            service=image_service,
-                            post_id=post_id if image_service.lower() == "gemini" else None
-                        )
-                        
-                        if url:
-                            return {
-                                "url": url,
-                                "prompt": prompt,
-                                "order": idx + 1,
-                                "isSelected": True,
-                                "provider": image_service,
-                                "metadata": {
-                                    "width": 9,
-                                    "height": 16,
-                                    "style": style
-                                }
-                            }
-                        return None
-                    except Exception as e:
-                        logger.error(f"Error generating image {idx+1}: {str(e)}")
-                        await update_progress(
-                            async_db, 
-                            post_instance, 
-                            None,  # Don't update progress percentage
-                            f"Error with image {idx+1}: {str(e)[:100]}"
-                        )
-                        return None
-            
-            # Create tasks for all images
-            image_tasks = []
-            for i, prompt in enumerate(prompts):
-                task = process_single_image(i, prompt)
-                image_tasks.append(task)
-            
-            # Process images and maintain original order
-            results = await asyncio.gather(*image_tasks)
-            
-            # Filter out None results (failed generations) but preserve ordering
-            images = [img for img in results if img]
-            
-            # Update progress
-            await update_progress(
-                async_db,
-                post_instance,
-                90,
-                f"Generated {len(images)}/{len(prompts)} images successfully"
-            )
-            
-            # Update post with generated images
-            post_instance.images = {"images": images}
-            post_instance.image_status = "completed" if images else "failed"
-            post_instance.image_progress = 100
-            post_instance.image_status_detail = f"Completed with {len(images)} images" if images else "Failed to generate any images"
-            async_db.commit()
-            
-            logger.info(f"Successfully completed image generation for post {post_id}")
-            
-        except Exception as e:
-            logger.exception(f"Error in image generation task: {str(e)}")
-            post_instance.image_status = "failed"
-            post_instance.image_status_detail = f"Error: {str(e)[:200]}"
-            post_instance.image_progress = 0
-            async_db.commit()
-            
-    finally:
-        if async_db:
-            async_db.close()
-
-# Helper function to update progress
-async def update_progress(db, post, progress=None, status_detail=None):
-    try:
-        if progress is not None:
-            post.image_progress = progress
-        if status_detail is not None:
-            post.image_status_detail = status_detail
-        db.commit()
-        logger.debug(f"Updated progress for post {post.id}: {progress}%, {status_detail}")
-    except Exception as e:
-        logger.error(f"Failed to update progress: {str(e)}")
-
-
 @router.post("/posts/batch_generate_images")
-async def batch_generate_images(post_ids: List[int], background_tasks: BackgroundTasks, db: Session = Depends(get_db), num_images: int = None, style: str = None, image_service: str = "gemini"):
-# Get values from query parameters or use defaults
+async def batch_generate_images(post_ids: List[int], db: AsyncSession = Depends(get_async_db), num_images: int = None, style: str = None, image_service: str = "gemini", force_regenerate: bool = False):
+    # Get values from query parameters or use defaults
     num_images = num_images if num_images is not None else 1
     style = style if style is not None else "realistic"
     
     # Validate all posts exist and update their status
-    posts = db.query(ContentPost).filter(ContentPost.id.in_(post_ids)).all()
+    result = await db.execute(select(ContentPost).where(ContentPost.id.in_(post_ids)))
+    posts = result.scalars().all()
     found_ids = {post.id for post in posts}
     missing_ids = set(post_ids) - found_ids
     if missing_ids:
         raise HTTPException(status_code=404, detail=f"Posts not found: {missing_ids}")
     
-    # Update status for all posts
+    # One job per post so each is retried and capped independently
+    jobs = []
     for post in posts:
         post.image_status = "generating"
-    db.commit()
-    [db.refresh(post) for post in posts]
-    
-    async def batch_generate_images_background():
-        from database.db import SessionLocal
-        async_db = SessionLocal()
-        try:
-            results = {}
-            for post_id in post_ids:
-                try:
-                    post = async_db.query(ContentPost).filter(ContentPost.id == post_id).first()
-                    prompt_tuples = generate_image_prompts(post.content, style=style, num_prompts=num_images)
-                    prompts = [eng for _, eng, _ in prompt_tuples]
-                    
-                    urls = await asyncio.gather(*[
-                        generate_image(
-                            prompt,
-                            service=image_service,
-                            post_id=post_id if image_service.lower() == "gemini" else None
-                        )
-                        for prompt in prompts
-                    ])
-                    
-                    images = []
-                    for i, (prompt, url) in enumerate(zip(prompts, urls)):
-                        if url:
-                            images.append({
-                                "url": url,
-                                "prompt": prompt,
-                                "order": i+1,
-                                "isSelected": True,
-                                "provider": image_service,
-                                "metadata": {
-                                    "width": 9,
-                                    "height": 16,
-                                    "style": style
-                                }
-                            })
-                    
-                    post.images = {"images": images}
-                    post.image_status = "completed" if images else "failed"
-                    results[post_id] = "success"
-                except Exception as e:
-                    post.image_status = "failed"
-                    results[post_id] = str(e)
-                    print(f"Error processing post {post_id}: {e}")
-                finally:
-                    async_db.commit()
-                    async_db.refresh(post)
-        finally:
-            async_db.close()
-    
-    background_tasks.add_task(batch_generate_images_background)
+        post.image_progress = 0
+        post.image_status_detail = "Queued for processing"
+        jobs.append(await enqueue_job(db, "generate_images", {
+            "post_id": post.id,
+            "num_images": num_images,
+            "style": style,
+            "image_service": image_service,
+            "force_regenerate": force_regenerate
+        }, commit=False))
+    await db.commit()
+    notify_job_enqueued("generate_images")
     
     return {
         "status": "processing",
-        "message": f"Batch image generation started for {len(post_ids)} posts",
-        "post_ids": post_ids
+        "message": f"Batch image generation queued for {len(post_ids)} posts",
+        "post_ids": post_ids,
+        "job_ids": [job.id for job in jobs]
     }
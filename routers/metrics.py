@@ -0,0 +1,86 @@
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.db import get_async_db
+from services.gemini_client import gemini_clients
+from services.gemini_limiter import gemini_limiter, imagen_limiter
+from services.job_queue import queue_counts
+from services.facebook_publisher import facebook_publisher
+from services.campaign_scheduler import campaign_scheduler
+from services.notifications import notification_dispatcher, outbox_counts
+from services.http_clients import http_clients
+from services.telegram_updates import telegram_updates
+from services.telegram_sender import telegram_sender
+from services.telegram_polling import telegram_poller
+from services.executors import executors
+from services.gcs_uploader import gcs_uploader
+from services.image_cache import image_cache, image_cache_counts
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+@router.get("/gemini")
+def gemini_metrics():
+    """Shared Gemini client counters, the adaptive text limiter and the Imagen rate limiter."""
+    return {
+        "clients": gemini_clients.stats(),
+        "limiter": gemini_limiter.stats(),
+        "imagen": imagen_limiter.stats(),
+    }
+
+
+@router.get("/jobs")
+async def job_metrics(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Queue depth per job type/status and the in-process worker's counters."""
+    worker = getattr(request.app.state, "job_worker", None)
+    return {"queue": await queue_counts(db), "worker": worker.stats() if worker else None}
+
+
+@router.get("/facebook")
+def facebook_metrics():
+    """Publishing counters of this process (the worker's, when it runs the scheduler in-process)."""
+    return facebook_publisher.stats()
+
+
+@router.get("/scheduler")
+def scheduler_metrics():
+    """Campaign scheduler state; only the elected leader tracks campaigns."""
+    return campaign_scheduler.stats()
+
+
+@router.get("/notifications")
+async def notification_metrics(db: AsyncSession = Depends(get_async_db)):
+    """Outbox rows by status and this process's dispatcher counters."""
+    return {"outbox": await outbox_counts(db), "dispatcher": notification_dispatcher.stats()}
+
+
+@router.get("/http")
+def http_metrics():
+    """Per-client request, new-connection and TLS-handshake counts; `reused` is the keep-alive saving."""
+    return http_clients.stats()
+
+
+@router.get("/telegram")
+def telegram_metrics():
+    """Incoming update queue (depth, dedupe, latency), the getUpdates poller and the paced sender (lanes, 429s)."""
+    return {
+        "updates": telegram_updates.stats(),
+        "poller": telegram_poller.stats(),
+        "sender": telegram_sender.stats(),
+    }
+
+
+@router.get("/executors")
+def executor_metrics():
+    """Per-pool thread count, queue depth and wait/run time percentiles of the blocking-call executors."""
+    return executors.stats()
+
+
+@router.get("/storage")
+def storage_metrics():
+    """GCS upload counters plus process RSS and GC collection counts, to watch memory without forced collections."""
+    return gcs_uploader.stats()
+
+
+@router.get("/images")
+async def image_metrics(db: AsyncSession = Depends(get_async_db)):
+    """Image cache hits, misses and bypasses of this process, and the size of the shared index."""
+    return {"index": await image_cache_counts(db), "cache": image_cache.stats()}
@@ -1,11 +1,23 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from database.db import get_db
-from services.scheduler import run_daily_schedule
+import uuid
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.db import get_async_db
+from schemas import JobResponse
+from services.job_queue import enqueue_job, get_job
 
 router = APIRouter(prefix="/scheduled_posts", tags=["Scheduler"])
 
 @router.post("/daily_trigger")
-def trigger_daily_schedule(db: Session = Depends(get_db)):
-    count = run_daily_schedule(db)
-    return {"message": f"{count} post(s) sent today."}
\ No newline at end of file
+async def trigger_daily_schedule(db: AsyncSession = Depends(get_async_db)):
+    # Publishing runs in the job worker; poll /scheduled_posts/runs/{job_id} for the counts.
+    # run_id is what the claimed posts' publish_claim holds; see services/scheduler.py
+    run_id = uuid.uuid4().hex
+    job = await enqueue_job(db, "daily_schedule", {"run_id": run_id})
+    return {"message": "Daily schedule queued.", "job_id": job.id, "run_id": run_id}
+
+@router.get("/runs/{job_id}", response_model=JobResponse)
+async def get_daily_schedule_run(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    job = await get_job(db, job_id)
+    if not job or job.job_type != "daily_schedule":
+        raise HTTPException(status_code=404, detail="Run not found")
+    return job
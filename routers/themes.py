@@ -1,126 +1,110 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
-import time  # Add this import
-from database.db import get_db, SessionLocal
-from database.models import Campaign, Theme, ThemeStatus
+from fastapi import APIRouter, Depends, HTTPException, Request, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import os
+from database.db import get_async_db, AsyncSessionLocal
+from database.models import Theme
 from schemas import ThemeResponse
 from typing import List
-from services.content_generator import generate_theme_title_and_story, generate_posts_from_theme
-from services.telegram_handler import send_telegram_message
+from services import workflow
+from services.workflow import THEME_SUMMARY_FIELDS
+from services.event_bus import event_bus, theme_topic, format_sse
+from services.pagination import MAX_PAGE_SIZE, select_fields, paginated
 import json
 
 router = APIRouter(prefix="/themes", tags=["Themes"])
 
-@router.post("/campaigns/{campaign_id}/generate_themes", response_model=List[ThemeResponse])
-async def generate_themes(campaign_id: int, db: Session = Depends(get_db)):
-    start_time = time.time()
-    campaign = db.query(Campaign).filter(Campaign.id == campaign_id).first()
-    if not campaign:
-        raise HTTPException(status_code=404, detail="Campaign not found")
-
-    db.query(Theme).filter(Theme.campaign_id == campaign_id).delete()
-
-    # Get themes data concurrently
-    themes_data = await generate_theme_title_and_story(
-        campaign.title, campaign.insight, campaign.description, campaign.target_customer, campaign.repeat_every_days, campaign.content_type
-    )
+STREAM_POLL_INTERVAL = float(os.getenv("STREAM_POLL_INTERVAL", "5"))
 
-    new_themes = []
-    print('starting create theme')
-
-    # Process themes sequentially since we're working with DB
-    for theme_data in themes_data:
-        title = theme_data["title"]
-        story = theme_data["story"]
-        content_plan = theme_data["content_plan"]
-        print(content_plan)
-        theme = Theme(
-            campaign_id=campaign_id,
-            title=title,
-            story=story,
-            content_plan=content_plan,
-            status=ThemeStatus.pending
-        )
-        db.add(theme)
-        db.flush()
-        new_themes.append(theme)
-
-    campaign.current_step = 2
-    db.commit()
-    
-    execution_time = time.time() - start_time
-    print(f"⏱️ Theme generation completed in {execution_time:.2f} seconds")
-
-    return new_themes
+@router.post("/campaigns/{campaign_id}/generate_themes", response_model=List[ThemeResponse])
+async def generate_themes(campaign_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await workflow.generate_themes(db, campaign_id)
 
 
 @router.get("/campaigns/{campaign_id}", response_model=List[ThemeResponse])
-async def list_themes_by_campaign(campaign_id: int, db: Session = Depends(get_db)):
-    return db.query(Theme).filter(Theme.campaign_id == campaign_id).order_by(Theme.id).all()
+async def list_themes_by_campaign(
+    campaign_id: int,
+    response: Response,
+    cursor: str = None,
+    limit: int = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    fields: str = None,
+    view: str = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Keyset-paged on id (creation order); see list_campaigns for the parameters."""
+    names = select_fields(Theme, fields, view, THEME_SUMMARY_FIELDS)
+    rows, next_cursor = await workflow.list_themes(db, campaign_id, names, cursor, limit)
+    return paginated(response, rows, names, next_cursor)
 
 @router.get("/{theme_id}", response_model=ThemeResponse)
-async def get_theme(theme_id: int, db: Session = Depends(get_db)):
-    theme = db.query(Theme).filter(Theme.id == theme_id).first()
-    if not theme:
-        raise HTTPException(status_code=404, detail=f"Theme {theme_id} not found")
-    return theme
+async def get_theme(theme_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await workflow.get_theme(db, theme_id)
 
 @router.get("/{theme_id}/status", response_model=ThemeResponse)
-async def check_theme_status(theme_id: int, db: Session = Depends(get_db)):
-    theme = db.query(Theme).filter(Theme.id == theme_id).first()
+async def check_theme_status(theme_id: int, db: AsyncSession = Depends(get_async_db)):
+    theme = await db.get(Theme, theme_id)
     if not theme:
         raise HTTPException(status_code=404, detail=f"Theme {theme_id} not found")
     
     # await send_telegram_message(f"🔍 Status check for theme {theme_id}: {theme.post_status}")
     return theme
 
-# Update the background task to use a factory for DB sessions
-async def generate_posts_background(theme_id: int, db_factory):
-    """Background task to generate posts with proper DB session management"""
-    # Create a fresh DB session
-    with db_factory() as db:
-        theme = db.query(Theme).filter(Theme.id == theme_id).first()
-        if not theme:
-            await send_telegram_message(f"⚠️ Theme {theme_id} not found")
-            return
-            
-        print(f"DEBUG: Starting post generation for theme {theme_id}")
-        
-        # Set status to pending
-        theme.post_status = "pending"
-        db.commit()
-        
-        # Fetch campaign data
-        campaign = db.query(Campaign).filter(Campaign.id == theme.campaign_id).first()
-        if not campaign:
-            await send_telegram_message(f"⚠️ Campaign not found for theme {theme_id}")
-            return
-            
-        campaign_data = campaign.campaign_data if campaign.campaign_data else {}
-    
-    try:
-        # Call generate_posts_from_theme with the db_factory
-        generated_count = await generate_posts_from_theme(theme, db_factory, campaign_data=campaign_data)
-        
-        # Update theme status with a fresh session
-        with db_factory() as db:
-            theme = db.query(Theme).filter(Theme.id == theme_id).first()
-            if theme:
-                theme.post_status = "ready"
-                db.commit()
-        
-        await send_telegram_message(f"✨ Successfully generated {generated_count} posts for theme {theme_id}")
-    except Exception as e:
-        print(f"DEBUG: Error generating posts: {str(e)}")
-        # Update status to error with a fresh session
-        with db_factory() as db:
-            theme = db.query(Theme).filter(Theme.id == theme_id).first()
-            if theme:
-                theme.post_status = "error"
-                db.commit()
-        
-        await send_telegram_message(f"⚠️ Posts generation failed: {str(e)}")
-
+@router.get("/{theme_id}/stream")
+async def stream_theme_posts(theme_id: int, request: Request):
+    """Server-Sent Events stream of post generation for a theme.
+
+    Emits `status` first, then `post` as each post is generated, `progress`
+    as posts are saved, `error` on failures and a final `done` summary.
+    When generation runs in a separate worker process only `progress` and
+    `done` arrive, from polling the theme's post_status.
+    """
+    async with AsyncSessionLocal() as db:
+        if not await db.get(Theme, theme_id):
+            raise HTTPException(status_code=404, detail=f"Theme {theme_id} not found")
+
+    async def read_post_status():
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Theme.post_status).where(Theme.id == theme_id))
+            return result.scalar_one_or_none()
+
+    async def event_stream():
+        topic = theme_topic(theme_id)
+        # Subscribe before reading the status so no event falls in between
+        with event_bus.subscription(topic) as queue:
+            post_status = await read_post_status()
+            yield format_sse("status", {"theme_id": theme_id, "post_status": post_status})
+            if post_status in ("ready", "error"):
+                yield format_sse("done", {"theme_id": theme_id, "status": post_status})
+                return
+
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=STREAM_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    # Events from other processes don't reach this bus; fall back to the DB
+                    latest = await read_post_status()
+                    if latest in ("ready", "error"):
+                        yield format_sse("done", {"theme_id": theme_id, "status": latest})
+                        break
+                    if latest != post_status:
+                        post_status = latest
+                        yield format_sse("progress", {"theme_id": theme_id, "post_status": latest})
+                    else:
+                        yield ": keep-alive\n\n"
+                    continue
+                if message["event"] == "progress":
+                    post_status = message["data"].get("post_status", post_status)
+                yield format_sse(message["event"], message["data"])
+                if message["event"] == "done":
+                    break
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 # @router.post("/{theme_id}/select", response_model=ThemeResponse)
 # async def select_theme(theme_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
@@ -175,37 +159,6 @@ async def generate_posts_background(theme_id: int, db_factory):
 #         await send_telegram_message(f"❌ Failed to select theme: {error_msg}")
 #         raise HTTPException(status_code=500, detail=error_msg)
 
-# Update the route to use a DB factory
 @router.post("/{theme_id}/select", response_model=ThemeResponse)
-async def select_theme(theme_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
-    # Create a db_factory that returns a fresh session each time
-    def db_factory():
-        return SessionLocal()
-    
-    theme = db.query(Theme).filter(Theme.id == theme_id).first()
-    if not theme:
-        raise HTTPException(status_code=404, detail=f"Theme {theme_id} not found")
-
-    try:
-        # Update theme and campaign status
-        db.query(Theme).filter(
-            Theme.campaign_id == theme.campaign_id,
-            Theme.id != theme.id
-        ).update({"is_selected": False, "status": ThemeStatus.discarded})
-
-        theme.is_selected = True
-        theme.status = ThemeStatus.selected
-        
-        campaign = db.query(Campaign).filter(Campaign.id == theme.campaign_id).first()
-        campaign.current_step = 3
-        db.commit()
-        
-        # Add the background task with the db_factory
-        background_tasks.add_task(generate_posts_background, theme.id, db_factory)
-
-        return theme
-    except Exception as e:
-        db.rollback()
-        error_msg = f"An error occurred: {str(e)}"
-        await send_telegram_message(f"❌ Failed to select theme: {error_msg}")
-        raise HTTPException(status_code=500, detail=error_msg)
\ No newline at end of file
+async def select_theme(theme_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await workflow.select_theme(db, theme_id)
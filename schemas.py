@@ -111,6 +111,23 @@ class ContentPostResponse(BaseModel):
     image_url: Optional[str]
     video_url: Optional[str]
     post_metadata: Optional[PostMetadata] = None
+    facebook_post_id: Optional[str] = None
+    publish_error: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class JobResponse(BaseModel):
+    id: int
+    job_type: str
+    status: str
+    attempts: int
+    max_attempts: int
+    run_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    result: Optional[Dict] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
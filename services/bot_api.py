@@ -0,0 +1,178 @@
+"""Backends the Telegram bot commands use to reach the campaign workflow.
+
+LocalApi (the default) calls services/workflow.py in-process with its own
+session, so a command costs no serialization, no extra HTTP request slot
+on this server and cannot deadlock waiting on itself. HttpApi keeps the
+old behaviour of calling the REST API at API_BASE, for running the bot
+apart from the API; pick it with TELEGRAM_BOT_BACKEND=http.
+
+Both return plain JSON-shaped dicts and raise BotApiError with the HTTP
+status the REST API would have answered.
+"""
+import os
+from typing import List, Optional
+
+import httpx
+from fastapi import HTTPException
+from dotenv import load_dotenv
+
+from database.db import AsyncSessionLocal
+from schemas import CampaignCreate, CampaignResponse, ThemeResponse, ContentPostResponse
+from services.logger import logger
+from services.http_clients import http_clients, INTERNAL_API
+from services.pagination import project
+
+load_dotenv()
+
+TELEGRAM_BOT_BACKEND = os.getenv("TELEGRAM_BOT_BACKEND", "local").lower()
+API_BASE = os.getenv("API_BASE", "http://localhost:8000")
+
+
+class BotApiError(Exception):
+    def __init__(self, status_code: int, detail: str = None):
+        super().__init__(f"HTTP {status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _summary(rows, fields) -> List[dict]:
+    return project(rows, ["id", *fields])
+
+
+class LocalApi:
+    """Runs the workflow in this process, one session per call."""
+
+    def __init__(self, db_factory=AsyncSessionLocal):
+        # Imported here: workflow → notifications → telegram_handler → this module
+        from services import workflow
+        self.workflow = workflow
+        self.db_factory = db_factory
+
+    async def _call(self, fn, *args, response_model=None):
+        async with self.db_factory() as db:
+            try:
+                result = await fn(db, *args)
+            except HTTPException as e:
+                raise BotApiError(e.status_code, e.detail) from None
+            if response_model is not None:
+                return response_model.model_validate(result).model_dump(mode="json")
+            return result
+
+    async def list_campaigns(self, limit: int = None) -> List[dict]:
+        async def run(db):
+            names = ["id", *self.workflow.CAMPAIGN_SUMMARY_FIELDS]
+            rows, _ = await self.workflow.list_campaigns(db, names, None, limit)
+            return _summary(rows, self.workflow.CAMPAIGN_SUMMARY_FIELDS)
+        return await self._call(run)
+
+    async def get_campaign(self, campaign_id) -> dict:
+        return await self._call(self.workflow.get_campaign, int(campaign_id), response_model=CampaignResponse)
+
+    async def create_campaign(self, payload: dict) -> dict:
+        return await self._call(self.workflow.create_campaign, CampaignCreate(**payload), response_model=CampaignResponse)
+
+    async def generate_themes(self, campaign_id) -> List[dict]:
+        themes = await self._call(self.workflow.generate_themes, int(campaign_id))
+        return [ThemeResponse.model_validate(theme).model_dump(mode="json") for theme in themes]
+
+    async def list_themes(self, campaign_id) -> List[dict]:
+        async def run(db):
+            names = ["id", *self.workflow.THEME_SUMMARY_FIELDS]
+            rows, _ = await self.workflow.list_themes(db, int(campaign_id), names)
+            return _summary(rows, self.workflow.THEME_SUMMARY_FIELDS)
+        return await self._call(run)
+
+    async def get_theme(self, theme_id) -> dict:
+        return await self._call(self.workflow.get_theme, int(theme_id), response_model=ThemeResponse)
+
+    async def select_theme(self, theme_id) -> dict:
+        return await self._call(self.workflow.select_theme, int(theme_id), response_model=ThemeResponse)
+
+    async def list_posts(self, campaign_id) -> List[dict]:
+        async def run(db):
+            names = ["id", *self.workflow.POST_SUMMARY_FIELDS]
+            rows, _ = await self.workflow.list_posts(db, int(campaign_id), names)
+            return _summary(rows, self.workflow.POST_SUMMARY_FIELDS)
+        return await self._call(run)
+
+    async def get_post(self, post_id) -> dict:
+        return await self._call(self.workflow.get_post, int(post_id), response_model=ContentPostResponse)
+
+    async def redo_post(self, post_id) -> dict:
+        return await self._call(self.workflow.redo_post, int(post_id), response_model=ContentPostResponse)
+
+
+class HttpApi:
+    """Calls the REST API over the shared internal HTTP client."""
+
+    def __init__(self, base_url: str = API_BASE):
+        self.base_url = base_url.rstrip('/')
+
+    async def request(self, endpoint: str, method: str = 'get', data: dict = None, params: dict = None):
+        url = f"{self.base_url}/{endpoint.rstrip('/')}"
+        logger.info(f"Attempting {method.upper()} request to {url}")
+        client = http_clients.get(INTERNAL_API)
+        try:
+            if method.lower() == 'post':
+                res = await client.post(url, json=data, params=params)
+            else:
+                res = await client.get(url, params=params)
+            logger.info(f"API Response status: {res.status_code}")
+            res.raise_for_status()
+            return res.json()
+        except httpx.HTTPStatusError as e:
+            logger.error(f"HTTP {e.response.status_code} error: {str(e)}")
+            try:
+                detail = e.response.json().get("detail")
+            except ValueError:
+                detail = e.response.text[:500]
+            raise BotApiError(e.response.status_code, detail) from None
+        except httpx.RequestError as e:
+            logger.error(f"Request to {url} failed: {type(e).__name__}: {e}")
+            raise
+
+    async def list_campaigns(self, limit: int = None) -> List[dict]:
+        params = {"view": "summary"}
+        if limit:
+            params["limit"] = limit
+        return await self.request('campaigns/', params=params)
+
+    async def get_campaign(self, campaign_id) -> dict:
+        return await self.request(f'campaigns/{campaign_id}')
+
+    async def create_campaign(self, payload: dict) -> dict:
+        return await self.request('campaigns/', 'post', payload)
+
+    async def generate_themes(self, campaign_id) -> List[dict]:
+        return await self.request(f'themes/campaigns/{campaign_id}/generate_themes', 'post')
+
+    async def list_themes(self, campaign_id) -> List[dict]:
+        return await self.request(f'themes/campaigns/{campaign_id}', params={"view": "summary"})
+
+    async def get_theme(self, theme_id) -> dict:
+        return await self.request(f'themes/{theme_id}')
+
+    async def select_theme(self, theme_id) -> dict:
+        return await self.request(f'themes/{theme_id}/select', 'post')
+
+    async def list_posts(self, campaign_id) -> List[dict]:
+        return await self.request(f'content/campaigns/{campaign_id}/posts', params={"view": "summary"})
+
+    async def get_post(self, post_id) -> dict:
+        return await self.request(f'content/posts/{post_id}')
+
+    async def redo_post(self, post_id) -> dict:
+        return await self.request(f'content/{post_id}/redo', 'post')
+
+
+_bot_api: Optional[object] = None
+
+
+def get_bot_api():
+    """The backend picked by TELEGRAM_BOT_BACKEND, created on first use."""
+    global _bot_api
+    if _bot_api is None:
+        _bot_api = HttpApi() if TELEGRAM_BOT_BACKEND == "http" else LocalApi()
+        logger.info(f"Telegram bot backend: {type(_bot_api).__name__}")
+    return _bot_api
+
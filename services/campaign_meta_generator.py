@@ -0,0 +1,146 @@
+import json
+import time
+from typing import List, Optional
+
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from google.genai import types
+from google.genai.types import Part
+from dotenv import load_dotenv
+
+from database.models import Campaign
+from services.gemini_client import generate_content
+
+load_dotenv()
+
+class CampaignInput(BaseModel):
+    id: int  # Add ID field as optional
+    title: str
+    description: str
+    targetCustomer: str
+    insight: str
+    content_type: str
+
+class DescriptionPrompt(BaseModel):
+    # Phong cách và mục tiêu nội dung
+    toneWriting: str                      # Ví dụ: ấm áp, chuyên nghiệp, hài hước
+    topicStyle: str                       # storytelling, quote, case study
+    platforms: List[str]                  # ["Facebook", "TikTok"]
+    imageMood: Optional[str]              # Ví dụ: thư giãn, năng lượng, ấm áp
+    mindset: str                          # học hỏi, giải trí, truyền cảm hứng
+    contentObjective: str                 # Mục tiêu chiến dịch: bán hàng, nhận diện, kích hoạt
+
+    # Khách hàng mục tiêu
+    targetCustomer: str                   # mô tả người mua lý tưởng (nhân khẩu học + hành vi)
+    painPoints: List[str]                # các rào cản / lo lắng thường gặp
+    bigKeywords: List[str]               # từ khóa sản phẩm / insight tìm kiếm
+
+    # Định vị thương hiệu
+    brandName: Optional[str]             # tên thương hiệu nếu có
+    corePromise: Optional[str]           # Lời hứa thương hiệu
+    brandManifesto: Optional[str]        # WHY cảm xúc
+    brandPersona: Optional[str]          # ví dụ: người anh, bạn thân, chuyên gia
+    keyMessages: List[str]               # Những thông điệp chính cần lặp lại
+    callsToAction: List[str]             # CTA: mua ngay, chia sẻ, comment...
+
+    # Phân tích hệ thống
+    confidenceScore: int                 # đánh giá độ đầy đủ input (0-100)
+
+class DescriptionGenerate(BaseModel):
+    campaign_meta: DescriptionPrompt
+
+
+
+async def generate_campaign_meta(campaign: CampaignInput, db: AsyncSession) -> DescriptionGenerate:
+    """Generate campaign metadata in background"""
+    start_time = time.time()
+
+    print(f"🏁 Background task bắt đầu lúc: {time.strftime('%H:%M:%S')}")
+    
+    print('Generating campaign metadata', campaign.model_dump())
+    system_prompt = """
+            Bạn là AI chuyên phân tích nội dung tự nhiên từ người dùng để phân loại các yếu tố sau cho một chiến dịch marketing.
+            Hãy phân tích chiến dịch và trả về định dạng JSON như sau:
+
+            {{
+            "description": {{
+                # Phong cách và mục tiêu nội dung
+                "toneWriting": "string",           # Ví dụ: ấm áp, chuyên nghiệp, hài hước
+                "topicStyle": "string",            # storytelling, quote, case study
+                "platforms": ["string"],           # ["Facebook", "TikTok"]
+                "imageMood": "string",             # Ví dụ: thư giãn, năng lượng, ấm áp
+                "mindset": "string",               # học hỏi, giải trí, truyền cảm hứng
+                "contentObjective": "string",      # Mục tiêu: bán hàng, nhận diện, kích hoạt
+
+                # Khách hàng mục tiêu
+                "targetCustomer": "string",        # mô tả người mua lý tưởng
+                "painPoints": ["string"],          # các rào cản / lo lắng thường gặp
+                "bigKeywords": ["string"],         # từ khóa sản phẩm / insight tìm kiếm
+
+                # Định vị thương hiệu
+                "brandName": "string",             # tên thương hiệu nếu có
+                "corePromise": "string",           # Lời hứa thương hiệu
+                "brandManifesto": "string",        # WHY cảm xúc
+                "brandPersona": "string",          # ví dụ: người anh, bạn thân, chuyên gia
+                "keyMessages": ["string"],         # Những thông điệp chính cần lặp lại
+                "callsToAction": ["string"],       # CTA: mua ngay, chia sẻ, comment...
+
+                # Phân tích hệ thống
+                "confidenceScore": 100             # đánh giá độ đầy đủ input (0-100)
+            }}
+            }}
+
+           
+            """
+
+    # Use asyncio.create_task to run in true background
+    response = await generate_content(
+        model='gemini-2.0-flash',
+        # model='gemini-2.5-flash-preview-04-17',
+        contents=f"""Phân tích thông tin chiến dịch để xác định các yếu tố description prompt.  Tiêu đề: {campaign.title}
+            Mô tả: {campaign.description}
+            Đối tượng: {campaign.targetCustomer}
+            Insight khách hàng: {campaign.insight}
+            Phong cách viết nội dung: {campaign.content_type}
+            """,
+        config=types.GenerateContentConfig(
+            response_mime_type='application/json',
+            response_schema=DescriptionGenerate,
+            system_instruction=Part(text=system_prompt)
+        )
+    )
+
+    print("✅ Đã phân tích thông tin chiến dịch.")
+    content = json.loads(response.text)
+    
+    if campaign.id:
+        # Update existing campaign
+        existing_campaign = await db.get(Campaign, campaign.id)
+        if existing_campaign:
+            existing_campaign.campaign_data = content
+            existing_campaign.title = campaign.title
+            existing_campaign.description = campaign.description
+            existing_campaign.target_customer = campaign.targetCustomer
+            existing_campaign.insight = campaign.insight
+            await db.commit()
+            print(f"✅ Đã cập nhật campaign data cho chiến dịch ID {campaign.id}")
+            return DescriptionGenerate(**content)
+    
+    # # Create new campaign if no ID or campaign not found
+    # new_campaign = Campaign(
+    #     title=campaign.title,
+    #     description=campaign.description,
+    #     target_customer=campaign.targetCustomer,
+    #     insight=campaign.insight,
+    #     campaign_data=content,
+    #     repeat_every_days=7,
+    #     current_step=1
+    # )
+    
+    # db.add(new_campaign)
+    # db.commit()
+    # db.refresh(new_campaign)
+    
+    print(f"✅ Đã lưu campaign data mới cho chiến dịch: {campaign.title}")
+
+    return DescriptionGenerate(**content)
@@ -0,0 +1,320 @@
+"""In-process scheduler that publishes each campaign when its next_run_date comes up.
+
+Active campaigns sit in a min-heap keyed by when they are next due, so the
+loop sleeps until exactly the earliest one instead of sweeping the table.
+Publishing a campaign claims it through the same due-date guard as the
+daily trigger (advancing last_run_date/next_run_date by repeat_every_days)
+together with its oldest scheduled post, commits, sends the post, and then
+records the result in a second short transaction, so no row lock is held
+while Facebook is called. A post whose outcome is unknown is left as
+publish_unknown; one that certainly failed goes back to scheduled and its
+campaign becomes due again.
+
+Every web/worker replica may run one; a session-level Postgres advisory lock
+elects the single leader that actually schedules. The others retry the lock
+every CAMPAIGN_SCHEDULER_LEADER_RETRY seconds and take over if the leader's
+connection goes away.
+"""
+import os
+import heapq
+import asyncio
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, text, update
+from sqlalchemy.ext.asyncio import AsyncEngine
+from dotenv import load_dotenv
+
+from database.db import AsyncSessionLocal, leader_engine
+from database.models import Campaign, ContentPost
+from services.facebook_publisher import facebook_batcher
+from services.notifications import notify
+from services.scheduler import (
+    PUBLISHING_STATUS, UNKNOWN_STATUS, claim_campaign_runs, restore_campaign_runs,
+)
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key shared by every replica; see database/migrate.py for the migration lock
+CAMPAIGN_SCHEDULER_LOCK_ID = 72_001_013
+CAMPAIGN_PUBLISH_TIME = time.fromisoformat(os.getenv("CAMPAIGN_PUBLISH_TIME", "09:00"))
+CAMPAIGN_SCHEDULER_RESYNC_SECONDS = float(os.getenv("CAMPAIGN_SCHEDULER_RESYNC_SECONDS", "300"))
+CAMPAIGN_SCHEDULER_LEADER_RETRY = float(os.getenv("CAMPAIGN_SCHEDULER_LEADER_RETRY", "30"))
+CAMPAIGN_SCHEDULER_RETRY_SECONDS = float(os.getenv("CAMPAIGN_SCHEDULER_RETRY_SECONDS", "600"))
+# publish_claim prefix of posts claimed by this scheduler (daily runs use a bare uuid)
+CAMPAIGN_CLAIM_PREFIX = "campaign-"
+
+
+def campaign_due_date(next_run_date: Optional[date], last_run_date: Optional[date],
+                      start_date: Optional[date], repeat_every_days: int) -> Optional[date]:
+    """When the campaign next publishes; None if it has no dates at all and so never does.
+
+    Keep in step with services.scheduler.campaign_due_on.
+    """
+    if next_run_date:
+        return next_run_date
+    if last_run_date:
+        return last_run_date + timedelta(days=repeat_every_days)
+    return start_date
+
+
+def due_at(day: date) -> datetime:
+    return datetime.combine(day, CAMPAIGN_PUBLISH_TIME)
+
+
+class CampaignScheduler:
+    def __init__(self, engine: AsyncEngine = leader_engine, db_factory=AsyncSessionLocal,
+                 resync_seconds: float = CAMPAIGN_SCHEDULER_RESYNC_SECONDS,
+                 leader_retry: float = CAMPAIGN_SCHEDULER_LEADER_RETRY,
+                 retry_seconds: float = CAMPAIGN_SCHEDULER_RETRY_SECONDS):
+        self.engine = engine
+        self.db_factory = db_factory
+        self.resync_seconds = resync_seconds
+        self.leader_retry = leader_retry
+        self.retry_seconds = retry_seconds
+        self._heap: List[Tuple[datetime, int]] = []
+        # Latest due time per campaign; heap entries that disagree are stale
+        self._due: Dict[int, datetime] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._resync_requested = False
+        self._running = False
+        self.is_leader = False
+        self.published = 0
+        self.skipped = 0
+        self.failed = 0
+        self.wakeups = 0
+
+    async def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._elect_loop())
+
+    async def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        self._wake.set()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def campaigns_changed(self):
+        """Ask the leader to reload due dates now; safe to call from sync routes' threads."""
+        self._resync_requested = True
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def _push(self, campaign_id: int, when: datetime):
+        self._due[campaign_id] = when
+        heapq.heappush(self._heap, (when, campaign_id))
+
+    async def _elect_loop(self):
+        while self._running:
+            try:
+                async with self.engine.connect() as conn:
+                    conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                    acquired = (await conn.execute(
+                        text("SELECT pg_try_advisory_lock(:id)"), {"id": CAMPAIGN_SCHEDULER_LOCK_ID}
+                    )).scalar()
+                    if acquired:
+                        self.is_leader = True
+                        logger.info("Campaign scheduler elected leader")
+                        try:
+                            await self._lead(conn)
+                        finally:
+                            self.is_leader = False
+                            # Unlock explicitly in case a pooled engine was passed in
+                            await conn.execute(
+                                text("SELECT pg_advisory_unlock(:id)"), {"id": CAMPAIGN_SCHEDULER_LOCK_ID}
+                            )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Campaign scheduler leadership lost: {e}")
+            await self._sleep(self.leader_retry)
+
+    async def _sleep(self, seconds: float):
+        self._wake.clear()
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=max(0.0, seconds))
+        except asyncio.TimeoutError:
+            pass
+
+    async def _resync(self):
+        """Rebuild the heap from the active campaigns' dates."""
+        async with self.db_factory() as db:
+            result = await db.execute(
+                select(
+                    Campaign.id, Campaign.next_run_date, Campaign.last_run_date,
+                    Campaign.start_date, Campaign.repeat_every_days,
+                ).where(Campaign.is_active)
+            )
+            rows = result.all()
+        self._heap, self._due = [], {}
+        for campaign_id, next_run, last_run, start, repeat in rows:
+            due = campaign_due_date(next_run, last_run, start, repeat)
+            if due is not None:
+                self._due[campaign_id] = due_at(due)
+        self._heap = [(when, campaign_id) for campaign_id, when in self._due.items()]
+        heapq.heapify(self._heap)
+        self._resync_requested = False
+        logger.info(f"Campaign scheduler tracking {len(self._heap)} active campaign(s)")
+
+    async def _sweep_abandoned_claims(self) -> int:
+        """Mark posts a previous leader left claimed as UNKNOWN_STATUS.
+
+        That leader died between claiming and recording the outcome, so the
+        post may be on Facebook; its campaign was already advanced.
+        """
+        async with self.db_factory() as db:
+            result = await db.execute(
+                update(ContentPost)
+                .where(ContentPost.status == PUBLISHING_STATUS,
+                       ContentPost.publish_claim.startswith(CAMPAIGN_CLAIM_PREFIX))
+                .values(status=UNKNOWN_STATUS, publish_claim=None,
+                        publish_error="Campaign scheduler stopped while publishing; outcome unknown, not retried")
+            )
+            await db.commit()
+        if result.rowcount:
+            logger.warning(f"Marked {result.rowcount} post(s) abandoned mid-publish as {UNKNOWN_STATUS}")
+        return result.rowcount
+
+    async def _lead(self, conn):
+        await self._sweep_abandoned_claims()
+        await self._resync()
+        last_resync = datetime.now()
+        while self._running:
+            now = datetime.now()
+            if self._resync_requested or (now - last_resync).total_seconds() >= self.resync_seconds:
+                # Also proves the lock-holding connection is still alive
+                await conn.execute(text("SELECT 1"))
+                await self._resync()
+                last_resync = now
+
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                when, campaign_id = heapq.heappop(self._heap)
+                if self._due.get(campaign_id) == when:
+                    del self._due[campaign_id]
+                    due.append(campaign_id)
+            if due:
+                self.wakeups += 1
+                outcomes = await asyncio.gather(*[self.run_campaign(c) for c in due], return_exceptions=True)
+                for campaign_id, outcome in zip(due, outcomes):
+                    if isinstance(outcome, Exception):
+                        logger.error(f"Campaign {campaign_id} run failed: {outcome}")
+                        self.failed += 1
+                        outcome = datetime.now() + timedelta(seconds=self.retry_seconds)
+                    if outcome is not None and campaign_id not in self._due:
+                        self._push(campaign_id, outcome)
+                continue
+
+            until_resync = self.resync_seconds - (datetime.now() - last_resync).total_seconds()
+            until_due = (self._heap[0][0] - datetime.now()).total_seconds() if self._heap else until_resync
+            if not self._resync_requested:
+                await self._sleep(min(until_due, until_resync))
+
+    async def run_campaign(self, campaign_id: int) -> Optional[datetime]:
+        """Publish the campaign's next post if it is due; returns when to look at it again.
+
+        None means the campaign is inactive, undated or gone, or was just
+        claimed by the daily trigger, and drops out of the heap until the
+        next resync. The post stays PUBLISHING_STATUS between the two
+        transactions; if the leader dies there, the next leader's
+        _sweep_abandoned_claims marks it unknown.
+        """
+        today = date.today()
+        async with self.db_factory() as db:
+            campaign = await db.get(Campaign, campaign_id)
+            if campaign is None or not campaign.is_active:
+                return None
+            due = campaign_due_date(campaign.next_run_date, campaign.last_run_date,
+                                    campaign.start_date, campaign.repeat_every_days)
+            if due is None:
+                return None
+            if due_at(due) > datetime.now():
+                # Rescheduled since the heap was built
+                return due_at(due)
+
+            previous = await claim_campaign_runs(db, today, [campaign_id])
+            if not previous:
+                await db.rollback()
+                return None
+            title = campaign.title
+            next_run = today + timedelta(days=campaign.repeat_every_days)
+            oldest = (
+                select(ContentPost.id)
+                .where(ContentPost.campaign_id == campaign_id, ContentPost.status == "scheduled")
+                .order_by(ContentPost.created_at, ContentPost.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            result = await db.execute(
+                update(ContentPost)
+                .where(ContentPost.id == oldest.scalar_subquery(), ContentPost.status == "scheduled")
+                .values(status=PUBLISHING_STATUS, publish_claim=f"{CAMPAIGN_CLAIM_PREFIX}{campaign_id}-{today.isoformat()}")
+                .returning(ContentPost.id, ContentPost.content)
+                .execution_options(synchronize_session=False)
+            )
+            post = result.one_or_none()
+            await db.commit()
+
+        if post is None:
+            self.skipped += 1
+            logger.info(f"Campaign {campaign_id} is due but has no scheduled post")
+            return due_at(next_run)
+
+        post_id, content = post
+        # Campaigns due together share Graph batch calls
+        outcome = await facebook_batcher.submit(content)
+
+        async with self.db_factory() as db:
+            if outcome.ok:
+                values = {"status": "posted", "posted_at": datetime.now(),
+                          "facebook_post_id": outcome.facebook_post_id, "publish_error": None}
+                notify(db, f"📢 Post from campaign '{title}' sent to Facebook!\n\n{content}",
+                       kind="post_published")
+            else:
+                # A post that may have gone out is never re-sent automatically
+                values = {"status": UNKNOWN_STATUS if outcome.outcome_unknown else "scheduled",
+                          "publish_error": outcome.error}
+                if not outcome.outcome_unknown:
+                    await restore_campaign_runs(db, today, previous)
+                notify(db, f"❌ Failed to post to Facebook for campaign '{title}': {outcome.error}",
+                       kind="publish_failed")
+            await db.execute(
+                update(ContentPost).where(ContentPost.id == post_id).values(publish_claim=None, **values)
+            )
+            await db.commit()
+
+        if not outcome.ok:
+            self.failed += 1
+            if outcome.outcome_unknown:
+                return due_at(next_run)
+            return datetime.now() + timedelta(seconds=self.retry_seconds)
+        self.published += 1
+        return due_at(next_run)
+
+    def stats(self) -> dict:
+        next_due = self._heap[0][0].isoformat() if self._heap else None
+        return {
+            "running": self._running,
+            "is_leader": self.is_leader,
+            "tracked_campaigns": len(self._due),
+            "next_due": next_due,
+            "published": self.published,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "wakeups": self.wakeups,
+        }
+
+
+campaign_scheduler = CampaignScheduler()
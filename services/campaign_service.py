@@ -6,6 +6,8 @@ from fastapi import UploadFile, HTTPException
 from markitdown import MarkItDown
 from io import BytesIO
 
+from services.executors import executors, MARKITDOWN
+
 async def process_file_content(file: UploadFile) -> str:
     """Extract text content from uploaded files (PDF, DOCX, TXT) using MarkItDown."""
     # Validate file type
@@ -34,7 +36,7 @@ async def process_file_content(file: UploadFile) -> str:
     # Convert to Markdown using MarkItDown
     try:
         md = MarkItDown(enable_plugins=False)
-        result = md.convert(BytesIO(contents))
+        result = await executors.run(MARKITDOWN, md.convert, BytesIO(contents))
         return result.text_content
     except Exception as e:
         raise HTTPException(status_code=500, detail="fConversion failed {e}")
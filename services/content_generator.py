@@ -1,20 +1,23 @@
 import random
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from database.models import ContentPost, Campaign, Theme as DBTheme
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from pydantic import BaseModel, ValidationError
-from google import genai
 from google.genai import types
 import json
 import time
 import os
 import random
 from dotenv import load_dotenv
-from google import genai
 from google.genai import types
 from pydantic import BaseModel
 from schemas import Plan, ThemeBase
+from services.gemini_client import generate_content
+from services.gemini_limiter import gemini_limiter
+from services.event_bus import event_bus, theme_topic
+from services.notifications import notify
 import asyncio
 
 load_dotenv()
@@ -53,7 +56,7 @@ load_dotenv()
 class ThemeGenerate(BaseModel):
     themes: List[ThemeBase]
 
-async def generate_single_theme(client, description: str, insight: str, target_customer: str, post_num: int, content_type: str = "Auto", used_strategies: set = None) -> ThemeBase:
+async def generate_single_theme(description: str, insight: str, target_customer: str, post_num: int, content_type: str = "Auto", used_strategies: set = None) -> ThemeBase:
     """Generate a single theme using Gemini API"""
     # Định nghĩa danh sách format mặc định khi content_type là Auto
    
@@ -146,7 +149,7 @@ async def generate_single_theme(client, description: str, insight: str, target_c
       
 """
     
-    response = await client.aio.models.generate_content(
+    response = await generate_content(
         model='gemini-2.0-flash',
         contents=f""" 
         Dưới đây là thông tin từ người dùng:
@@ -180,14 +183,12 @@ async def generate_single_theme(client, description: str, insight: str, target_c
     return ThemeBase(**content)
 
 async def generate_theme_title_and_story(campaign_title: str, insight: str, description: str, target_customer: str, post_num: int, content_type: str):
-    client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-    
     # Tạo set để theo dõi các chiến lược đã sử dụng
     used_strategies = set()
     
     # Generate 3 themes concurrently với các chiến lược khác nhau
     tasks = [
-        generate_single_theme(client, description, insight, target_customer, post_num, content_type, used_strategies)
+        generate_single_theme(description, insight, target_customer, post_num, content_type, used_strategies)
         for _ in range(3)
     ]
     
@@ -208,7 +209,20 @@ class BlogPost(BaseModel):
     title: str
     content: str
 
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+def build_post_result(blog_post: BlogPost, content_plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a generated BlogPost into the dict saved as a ContentPost."""
+    # Tạo metadata cho bài viết
+    post_metadata = PostMetadata(
+        content_type=content_plan.get('format'),
+        content_ideas=content_plan.get('content_idea'),
+        goals=content_plan.get('goal'),
+        content_length=len(blog_post.content)
+    )
+    return {
+        "title": blog_post.title,
+        "content": blog_post.content,
+        "post_metadata": post_metadata.model_dump()
+    }
 
 async def generate_post_content(theme_title: str, theme_story: str, campaign_desc: str, content_plan: Dict[str, Any]) -> Dict[str, Any]:
     """Generate a post content using Google Gemini API asynchronously."""
@@ -253,7 +267,7 @@ async def generate_post_content(theme_title: str, theme_story: str, campaign_des
         
         # Generate response using Gemini API
         # response = client.models.generate_content(
-        response = await client.aio.models.generate_content(
+        response = await generate_content(
             # model='gemini-2.5-flash-preview-04-17',  # Updated model version
             model='gemini-2.0-flash',  # Updated model version
             contents=prompt,
@@ -268,23 +282,11 @@ async def generate_post_content(theme_title: str, theme_story: str, campaign_des
         # Extract and parse the response
         content = json.loads(response.text)
         blog_post = BlogPost(**content)
-       
-        # Tạo metadata cho bài viết
-        post_metadata = PostMetadata(
-            content_type=content_plan.get('format'),
-            content_ideas=content_plan.get('content_idea'),
-            goals=content_plan.get('goal'),
-            content_length=len(blog_post.content)
-        )
         
         elapsed_time = time.time() - start_time
         print(f"✅ Completed post in {elapsed_time:.2f} seconds. Title: '{post_title}'")
         
-        return {
-            "title": blog_post.title,
-            "content": blog_post.content,
-            "post_metadata": post_metadata.model_dump()
-        }
+        return build_post_result(blog_post, content_plan)
     except Exception as e:
         # Log the error but don't raise it to allow other posts to be generated
         elapsed_time = time.time() - start_time
@@ -295,6 +297,91 @@ async def generate_post_content(theme_title: str, theme_story: str, campaign_des
             "post_metadata": None
         }
 
+# Number of content plan items packed into one Gemini request; 1 keeps one request per item
+POST_GENERATION_BATCH_SIZE = int(os.getenv("POST_GENERATION_BATCH_SIZE", "1"))
+
+class BatchedBlogPost(BlogPost):
+    index: int
+
+async def generate_post_batch(theme_title: str, theme_story: str, campaign_desc: str, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Generate several posts with one structured Gemini call.
+
+    The shared theme/campaign context is sent once and each plan item is
+    numbered; the response is a List[BatchedBlogPost] matched back by index.
+    Items missing from the response fall back to generate_post_content.
+    """
+    print(f"🔄 Starting batched generation of {len(items)} posts for theme: '{theme_title}'")
+    start_time = time.time()
+    results: Dict[int, Dict[str, Any]] = {}
+    try:
+        formats = sorted({str(item.get('format')) for item in items if item.get('format')})
+        item_blocks = "\n".join(
+            f"### BÀI {i}\n"
+            f"--- MỤC TIÊU BÀI VIẾT ---\n{item.get('goal')}\n"
+            f"--- TIÊU ĐỀ BÀI VIẾT ---\n{item.get('title')}\n"
+            f"--- ĐỊNH DẠNG ---\n{item.get('format')}\n"
+            f"--- Ý TƯỞNG NỘI DUNG ---\n{item.get('content_idea')}\n"
+            for i, item in enumerate(items)
+        )
+        prompt = (
+                f"Hãy tạo {len(items)} bài viết bằng tiếng Việt về '{theme_title}' kết hợp giữa tính năng sản phẩm và triết lý sống, tạo sự đồng điệu với người đọc.\n\n"
+                f"--- TÊN THƯƠNG HIỆU ---\n{theme_title}\n\n"
+                f"--- TRIẾT LÝ & GIÁ TRỊ ---\n{theme_story}\n\n"
+                f"--- DANH SÁCH BÀI VIẾT ---\n{item_blocks}\n"
+            )
+
+        system_prompt = f"""
+        Bạn là trợ lý AI chuyên tạo nội dung kết nối sản phẩm với giá trị sống. Nhiệm vụ:
+            1. Phân tích sâu tính năng sản phẩm và liên hệ với triết lý sống phù hợp.
+            2. Tạo nội dung chân thực, tập trung vào giá trị thay vì quảng cáo thuần túy.
+            3. Viết bài bằng tiếng Việt với giọng văn đồng cảm, khơi gợi suy ngẫm và thú vị theo định dạng {", ".join(formats)} của từng bài.
+            4. Kết hợp khéo léo giữa thông tin sản phẩm và bài học cuộc sống.
+            6. Dựa vào mô tả {campaign_desc}
+
+            Mô tả nội dung triển khai. Nếu là storytelling, **tuyệt đối không được mô tả công dụng trực tiếp của sản phẩm**, chỉ được thể hiện sản phẩm qua hành động, tình huống, hoặc mối quan hệ.
+            Truyền tải một vài giá trị về kiến thức/thông tin độc đáo/cảm xúc (1 câu nói kinh điển, 1 câu thơ kinh điển, 1 thành ngữ kinh điển nói về tình cảm gia đình, ...)
+
+            Mỗi bài viết là một phần tử riêng, độc lập với các bài khác, với `index` đúng bằng số thứ tự BÀI tương ứng.
+            Xuất ra ĐÚNG ĐỊNH DẠNG JSON theo yêu cầu, không thêm text hay markdown.
+
+            Ngôn ngữ: Tiếng Việt là chính
+        """
+
+        response = await generate_content(
+            model='gemini-2.0-flash',
+            contents=prompt,
+            config={
+                'response_mime_type': 'application/json',
+                'response_schema': List[BatchedBlogPost],
+                'system_instruction': types.Part.from_text(text=system_prompt),
+            },
+        )
+
+        for entry in json.loads(response.text):
+            try:
+                post = BatchedBlogPost(**entry)
+            except ValidationError:
+                continue
+            if 0 <= post.index < len(items) and post.index not in results and post.content:
+                results[post.index] = build_post_result(post, items[post.index])
+    except Exception as e:
+        print(f"❌ Error in batched generation: {str(e)}")
+
+    elapsed_time = time.time() - start_time
+    print(f"✅ Batch returned {len(results)}/{len(items)} posts in {elapsed_time:.2f} seconds")
+
+    # Fall back to one request per item for anything the batch did not cover
+    missing = [i for i in range(len(items)) if i not in results]
+    if missing:
+        print(f"⚠️ Falling back to per-item generation for {len(missing)} posts")
+        fallback = await asyncio.gather(*[
+            generate_post_content(theme_title, theme_story, campaign_desc, items[i])
+            for i in missing
+        ])
+        results.update(zip(missing, fallback))
+
+    return [results[i] for i in range(len(items))]
+
 async def create_default_content_plan(theme_title: str, theme_story: str, num_posts=5) -> Dict[str, Any]:
     """Tạo content plan mặc định khi không có plan được cung cấp"""
     
@@ -308,7 +395,7 @@ async def create_default_content_plan(theme_title: str, theme_story: str, num_po
     - content_idea: Ý tưởng nội dung ngắn
     """
     
-    response = await client.aio.models.generate_content(
+    response = await generate_content(
         model='gemini-2.0-flash',
         contents=prompt,
         config={
@@ -320,10 +407,8 @@ async def create_default_content_plan(theme_title: str, theme_story: str, num_po
     content = json.loads(response.text)
     return content #.model_dump()
 
-async def process_with_semaphore(theme_title: str, theme_story: str, campaign_desc: str, content_plan: Optional[Dict[str, Any]] = None):
-    # Create a semaphore to limit concurrent API calls
-    semaphore = asyncio.Semaphore(10)  # Limit to 10 concurrent API calls
-    
+async def prepare_content_items(theme_title: str, theme_story: str, content_plan: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Normalize a theme content plan into its list of items ([] if unusable)."""
     # Ensure content_plan is properly formatted
     if content_plan is None:
         print("⚠️ No content plan provided, creating default")
@@ -346,39 +431,75 @@ async def process_with_semaphore(theme_title: str, theme_story: str, campaign_de
     if not isinstance(content_items, list) or not content_items:
         print("❌ Content items must be a non-empty list")
         return []
-    
-    # Define the bounded task that will respect the semaphore
-    async def bounded_task(item):
-        # This critical section ensures only 10 tasks can execute this block concurrently
-        async with semaphore:
-            print(f"🔄 Starting generation for item: '{item.get('title')}'")
-            try:
-                return await generate_post_content(
-                    theme_title,
-                    theme_story,
-                    campaign_desc,
-                    item
-                )
-            except Exception as e:
-                print(f"❌ Error generating post for '{item.get('title')}': {str(e)}")
-                return None
-    
-    # Create tasks for all content items
-    tasks = [bounded_task(item) for item in content_items]
-    
-    # Execute all tasks concurrently with gather, this is the correct way
-    print(f"🚀 Generating {len(tasks)} posts concurrently with max {semaphore._value} at a time")
+    return content_items
+
+async def iter_generated_posts(theme_title: str, theme_story: str, campaign_desc: str, content_items: List[Dict[str, Any]], batch_size: Optional[int] = None):
+    """Yield (plan index, post) pairs in completion order rather than plan order."""
+    # Concurrency is bounded by the process-wide gemini_limiter shared by all call sites
+    async def bounded_task(index, item):
+        print(f"🔄 Starting generation for item: '{item.get('title')}'")
+        try:
+            return [(index, await generate_post_content(
+                theme_title,
+                theme_story,
+                campaign_desc,
+                item
+            ))]
+        except Exception as e:
+            print(f"❌ Error generating post for '{item.get('title')}': {str(e)}")
+            return []
+
+    async def batch_task(offset, batch):
+        try:
+            # generate_post_batch returns one entry per item, in order
+            return list(enumerate(await generate_post_batch(theme_title, theme_story, campaign_desc, batch), offset))
+        except Exception as e:
+            print(f"❌ Error generating batch: {str(e)}")
+            return []
+
+    # Batched mode: pack `batch_size` items into each request
+    batch_size = POST_GENERATION_BATCH_SIZE if batch_size is None else batch_size
+    if batch_size > 1:
+        offsets = range(0, len(content_items), batch_size)
+        print(f"🚀 Generating {len(content_items)} posts in {len(offsets)} batches of up to {batch_size}")
+        tasks = [asyncio.ensure_future(batch_task(i, content_items[i:i + batch_size])) for i in offsets]
+    else:
+        print(f"🚀 Generating {len(content_items)} posts concurrently with limiter window {gemini_limiter.limit}")
+        tasks = [asyncio.ensure_future(bounded_task(i, item)) for i, item in enumerate(content_items)]
+
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            for index, post in await next_done:
+                if post is not None:
+                    yield index, post
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def process_with_semaphore(theme_title: str, theme_story: str, campaign_desc: str, content_plan: Optional[Dict[str, Any]] = None, batch_size: Optional[int] = None):
+    content_items = await prepare_content_items(theme_title, theme_story, content_plan)
+    if not content_items:
+        return []
+
     start_time = time.time()
-    results = await asyncio.gather(*tasks)
+    generated = [
+        pair async for pair in iter_generated_posts(theme_title, theme_story, campaign_desc, content_items, batch_size)
+    ]
+    valid_results = [post for _, post in sorted(generated, key=lambda pair: pair[0])]
     elapsed = time.time() - start_time
-    
-    # Filter out failed generations and log statistics
-    valid_results = [r for r in results if r is not None]
-    print(f"✅ Generated {len(valid_results)}/{len(tasks)} posts in {elapsed:.2f}s")
+    print(f"✅ Generated {len(valid_results)}/{len(content_items)} posts in {elapsed:.2f}s")
     
     return valid_results
 
 
+# Generated posts are written in small batches bounded by size and by time
+POST_SAVE_BATCH_SIZE = int(os.getenv("POST_SAVE_BATCH_SIZE", "3"))
+POST_SAVE_INTERVAL = float(os.getenv("POST_SAVE_INTERVAL", "1.0"))
+
+def format_post_progress(done: int, total: int) -> str:
+    """Theme.post_status value while posts are still being generated."""
+    return f"generating {done}/{total}"
+
 #func test
 def save_posts_to_db(post_contents, campaign_id, theme_id, db):
     """Create posts in the database using optimized bulk insert."""
@@ -428,12 +549,15 @@ def save_posts_to_db(post_contents, campaign_id, theme_id, db):
         return 0
 
 async def generate_posts_from_theme(theme: DBTheme, db_factory, campaign_data: Dict[str, Any] = None) -> int:
-    """Generate posts for a theme using concurrent processing with separate DB sessions"""
+    """Generate posts for a theme using concurrent processing with separate DB sessions.
+
+    `db_factory` returns an AsyncSession (e.g. AsyncSessionLocal).
+    """
     print(f"🚀 Starting post generation for theme ID: {theme.id}")
     
     # Use a separate DB session for the main function
-    with db_factory() as db:
-        campaign = db.query(Campaign).filter(Campaign.id == theme.campaign_id).first()
+    async with db_factory() as db:
+        campaign = await db.get(Campaign, theme.campaign_id)
         if not campaign:
             print(f"❌ Campaign not found for theme ID: {theme.id}")
             return 0
@@ -472,50 +596,148 @@ async def generate_posts_from_theme(theme: DBTheme, db_factory, campaign_data: D
                 print(f"❌ Failed to parse content_plan JSON for theme {theme.id}")
                 content_plan = None
     
-    # Generate posts concurrently - note we're outside the DB session now
-    posts = await process_with_semaphore(
-        theme.title,
-        enriched_story,
-        campaign.description,
-        content_plan
-    )
-    
-    if not posts:
+    topic = theme_topic(theme.id)
+    content_items = await prepare_content_items(theme.title, enriched_story, content_plan)
+    total = len(content_items)
+    if not total:
         print("❌ No posts were generated")
         return 0
-    
-    # Use a separate DB session for saving results
-    with db_factory() as db:
-        # Save posts in batches
-        total_saved = 0
-        batch_size = 10
-        for i in range(0, len(posts), batch_size):
-            batch = posts[i:i + batch_size]
-            batch_posts = []
-            
-            for post_data in batch:
-                post = ContentPost(
-                    campaign_id=theme.campaign_id,
-                    theme_id=theme.id,
-                    title=post_data["title"],
-                    content=post_data["content"],
-                    post_metadata=post_data.get("post_metadata", ""),
-                    status="approved",
-                    image_status="pending"
-                )
-                batch_posts.append(post)
-            
+
+    # Posts are saved as they complete, so created_at comes from their place in
+    # the plan rather than from insert time; listings order by it
+    started_at = datetime.now()
+
+    async def save_batch(batch: List[Tuple[int, Dict[str, Any]]], saved_so_far: int) -> int:
+        """Insert a small batch of (plan index, post) pairs and bump the theme's live progress counter."""
+        async with db_factory() as db:
             try:
-                # Use bulk_save_objects for efficient batch saving
-                db.bulk_save_objects(batch_posts)
-                db.commit()
-                total_saved += len(batch_posts)
-                print(f"✅ Saved batch {i//batch_size + 1}/{(len(posts) + batch_size - 1)//batch_size} ({len(batch_posts)} posts)")
+                db.add_all([
+                    ContentPost(
+                        campaign_id=theme.campaign_id,
+                        theme_id=theme.id,
+                        title=post_data["title"],
+                        content=post_data["content"],
+                        post_metadata=post_data.get("post_metadata", ""),
+                        status="approved",
+                        created_at=started_at + timedelta(microseconds=index),
+                        image_status="pending"
+                    )
+                    for index, post_data in batch
+                ])
+                post_status = format_post_progress(saved_so_far + len(batch), total)
+                await db.execute(update(DBTheme).where(DBTheme.id == theme.id).values(post_status=post_status))
+                await db.commit()
+                print(f"✅ Saved {len(batch)} posts ({saved_so_far + len(batch)}/{total})")
+                event_bus.publish(topic, "progress", {"saved": saved_so_far + len(batch), "total": total, "post_status": post_status})
+                return len(batch)
             except Exception as e:
-                db.rollback()
+                await db.rollback()
                 print(f"❌ Error saving batch: {str(e)}")
+                event_bus.publish(topic, "error", {"message": f"Failed to save {len(batch)} posts: {str(e)}"})
+                return 0
+
+    async with db_factory() as db:
+        await db.execute(update(DBTheme).where(DBTheme.id == theme.id).values(post_status=format_post_progress(0, total)))
+        await db.commit()
+    event_bus.publish(topic, "progress", {"saved": 0, "total": total, "post_status": format_post_progress(0, total)})
+
+    # Generate posts concurrently and persist them as they complete, flushing
+    # whenever the buffer fills up or its oldest post has waited long enough
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        try:
+            async for pair in iter_generated_posts(theme.title, enriched_story, campaign.description, content_items):
+                await queue.put(pair)
+        finally:
+            await queue.put(None)
+
+    producer = asyncio.create_task(produce())
+    total_saved = 0
+    buffer: List[Tuple[int, Dict[str, Any]]] = []
+    deadline = None
+    finished = False
+    generated = 0
+    try:
+        while not finished:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                pair = await asyncio.wait_for(queue.get(), timeout=timeout)
+                if pair is None:
+                    finished = True
+                else:
+                    _, post_data = pair
+                    buffer.append(pair)
+                    generated += 1
+                    # Stream the post to subscribers before it is persisted
+                    event_bus.publish(topic, "post", {"index": generated, "total": total, **post_data})
+                    if deadline is None:
+                        deadline = time.monotonic() + POST_SAVE_INTERVAL
+            except asyncio.TimeoutError:
+                pass
+            if buffer and (finished or len(buffer) >= POST_SAVE_BATCH_SIZE or time.monotonic() >= deadline):
+                total_saved += await save_batch(buffer, total_saved)
+                buffer, deadline = [], None
+        # Surface any error raised while generating
+        await producer
+    finally:
+        producer.cancel()
+
+    return total_saved
+
+
+async def generate_posts_background(theme_id: int, db_factory):
+    """Background task to generate posts with proper DB session management.
+
+    A failed generation is recorded on the theme (post_status="error") and
+    then re-raised, so the generate_posts job is retried.
+    """
+    # Create a fresh DB session
+    async with db_factory() as db:
+        theme = await db.get(DBTheme, theme_id)
+        if not theme:
+            notify(db, f"⚠️ Theme {theme_id} not found", kind="posts_generation_failed")
+            await db.commit()
+            return
+            
+        print(f"DEBUG: Starting post generation for theme {theme_id}")
+        
+        # Set status to pending
+        theme.post_status = "pending"
+        await db.commit()
+        
+        # Fetch campaign data
+        campaign = await db.get(Campaign, theme.campaign_id)
+        if not campaign:
+            notify(db, f"⚠️ Campaign not found for theme {theme_id}", kind="posts_generation_failed")
+            await db.commit()
+            return
+            
+        campaign_data = campaign.campaign_data if campaign.campaign_data else {}
+    
+    try:
+        # Call generate_posts_from_theme with the db_factory
+        generated_count = await generate_posts_from_theme(theme, db_factory, campaign_data=campaign_data)
+        
+        # Update theme status with a fresh session
+        async with db_factory() as db:
+            await db.execute(update(DBTheme).where(DBTheme.id == theme_id).values(post_status="ready"))
+            notify(db, f"✨ Successfully generated {generated_count} posts for theme {theme_id}", kind="posts_generated")
+            await db.commit()
+        
+        event_bus.publish(theme_topic(theme_id), "done", {"theme_id": theme_id, "status": "ready", "generated": generated_count})
+    except Exception as e:
+        print(f"DEBUG: Error generating posts: {str(e)}")
+        # Update status to error with a fresh session
+        async with db_factory() as db:
+            await db.execute(update(DBTheme).where(DBTheme.id == theme_id).values(post_status="error"))
+            notify(db, f"⚠️ Posts generation failed: {str(e)}", kind="posts_generation_failed")
+            await db.commit()
         
-        return total_saved
+        event_bus.publish(theme_topic(theme_id), "error", {"message": str(e)})
+        event_bus.publish(theme_topic(theme_id), "done", {"theme_id": theme_id, "status": "error"})
+        # Let the job queue retry with backoff; the status above is what the UI shows meanwhile
+        raise
 
 
 def approve_post(post_id: int, db: Session) -> ContentPost:
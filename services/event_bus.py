@@ -0,0 +1,57 @@
+import json
+import asyncio
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Set
+
+logger = logging.getLogger(__name__)
+
+
+def theme_topic(theme_id: int) -> str:
+    return f"theme:{theme_id}"
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Encode one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+class EventBus:
+    """In-process pub/sub used to fan generation events out to SSE subscribers.
+
+    Publishing never blocks: a slow subscriber whose queue is full loses its
+    oldest event instead of holding up the generator.
+    """
+
+    def __init__(self, max_queue_size: int = 1000):
+        self.max_queue_size = max_queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+
+    @contextmanager
+    def subscription(self, topic: str):
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._subscribers[topic].add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+    def publish(self, topic: str, event: str, data: Any = None):
+        for queue in list(self._subscribers.get(topic, ())):
+            if queue.full():
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait({"event": event, "data": data})
+
+    def subscriber_count(self, topic: str) -> int:
+        return len(self._subscribers.get(topic, ()))
+
+
+event_bus = EventBus()
@@ -0,0 +1,153 @@
+"""Named, bounded thread pools for blocking SDK calls.
+
+Everything that cannot be awaited (google-cloud-storage, Veo's sync genai
+calls, MarkItDown conversions, Excel exports) runs on the pool of its
+dependency instead of the loop's default executor, so a burst of slow
+video polls cannot starve GCS uploads and vice versa. Pool sizes come from
+EXECUTOR_<NAME>_WORKERS; queue depth and wait times are reported on
+/metrics/executors.
+"""
+import os
+import time
+import asyncio
+import logging
+import functools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+GCS = "gcs"
+VEO = "veo"
+MARKITDOWN = "markitdown"
+EXCEL = "excel"
+
+# Default thread count per pool; override with EXECUTOR_<NAME>_WORKERS
+EXECUTOR_SIZES = {
+    GCS: int(os.getenv("EXECUTOR_GCS_WORKERS", "8")),
+    VEO: int(os.getenv("EXECUTOR_VEO_WORKERS", "4")),
+    MARKITDOWN: int(os.getenv("EXECUTOR_MARKITDOWN_WORKERS", "2")),
+    EXCEL: int(os.getenv("EXECUTOR_EXCEL_WORKERS", "2")),
+}
+EXECUTOR_SHUTDOWN_TIMEOUT = float(os.getenv("EXECUTOR_SHUTDOWN_TIMEOUT", "30"))
+
+
+def _percentile(samples, fraction: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[int(fraction * (len(ordered) - 1))], 3)
+
+
+class BoundedExecutor:
+    """A ThreadPoolExecutor with `workers` threads that counts queued and running calls."""
+
+    def __init__(self, name: str, workers: int, sample_size: int = 500):
+        self.name = name
+        self.workers = max(1, workers)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"{name}-")
+        # Counters are updated from the pool's threads and the event loop
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self._wait_times = deque(maxlen=sample_size)
+        self._run_times = deque(maxlen=sample_size)
+
+    def _call(self, fn: Callable, submitted: float):
+        started = time.monotonic()
+        with self._lock:
+            self._wait_times.append(started - submitted)
+            self.queued -= 1
+            self.running += 1
+        try:
+            return fn()
+        finally:
+            with self._lock:
+                self.running -= 1
+                self._run_times.append(time.monotonic() - started)
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Run `fn(*args, **kwargs)` on this pool and await its result."""
+        call = functools.partial(fn, *args, **kwargs)
+        with self._lock:
+            self.queued += 1
+        try:
+            future = asyncio.get_running_loop().run_in_executor(
+                self._pool, self._call, call, time.monotonic()
+            )
+        except RuntimeError:
+            # Pool already shut down
+            with self._lock:
+                self.queued -= 1
+            raise
+        try:
+            result = await future
+        except Exception:
+            self.failed += 1
+            raise
+        self.completed += 1
+        return result
+
+    def shutdown(self):
+        # Calls still queued are dropped; running ones finish
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            wait_times, run_times = list(self._wait_times), list(self._run_times)
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "wait_seconds": {"p50": _percentile(wait_times, 0.5), "p95": _percentile(wait_times, 0.95)},
+            "run_seconds": {"p50": _percentile(run_times, 0.5), "p95": _percentile(run_times, 0.95)},
+        }
+
+
+class ExecutorRegistry:
+    """Process-wide BoundedExecutors, created on first use and shut down from the lifespan."""
+
+    def __init__(self, sizes: Dict[str, int] = EXECUTOR_SIZES):
+        self._sizes = sizes
+        self._executors: Dict[str, BoundedExecutor] = {}
+
+    def get(self, name: str) -> BoundedExecutor:
+        executor = self._executors.get(name)
+        if executor is None:
+            if name not in self._sizes:
+                raise ValueError(f"Unknown executor: {name}")
+            executor = BoundedExecutor(name, self._sizes[name])
+            self._executors[name] = executor
+            logger.info(f"Created executor '{name}' with {executor.workers} threads")
+        return executor
+
+    async def run(self, name: str, fn: Callable, *args, **kwargs):
+        return await self.get(name).run(fn, *args, **kwargs)
+
+    async def shutdown(self, timeout: float = EXECUTOR_SHUTDOWN_TIMEOUT):
+        executors = list(self._executors.items())
+        self._executors.clear()
+        for name, executor in executors:
+            try:
+                # shutdown() blocks until running calls return, so wait for it off the loop
+                await asyncio.wait_for(asyncio.to_thread(executor.shutdown), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Executor '{name}' still busy after {timeout}s; abandoning its threads")
+            except Exception as e:
+                logger.warning(f"Error shutting down executor '{name}': {e}")
+
+    def stats(self) -> Dict[str, dict]:
+        return {name: executor.stats() for name, executor in self._executors.items()}
+
+
+executors = ExecutorRegistry()
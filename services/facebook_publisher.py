@@ -0,0 +1,418 @@
+"""Async Facebook Graph publishing engine.
+
+One pooled httpx client is shared by every publish. Parallelism is bounded
+by a semaphore, and each request first takes a token from its page's and its
+access token's bucket. Feed posts are not idempotent, so only calls Graph
+certainly rejected are retried: throttling (HTTP 429 or error codes 4, 17,
+32 and 613) and connections that never opened. They back off with jittered
+exponential delays (or Retry-After), and the page's bucket is drained for
+the backoff so siblings don't keep hammering a throttled page. Read
+timeouts and 5xx may already have published and fail without a resend.
+
+publish_batch() packs up to FACEBOOK_BATCH_SIZE (at most 50, the Graph
+limit) feed posts per page/token into one Graph batch request, decodes the
+per-item results and re-batches only the items that were throttled.
+FacebookBatcher coalesces single publishes made within
+FACEBOOK_BATCH_WINDOW_MS of each other into such batches.
+
+FACEBOOK_GRAPH_URL points the engine at another server, e.g. the fake one in
+benchmarks/fake_graph_api.py.
+"""
+import os
+import json
+import random
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlencode
+
+import httpx
+from dotenv import load_dotenv
+from services.http_clients import NOT_SENT_ERRORS
+from services.rate_limit import KeyedTokenBuckets
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+FACEBOOK_GRAPH_URL = os.getenv("FACEBOOK_GRAPH_URL", "https://graph.facebook.com/v18.0").rstrip("/")
+FACEBOOK_PUBLISH_CONCURRENCY = int(os.getenv("FACEBOOK_PUBLISH_CONCURRENCY", "20"))
+FACEBOOK_PAGE_RPS = float(os.getenv("FACEBOOK_PAGE_RPS", "50"))
+FACEBOOK_TOKEN_RPS = float(os.getenv("FACEBOOK_TOKEN_RPS", "50"))
+FACEBOOK_PUBLISH_MAX_ATTEMPTS = int(os.getenv("FACEBOOK_PUBLISH_MAX_ATTEMPTS", "5"))
+FACEBOOK_RETRY_BASE_SECONDS = float(os.getenv("FACEBOOK_RETRY_BASE_SECONDS", "1"))
+FACEBOOK_RETRY_MAX_SECONDS = float(os.getenv("FACEBOOK_RETRY_MAX_SECONDS", "60"))
+# Graph accepts at most 50 requests per batch
+FACEBOOK_BATCH_SIZE = min(50, int(os.getenv("FACEBOOK_BATCH_SIZE", "50")))
+FACEBOOK_BATCH_WINDOW_MS = float(os.getenv("FACEBOOK_BATCH_WINDOW_MS", "50"))
+
+# Graph API throttling codes: app, user, page and per-call rate limits
+RATE_LIMIT_CODES = {4, 17, 32, 613}
+
+
+class PublishResult(NamedTuple):
+    ok: bool
+    facebook_post_id: Optional[str] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    # Failed in a way Facebook may still have published; must not be sent again
+    outcome_unknown: bool = False
+
+
+class PublishItem(NamedTuple):
+    post_id: int
+    message: str
+    page_id: Optional[str] = None
+    access_token: Optional[str] = None
+
+
+class _ItemOutcome(NamedTuple):
+    ok: bool
+    facebook_post_id: Optional[str] = None
+    error: Optional[str] = None
+    retryable: bool = False
+    throttled: bool = False
+    retry_after: float = 0.0
+    unknown: bool = False
+
+
+def graph_error(response: httpx.Response) -> dict:
+    try:
+        return response.json().get("error") or {}
+    except ValueError:
+        return {}
+
+
+def is_rate_limited(response: httpx.Response) -> bool:
+    return response.status_code == 429 or graph_error(response).get("code") in RATE_LIMIT_CODES
+
+
+def retry_after(response: httpx.Response) -> float:
+    try:
+        return float(response.headers.get("Retry-After", 0))
+    except ValueError:
+        return 0.0
+
+
+class FacebookPublisher:
+    def __init__(
+        self,
+        graph_url: str = FACEBOOK_GRAPH_URL,
+        concurrency: int = FACEBOOK_PUBLISH_CONCURRENCY,
+        page_rps: float = FACEBOOK_PAGE_RPS,
+        token_rps: float = FACEBOOK_TOKEN_RPS,
+        max_attempts: int = FACEBOOK_PUBLISH_MAX_ATTEMPTS,
+        retry_base: float = FACEBOOK_RETRY_BASE_SECONDS,
+        retry_max: float = FACEBOOK_RETRY_MAX_SECONDS,
+        batch_size: int = FACEBOOK_BATCH_SIZE,
+    ):
+        self.graph_url = graph_url.rstrip("/")
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.batch_size = max(1, min(50, batch_size))
+        self.page_buckets = KeyedTokenBuckets(page_rps)
+        self.token_buckets = KeyedTokenBuckets(token_rps)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.published = 0
+        self.failed = 0
+        self.retries = 0
+        self.throttled = 0
+        self.batches = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(30.0, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=self.concurrency,
+                    max_keepalive_connections=self.concurrency,
+                ),
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._client
+
+    def _backoff(self, attempt: int) -> float:
+        ceiling = min(self.retry_max, self.retry_base * (2 ** (attempt - 1)))
+        return random.uniform(ceiling / 2, ceiling)
+
+    async def publish(self, message: str, page_id: str = None, access_token: str = None) -> PublishResult:
+        """Post `message` to the page feed, retrying only calls Facebook certainly didn't run.
+
+        Throttled calls and connections that never opened are retried; read
+        timeouts and 5xx may have published already, so they fail without a
+        second send.
+        """
+        page_id = page_id or os.getenv("FACEBOOK_PAGE_ID")
+        access_token = access_token or os.getenv("FACEBOOK_PAGE_ACCESS_TOKEN")
+        if not page_id or not access_token:
+            return PublishResult(False, error="Facebook credentials not configured")
+
+        client = self.client
+        error, unknown = None, False
+        for attempt in range(1, self.max_attempts + 1):
+            await self.page_buckets.acquire(page_id)
+            await self.token_buckets.acquire(access_token)
+            throttled, wait = False, 0.0
+            try:
+                async with self._semaphore:
+                    response = await client.post(
+                        f"{self.graph_url}/{page_id}/feed",
+                        data={"message": message, "access_token": access_token},
+                    )
+            except NOT_SENT_ERRORS as e:
+                error = f"{type(e).__name__}: {e}"
+                retryable = True
+            except httpx.TransportError as e:
+                # Facebook may have created the post before the connection failed
+                error = f"{type(e).__name__}: {e} (outcome unknown, not retried)"
+                retryable, unknown = False, True
+            else:
+                if response.status_code == 200:
+                    self.published += 1
+                    return PublishResult(True, facebook_post_id=response.json().get("id"), attempts=attempt)
+                details = graph_error(response)
+                error = f"HTTP {response.status_code}: {details.get('message') or response.text[:500]}"
+                # Feed posts aren't idempotent: a 5xx may still have published, so only
+                # throttling (which rejects the call outright) is retried
+                throttled = is_rate_limited(response)
+                retryable = throttled
+                wait = retry_after(response)
+                if response.status_code >= 500:
+                    error += " (outcome unknown, not retried)"
+                    unknown = True
+
+            if not retryable or attempt == self.max_attempts:
+                break
+            delay = max(self._backoff(attempt), wait)
+            if throttled:
+                self.throttled += 1
+                self.page_buckets.get(page_id).penalize(delay)
+            self.retries += 1
+            logger.warning(f"Facebook publish attempt {attempt} failed ({error}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+        self.failed += 1
+        return PublishResult(False, error=error, attempts=attempt, outcome_unknown=unknown)
+
+    async def publish_many(self, items: Iterable[PublishItem]) -> List[PublishResult]:
+        """Publish all items concurrently; results come back in input order."""
+        items = list(items)
+        results = await asyncio.gather(
+            *[self.publish(item.message, item.page_id, item.access_token) for item in items],
+            return_exceptions=True,
+        )
+        return [
+            r if isinstance(r, PublishResult)
+            else PublishResult(False, error=f"{type(r).__name__}: {r}", outcome_unknown=True)
+            for r in results
+        ]
+
+    def _credentials(self, item: PublishItem) -> PublishItem:
+        return item._replace(
+            page_id=item.page_id or os.getenv("FACEBOOK_PAGE_ID"),
+            access_token=item.access_token or os.getenv("FACEBOOK_PAGE_ACCESS_TOKEN"),
+        )
+
+    async def _send_batch(self, page_id: str, access_token: str, chunk: List[PublishItem]) -> List[_ItemOutcome]:
+        """POST one Graph batch of feed posts; one outcome per item, in order."""
+        # Graph counts every item of a batch against the rate limits
+        for buckets, key in ((self.page_buckets, page_id), (self.token_buckets, access_token)):
+            bucket = buckets.get(key)
+            await bucket.acquire(min(len(chunk), bucket.capacity))
+        batch = [
+            {"method": "POST", "relative_url": f"{page_id}/feed", "body": urlencode({"message": item.message})}
+            for item in chunk
+        ]
+        client = self.client
+        self.batches += 1
+        try:
+            async with self._semaphore:
+                response = await client.post(
+                    f"{self.graph_url}/",
+                    data={"access_token": access_token, "batch": json.dumps(batch), "include_headers": "false"},
+                )
+        except NOT_SENT_ERRORS as e:
+            return [_ItemOutcome(False, error=f"{type(e).__name__}: {e}", retryable=True)] * len(chunk)
+        except httpx.TransportError as e:
+            # Graph may have run some or all of the batch before the connection failed
+            error = f"{type(e).__name__}: {e} (outcome unknown, not retried)"
+            return [_ItemOutcome(False, error=error, unknown=True)] * len(chunk)
+
+        if response.status_code != 200:
+            details = graph_error(response)
+            throttled = is_rate_limited(response)
+            error = f"HTTP {response.status_code}: {details.get('message') or response.text[:500]}"
+            if response.status_code >= 500:
+                error += " (outcome unknown, not retried)"
+            outcome = _ItemOutcome(
+                False, error=error, retryable=throttled, throttled=throttled,
+                retry_after=retry_after(response), unknown=response.status_code >= 500,
+            )
+            return [outcome] * len(chunk)
+
+        unknown = "Batch item not reported (outcome unknown, not retried)"
+        outcomes = []
+        for entry in response.json():
+            if entry is None:
+                # Graph timed out around this item and may or may not have run it
+                outcomes.append(_ItemOutcome(False, error=unknown, unknown=True))
+                continue
+            code = entry.get("code") or 0
+            try:
+                body = json.loads(entry.get("body") or "{}")
+            except ValueError:
+                body = {}
+            if code == 200:
+                outcomes.append(_ItemOutcome(True, facebook_post_id=body.get("id")))
+                continue
+            details = body.get("error") or {}
+            # Only throttled items were certainly not published, so only they are re-sent
+            throttled = code == 429 or details.get("code") in RATE_LIMIT_CODES
+            error = f"HTTP {code}: {details.get('message') or entry.get('body')}"
+            if code >= 500:
+                error += " (outcome unknown, not retried)"
+            outcomes.append(_ItemOutcome(
+                False,
+                error=error,
+                retryable=throttled,
+                throttled=throttled,
+                unknown=code >= 500,
+            ))
+        missing = len(chunk) - len(outcomes)
+        outcomes.extend([_ItemOutcome(False, error=unknown, unknown=True)] * missing)
+        return outcomes
+
+    async def publish_batch(self, items: Iterable[PublishItem]) -> List[PublishResult]:
+        """Publish through Graph batch requests; results come back in input order.
+
+        Items are grouped by page and token and sent batch_size at a time.
+        After each round only throttled items, and whole batches whose
+        connection never opened, are re-batched, with the same jittered
+        backoff and Retry-After handling as publish(). Items Graph may have
+        run (null entries, read timeouts, 5xx) fail without a resend.
+        """
+        items = list(items)
+        results: List[Optional[PublishResult]] = [None] * len(items)
+        pending: List[Tuple[int, PublishItem]] = []
+        for index, item in enumerate(items):
+            item = self._credentials(item)
+            if not item.page_id or not item.access_token:
+                results[index] = PublishResult(False, error="Facebook credentials not configured")
+                self.failed += 1
+            else:
+                pending.append((index, item))
+
+        attempt = 0
+        while pending:
+            attempt += 1
+            groups = defaultdict(list)
+            for index, item in pending:
+                groups[(item.page_id, item.access_token)].append((index, item))
+            calls = [
+                (page_id, token, members[start:start + self.batch_size])
+                for (page_id, token), members in groups.items()
+                for start in range(0, len(members), self.batch_size)
+            ]
+            outcomes = await asyncio.gather(
+                *[self._send_batch(page_id, token, [item for _, item in chunk]) for page_id, token, chunk in calls]
+            )
+
+            retry, throttled_pages, wait = [], set(), 0.0
+            for (page_id, _, chunk), chunk_outcomes in zip(calls, outcomes):
+                for (index, item), outcome in zip(chunk, chunk_outcomes):
+                    if outcome.ok:
+                        results[index] = PublishResult(True, facebook_post_id=outcome.facebook_post_id, attempts=attempt)
+                        self.published += 1
+                    elif outcome.retryable and attempt < self.max_attempts:
+                        retry.append((index, item))
+                        wait = max(wait, outcome.retry_after)
+                        if outcome.throttled:
+                            throttled_pages.add(page_id)
+                    else:
+                        results[index] = PublishResult(False, error=outcome.error, attempts=attempt,
+                                                       outcome_unknown=outcome.unknown)
+                        self.failed += 1
+
+            pending = retry
+            if pending:
+                delay = max(self._backoff(attempt), wait)
+                for page_id in throttled_pages:
+                    self.throttled += 1
+                    self.page_buckets.get(page_id).penalize(delay)
+                self.retries += len(pending)
+                logger.warning(f"Re-batching {len(pending)} failed Facebook publish(es) in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        return results
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {
+            "published": self.published,
+            "failed": self.failed,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "batches": self.batches,
+            "concurrency": self.concurrency,
+            "in_flight": (self.concurrency - self._semaphore._value) if self._semaphore else 0,
+            "pages": len(self.page_buckets),
+            "tokens": len(self.token_buckets),
+        }
+
+
+class FacebookBatcher:
+    """Coalesces single publishes into publish_batch() calls.
+
+    A submit waits at most `window` seconds for company; a full batch is sent
+    right away.
+    """
+
+    def __init__(self, publisher: FacebookPublisher, window: float = FACEBOOK_BATCH_WINDOW_MS / 1000,
+                 max_items: int = FACEBOOK_BATCH_SIZE):
+        self.publisher = publisher
+        self.window = window
+        self.max_items = max_items
+        self._pending: List[Tuple[PublishItem, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes = set()
+
+    async def submit(self, message: str, page_id: str = None, access_token: str = None) -> PublishResult:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((PublishItem(0, message, page_id, access_token), future))
+        if len(self._pending) >= self.max_items:
+            self._flush_now()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush_now)
+        return await future
+
+    def _flush_now(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if pending:
+            task = asyncio.create_task(self._flush(pending))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, pending: List[Tuple[PublishItem, asyncio.Future]]):
+        try:
+            results = await self.publisher.publish_batch([item for item, _ in pending])
+        except Exception as e:
+            results = [PublishResult(False, error=f"{type(e).__name__}: {e}", outcome_unknown=True)] * len(pending)
+        for (_, future), result in zip(pending, results):
+            if not future.done():
+                future.set_result(result)
+
+
+facebook_publisher = FacebookPublisher()
+facebook_batcher = FacebookBatcher(facebook_publisher)
@@ -3,10 +3,11 @@ import logging
 import asyncio
 import random
 from together import AsyncTogether
-import pyshorteners
 
 from dotenv import load_dotenv
 
+from services.locaith_handler import shorten_url
+
 load_dotenv()
 
 PLACEHOLDER_ERROR_IMAGE = "/placeholder.png"
@@ -74,15 +75,8 @@ async def generate_and_upload_flux(
             if hasattr(response.data[0], 'url') and response.data[0].url:
                 url = response.data[0].url
                 logging.info(f"✅ Image generated: {url}")
-                try:
-                    # Try to shorten URL with TinyURL
-                    shortener = pyshorteners.Shortener()
-                    short_url = shortener.tinyurl.short(url)
-                    logging.info(f"🔗 URL shortened: {short_url}")
-                    return short_url
-                except Exception as e:
-                    logging.warning(f"⚠️ URL shortening failed, using original URL: {str(e)}")
-                    return url
+                # TinyURL through the shared async client; falls back to the original URL
+                return await shorten_url(url)
             else:
                 logging.error("❌ No image URL in response")
                 retry_count += 1
@@ -0,0 +1,160 @@
+"""Long-lived Google Cloud Storage uploader.
+
+One storage.Client is created on first use and shared by every upload, and
+a bucket is checked with bucket.exists() only the first time it is used.
+Uploads run on the gcs executor, at most GCS_UPLOAD_CONCURRENCY at a time,
+and get a Cache-Control header so the CDN and browsers keep the
+(uuid-named, never rewritten) objects.
+
+Nothing forces a garbage collection: image bytes are dropped once the
+upload returns, and stats() reports the process's resident memory and GC
+counters on /metrics/storage so the effect can be watched instead of
+assumed.
+"""
+import gc
+import os
+import sys
+import asyncio
+import logging
+import resource
+import threading
+from io import BytesIO
+from typing import Dict, Optional
+
+from google.cloud import storage
+from dotenv import load_dotenv
+
+from services.executors import executors, GCS
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+GCS_UPLOAD_CONCURRENCY = int(os.getenv("GCS_UPLOAD_CONCURRENCY", "8"))
+# Object names carry a uuid and are never overwritten, so they can be cached for good
+GCS_CACHE_CONTROL = os.getenv("GCS_CACHE_CONTROL", "public, max-age=31536000, immutable")
+GCS_UPLOAD_TIMEOUT = float(os.getenv("GCS_UPLOAD_TIMEOUT", "120"))
+GCS_UPLOAD_RETRIES = int(os.getenv("GCS_UPLOAD_RETRIES", "3"))
+# Larger objects are sent as resumable uploads in chunks of this size
+GCS_CHUNK_SIZE = 2 * 1024 * 1024
+
+
+class BucketNotFound(Exception):
+    pass
+
+
+def _rss_bytes() -> Optional[int]:
+    """Current resident set size; Linux only."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def memory_stats() -> dict:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    if sys.platform != "darwin":
+        peak *= 1024
+    rss = _rss_bytes()
+    return {
+        "rss_mb": round(rss / 2**20, 1) if rss is not None else None,
+        "peak_rss_mb": round(peak / 2**20, 1),
+        "gc_collections": [generation["collections"] for generation in gc.get_stats()],
+        "gc_pending": list(gc.get_count()),
+    }
+
+
+class GCSUploader:
+    def __init__(self, concurrency: int = GCS_UPLOAD_CONCURRENCY, cache_control: str = GCS_CACHE_CONTROL):
+        self.concurrency = max(1, concurrency)
+        self.cache_control = cache_control
+        self._client: Optional[storage.Client] = None
+        self._client_lock = threading.Lock()
+        self._buckets: Dict[str, storage.Bucket] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.uploads = 0
+        self.failures = 0
+        self.bytes_uploaded = 0
+
+    def _get_client(self) -> storage.Client:
+        # Runs on the gcs executor; creating the client resolves credentials
+        with self._client_lock:
+            if self._client is None:
+                self._client = storage.Client()
+                logger.info("Created shared GCS client")
+            return self._client
+
+    def _validate_bucket(self, bucket_name: str) -> storage.Bucket:
+        bucket = self._get_client().bucket(bucket_name)
+        if not bucket.exists():
+            raise BucketNotFound(f"Bucket {bucket_name} does not exist.")
+        return bucket
+
+    async def bucket(self, bucket_name: str) -> storage.Bucket:
+        """The cached handle of a bucket that has been checked to exist."""
+        bucket = self._buckets.get(bucket_name)
+        if bucket is None:
+            bucket = await executors.run(GCS, self._validate_bucket, bucket_name)
+            self._buckets[bucket_name] = bucket
+        return bucket
+
+    async def public_url(self, bucket_name: str, blob_name: str) -> str:
+        client = await executors.run(GCS, self._get_client)
+        return client.bucket(bucket_name).blob(blob_name).public_url
+
+    def _upload(self, blob: storage.Blob, data: bytes, content_type: str):
+        # BytesIO over an immutable bytes object shares its buffer rather than copying it
+        stream = BytesIO(data)
+        blob.upload_from_file(
+            stream,
+            content_type=content_type,
+            size=len(data),
+            num_retries=GCS_UPLOAD_RETRIES,
+            timeout=GCS_UPLOAD_TIMEOUT,
+        )
+
+    async def upload(self, data: bytes, bucket_name: str, blob_name: str,
+                     content_type: str = "image/png") -> str:
+        """Upload `data` as `blob_name` and return its public URL; raises on failure."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                bucket = await self.bucket(bucket_name)
+                blob = bucket.blob(blob_name)
+                blob.chunk_size = GCS_CHUNK_SIZE
+                blob.cache_control = self.cache_control
+                await executors.run(GCS, self._upload, blob, data, content_type)
+            except Exception:
+                self.failures += 1
+                raise
+            finally:
+                self.in_flight -= 1
+        self.uploads += 1
+        self.bytes_uploaded += len(data)
+        return blob.public_url
+
+    def close(self):
+        with self._client_lock:
+            client, self._client = self._client, None
+        self._buckets.clear()
+        if client is not None:
+            client.close()
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "uploads": self.uploads,
+            "failures": self.failures,
+            "uploaded_mb": round(self.bytes_uploaded / 2**20, 1),
+            "buckets": sorted(self._buckets),
+            "memory": memory_stats(),
+        }
+
+
+gcs_uploader = GCSUploader()
@@ -0,0 +1,183 @@
+import os
+import logging
+import threading
+from typing import Dict
+
+import httpx
+from google import genai
+from google.genai import types
+from dotenv import load_dotenv
+from services.gemini_limiter import gemini_limiter
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+API_KEY = "api_key"
+VERTEX = "vertex"
+
+# Connection pool settings shared by every long-lived Gemini client
+GEMINI_MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "50"))
+GEMINI_MAX_KEEPALIVE = int(os.getenv("GEMINI_MAX_KEEPALIVE", "20"))
+GEMINI_KEEPALIVE_EXPIRY = float(os.getenv("GEMINI_KEEPALIVE_EXPIRY", "120"))
+
+
+class _ClientStats:
+    def __init__(self):
+        self.reuse_count = 0
+        self.in_flight = 0
+        self.total_calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+
+    def as_dict(self):
+        return {
+            "reuse_count": self.reuse_count,
+            "in_flight": self.in_flight,
+            "total_calls": self.total_calls,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+        }
+
+
+class _TrackedCall:
+    """Context manager that yields a registry client and counts the call as in flight."""
+
+    def __init__(self, client: genai.Client, stats: _ClientStats, lock: threading.Lock):
+        self._client = client
+        self._stats = stats
+        self._lock = lock
+
+    def _enter(self):
+        with self._lock:
+            self._stats.in_flight += 1
+            self._stats.total_calls += 1
+
+    def _exit(self, exc_type):
+        with self._lock:
+            self._stats.in_flight -= 1
+            if exc_type is not None:
+                self._stats.errors += 1
+
+    def __enter__(self):
+        self._enter()
+        return self._client
+
+    def __exit__(self, exc_type, exc, tb):
+        self._exit(exc_type)
+        return False
+
+    async def __aenter__(self):
+        self._enter()
+        return self._client
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._exit(exc_type)
+        return False
+
+
+class GeminiClientRegistry:
+    """Process-wide holder of long-lived genai clients (API key and Vertex variants).
+
+    Clients are created once and reused so the underlying httpx pools keep
+    their connections alive between calls instead of re-doing TLS and auth.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, genai.Client] = {}
+        self._stats: Dict[str, _ClientStats] = {}
+        self._lock = threading.Lock()
+
+    def _http_options(self) -> types.HttpOptions:
+        limits = httpx.Limits(
+            max_connections=GEMINI_MAX_CONNECTIONS,
+            max_keepalive_connections=GEMINI_MAX_KEEPALIVE,
+            keepalive_expiry=GEMINI_KEEPALIVE_EXPIRY,
+        )
+        return types.HttpOptions(
+            client_args={"limits": limits},
+            async_client_args={"limits": limits},
+        )
+
+    def _create(self, kind: str) -> genai.Client:
+        if kind == API_KEY:
+            return genai.Client(api_key=os.getenv("GEMINI_API_KEY"), http_options=self._http_options())
+        if kind == VERTEX:
+            return genai.Client(
+                vertexai=True,
+                project=os.environ.get("GOOGLE_CLOUD_PROJECT", "marketing-475304"),
+                location=os.environ.get("GOOGLE_CLOUD_REGION", "us-central1"),
+                http_options=self._http_options(),
+            )
+        raise ValueError(f"Unknown Gemini client kind: {kind}")
+
+    def get(self, kind: str = API_KEY) -> genai.Client:
+        """Return the shared client for `kind`, creating it on first use."""
+        with self._lock:
+            client = self._clients.get(kind)
+            if client is None:
+                client = self._create(kind)
+                self._clients[kind] = client
+                self._stats[kind] = _ClientStats()
+                logger.info(f"Created shared Gemini client '{kind}'")
+            else:
+                self._stats[kind].reuse_count += 1
+            return client
+
+    def use(self, kind: str = API_KEY) -> _TrackedCall:
+        """`with`/`async with` wrapper that yields the `kind` client and tracks the call."""
+        client = self.get(kind)
+        return _TrackedCall(client, self._stats[kind], self._lock)
+
+    def record_usage(self, kind: str, response):
+        """Accumulate token usage reported on a generate_content response."""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None or kind not in self._stats:
+            return
+        with self._lock:
+            self._stats[kind].prompt_tokens += usage.prompt_token_count or 0
+            self._stats[kind].output_tokens += usage.candidates_token_count or 0
+
+    def start(self, kinds=(API_KEY,)):
+        """Eagerly create clients, e.g. from the app lifespan."""
+        for kind in kinds:
+            try:
+                self.get(kind)
+            except Exception as e:
+                logger.error(f"Failed to create Gemini client '{kind}': {e}")
+
+    async def aclose(self):
+        with self._lock:
+            clients = list(self._clients.items())
+            self._clients.clear()
+        for kind, client in clients:
+            try:
+                await client.aio.aclose()
+                client.close()
+            except Exception as e:
+                logger.warning(f"Error closing Gemini client '{kind}': {e}")
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            return {kind: stats.as_dict() for kind, stats in self._stats.items()}
+
+
+gemini_clients = GeminiClientRegistry()
+
+
+def get_gemini_client(kind: str = API_KEY) -> genai.Client:
+    return gemini_clients.get(kind)
+
+
+async def generate_content(kind: str = API_KEY, **kwargs):
+    """Run `client.aio.models.generate_content` on the shared `kind` client.
+
+    Every call goes through the process-wide adaptive limiter.
+    """
+    async with gemini_limiter.slot():
+        async with gemini_clients.use(kind) as client:
+            response = await client.aio.models.generate_content(**kwargs)
+    gemini_clients.record_usage(kind, response)
+    return response
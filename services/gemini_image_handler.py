@@ -1,124 +1,70 @@
 import os
-import gc
 import uuid
-import time
+import random
 import logging
 import asyncio
-from io import BytesIO
 
-from google import genai
 from google.genai import types
-from google.cloud import storage
 from dotenv import load_dotenv
+from services.gemini_client import gemini_clients
+from services.gemini_limiter import imagen_limiter
+from services.gcs_uploader import gcs_uploader
 
 load_dotenv()
 # Constants
 PLACEHOLDER_ERROR_IMAGE = "/placeholder.png"
-rate_limit_delay = 2  # seconds between calls
-semaphore = asyncio.Semaphore(1)  # sequential rate-limited calls
+IMAGEN_MODEL = os.getenv("IMAGEN_MODEL", "imagen-3.0-generate-002")
+IMAGEN_MAX_ATTEMPTS = int(os.getenv("IMAGEN_MAX_ATTEMPTS", "3"))
 
 
-def generate_image_gemini(prompt: str):
-    """Generate image from Gemini (sync) with optimized memory handling"""
-    max_retries = 3
-    retry_delay = 1
-    client_gemini = None
+async def generate_image_gemini_async(prompt: str):
+    """Generate image bytes with Imagen on the shared client, or None on failure.
 
-    try:
-        client_gemini = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
-        for attempt in range(max_retries):
-            try:
-                logging.info(f"🎨 Gemini generation attempt {attempt + 1}: {prompt}")
-                response = client_gemini.models.generate_images(
-                    model="imagen-3.0-generate-002",
-                    prompt=prompt,
-                    config=types.GenerateImagesConfig(
-                        number_of_images=1,
-                        aspect_ratio="9:16",
-                        personGeneration="ALLOW_ADULT"
+    Every attempt takes a slot from the process-wide imagen_limiter, so
+    concurrent callers share the IMAGEN_RPM quota instead of queueing
+    behind each other; 429s slow the limiter down and are retried.
+    """
+    for attempt in range(1, IMAGEN_MAX_ATTEMPTS + 1):
+        try:
+            logging.info(f"🎨 Gemini generation attempt {attempt}: {prompt}")
+            async with imagen_limiter.slot():
+                async with gemini_clients.use() as client_gemini:
+                    response = await client_gemini.aio.models.generate_images(
+                        model=IMAGEN_MODEL,
+                        prompt=prompt,
+                        config=types.GenerateImagesConfig(
+                            number_of_images=1,
+                            aspect_ratio="9:16",
+                            personGeneration="ALLOW_ADULT"
+                        )
                     )
-                )
-                
-                if response and response.generated_images:
-                    image_bytes = response.generated_images[0].image.image_bytes
-                    del response  # Clean up response object
-                    return image_bytes
-                
-                logging.warning("⚠️ Empty response from Gemini.")
-            except Exception as e:
-                logging.warning(f"❌ Gemini error on attempt {attempt + 1}: {e}")
-                if attempt < max_retries - 1:
-                    wait = retry_delay * (2 ** attempt)
-                    logging.info(f"⏳ Retrying in {wait} seconds...")
-                    time.sleep(wait)
-                continue
-            
-        logging.error("❌ Failed after all Gemini retries.")
-        return None
-    finally:
-        if client_gemini:
-            del client_gemini  # Ensure client is cleaned up
 
+            if response and response.generated_images:
+                return response.generated_images[0].image.image_bytes
 
-async def generate_image_gemini_async(prompt: str):
-    """Async wrapper for Gemini image generation."""
-    async with semaphore:
-        await asyncio.sleep(rate_limit_delay)
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, lambda: generate_image_gemini(prompt))
+            logging.warning("⚠️ Empty response from Gemini.")
+        except Exception as e:
+            logging.warning(f"❌ Gemini error on attempt {attempt}: {e}")
+        if attempt < IMAGEN_MAX_ATTEMPTS:
+            # The limiter already holds back new calls after a 429; this only spreads retries out
+            wait = random.uniform(0.5, 1.0) * (2 ** (attempt - 1))
+            logging.info(f"⏳ Retrying in {wait:.1f} seconds...")
+            await asyncio.sleep(wait)
+
+    logging.error("❌ Failed after all Gemini retries.")
+    return None
 
 
 async def upload_image_gg_storage_async(image_bytes: bytes, bucket_name: str, prefix: str):
-    """Upload image bytes to GCS and return public URL using optimized chunked streaming."""
+    """Upload image bytes to GCS through the shared uploader and return the public URL."""
     if not image_bytes:
         return PLACEHOLDER_ERROR_IMAGE
 
-    client = None
-    stream = None
     try:
-        loop = asyncio.get_running_loop()
-        client = storage.Client()
-        bucket = client.bucket(bucket_name)
-
-        if not await loop.run_in_executor(None, bucket.exists):
-            logging.error(f"Bucket {bucket_name} does not exist.")
-            return PLACEHOLDER_ERROR_IMAGE
-
-        filename = f"{prefix}{uuid.uuid4()}.png"
-        blob = bucket.blob(filename)
-
-        # Optimize chunk size for better memory usage
-        chunk_size = 2 * 1024 * 1024  # 2MB chunks for better throughput
-        blob.chunk_size = chunk_size
-
-        # Create a bytes stream from the image data with context management
-        stream = BytesIO(image_bytes)
-        del image_bytes  # Free original image bytes immediately
-
-        # Upload with optimized settings
-        await loop.run_in_executor(
-            None,
-            lambda: blob.upload_from_file(
-                stream,
-                content_type="image/png",
-                size=stream.getbuffer().nbytes,
-                num_retries=3,
-                timeout=120  # Increased timeout for large files
-            )
-        )
-
-        return blob.public_url
+        return await gcs_uploader.upload(image_bytes, bucket_name, f"{prefix}{uuid.uuid4()}.png")
     except Exception as e:
         logging.error(f"❌ Upload error: {e}", exc_info=True)
         return PLACEHOLDER_ERROR_IMAGE
-    finally:
-        # Ensure all resources are properly cleaned up
-        if stream:
-            stream.close()
-        if client:
-            client.close()  # Close client connection
-        # Force garbage collection for large objects
-        gc.collect()
 
 
 async def generate_and_upload_async(prompt: str, post_id: int, prefix: str = "gemini_image_", bucket_name: str = "bucket_nextcopy_content") -> str:
@@ -127,7 +73,6 @@ async def generate_and_upload_async(prompt: str, post_id: int, prefix: str = "ge
     Returns a placeholder if generation or upload fails.
     """
     try:
-        # Generate image with memory optimization
         image_bytes = await generate_image_gemini_async(prompt)
         if not image_bytes:
             logging.warning(f"⚠️ No image generated for prompt: {prompt}")
@@ -138,7 +83,6 @@ async def generate_and_upload_async(prompt: str, post_id: int, prefix: str = "ge
         
         # Upload and get URL
         url = await upload_image_gg_storage_async(image_bytes, bucket_name, storage_prefix)
-        del image_bytes  # Clean up image bytes after upload
         
         if url != PLACEHOLDER_ERROR_IMAGE:
             logging.info(f"✅ Image uploaded: {url}")
@@ -146,6 +90,3 @@ async def generate_and_upload_async(prompt: str, post_id: int, prefix: str = "ge
     except Exception as e:
         logging.error(f"❌ Error in generate_and_upload_async: {e}", exc_info=True)
         return PLACEHOLDER_ERROR_IMAGE
-    finally:
-        # Force cleanup of any remaining resources
-        gc.collect()
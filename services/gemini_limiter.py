@@ -0,0 +1,286 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+
+from services.rate_limit import TokenBucket
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+GEMINI_CONCURRENCY_INITIAL = int(os.getenv("GEMINI_CONCURRENCY_INITIAL", "10"))
+GEMINI_CONCURRENCY_MIN = int(os.getenv("GEMINI_CONCURRENCY_MIN", "1"))
+GEMINI_CONCURRENCY_MAX = int(os.getenv("GEMINI_CONCURRENCY_MAX", "64"))
+# Imagen quota is per minute; BURST calls may start at once after an idle spell
+IMAGEN_RPM = float(os.getenv("IMAGEN_RPM", "20"))
+IMAGEN_BURST = float(os.getenv("IMAGEN_BURST", "5"))
+IMAGEN_MAX_IN_FLIGHT = int(os.getenv("IMAGEN_MAX_IN_FLIGHT", "8"))
+
+
+def is_rate_limit_error(e: Exception) -> bool:
+    """True for 429 / RESOURCE_EXHAUSTED errors from the genai SDK."""
+    if getattr(e, "code", None) == 429 or getattr(e, "status_code", None) == 429:
+        return True
+    message = str(e)
+    return "RESOURCE_EXHAUSTED" in message or "429" in message
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD concurrency limiter.
+
+    The window grows by roughly one slot per window's worth of successful
+    calls and is cut multiplicatively when a call is rate limited or when
+    p95 latency rises well above its observed baseline.
+    """
+
+    def __init__(
+        self,
+        initial: int = GEMINI_CONCURRENCY_INITIAL,
+        min_limit: int = GEMINI_CONCURRENCY_MIN,
+        max_limit: int = GEMINI_CONCURRENCY_MAX,
+        backoff: float = 0.5,
+        latency_tolerance: float = 2.0,
+        sample_size: int = 50,
+        cooldown: float = 5.0,
+        name: str = "gemini",
+    ):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.cooldown = cooldown
+        self._limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self._in_flight = 0
+        self._waiters = deque()
+        self._latencies = deque(maxlen=sample_size)
+        self._baseline_p95 = None
+        self._last_decrease = 0.0
+        self.successes = 0
+        self.throttled = 0
+        self.errors = 0
+        self.decreases = 0
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self):
+        if self._in_flight < self.limit and not self._waiters:
+            self._in_flight += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future in self._waiters:
+                self._waiters.remove(future)
+            elif future.done() and not future.cancelled():
+                # Slot was granted just before cancellation; hand it back
+                self.release()
+            raise
+
+    def release(self):
+        self._in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self._in_flight < self.limit:
+            future = self._waiters.popleft()
+            if not future.done():
+                self._in_flight += 1
+                future.set_result(None)
+
+    def _p95(self):
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def _latency_rising(self) -> bool:
+        if len(self._latencies) < self._latencies.maxlen // 2:
+            return False
+        p95 = self._p95()
+        if self._baseline_p95 is None:
+            self._baseline_p95 = p95
+            return False
+        if p95 > self._baseline_p95 * self.latency_tolerance:
+            return True
+        # Let the baseline follow slow drift without chasing spikes
+        self._baseline_p95 = 0.95 * self._baseline_p95 + 0.05 * p95
+        return False
+
+    def _decrease(self, reason: str):
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        old = self.limit
+        self._limit = max(float(self.min_limit), self._limit * self.backoff)
+        self._latencies.clear()
+        self.decreases += 1
+        logger.warning(f"⚠️ {self.name} limiter: {reason}, window {old} -> {self.limit}")
+
+    def on_success(self, latency: float):
+        self.successes += 1
+        self._latencies.append(latency)
+        if self._latency_rising():
+            self._decrease("p95 latency rising")
+        else:
+            self._limit = min(float(self.max_limit), self._limit + 1.0 / self._limit)
+        self._wake()
+
+    def on_throttle(self):
+        self.throttled += 1
+        self._decrease("rate limited (429)")
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            if is_rate_limit_error(e):
+                self.on_throttle()
+            else:
+                self.errors += 1
+            raise
+        else:
+            self.on_success(time.monotonic() - start)
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        p95 = self._p95()
+        return {
+            "window": self.limit,
+            "in_flight": self._in_flight,
+            "queue_depth": len(self._waiters),
+            "p95_latency": round(p95, 3) if p95 is not None else None,
+            "baseline_p95_latency": round(self._baseline_p95, 3) if self._baseline_p95 is not None else None,
+            "successes": self.successes,
+            "throttled": self.throttled,
+            "errors": self.errors,
+            "decreases": self.decreases,
+        }
+
+
+# Shared by every generate_content call in the process
+gemini_limiter = AdaptiveConcurrencyLimiter()
+
+
+class RateLimiter:
+    """Requests-per-minute limiter: a token bucket plus a cap on calls in flight.
+
+    A 429 halves the rate (never below `min_fraction` of the configured RPM)
+    and holds every caller back for `penalty` seconds; each success then
+    gives back a twentieth of the configured rate until it is reached again.
+    """
+
+    def __init__(
+        self,
+        rpm: float,
+        burst: float,
+        max_in_flight: int,
+        min_fraction: float = 0.1,
+        penalty: float = 10.0,
+        name: str = "rate",
+    ):
+        self.name = name
+        self.max_rate = rpm / 60.0
+        self.min_rate = self.max_rate * min_fraction
+        self.penalty = penalty
+        self.max_in_flight = max(1, max_in_flight)
+        self.bucket = TokenBucket(self.max_rate, capacity=max(1.0, burst))
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._in_flight = 0
+        self._waiting = 0
+        self._last_decrease = 0.0
+        self.successes = 0
+        self.throttled = 0
+        self.errors = 0
+        self.decreases = 0
+
+    @property
+    def rpm(self) -> float:
+        return self.bucket.rate * 60.0
+
+    def on_success(self):
+        self.successes += 1
+        if self.bucket.rate < self.max_rate:
+            self.bucket.set_rate(min(self.max_rate, self.bucket.rate + self.max_rate / 20))
+
+    def on_throttle(self):
+        self.throttled += 1
+        self.bucket.penalize(self.penalty)
+        # Calls already in flight when the quota ran out all come back 429; count it once
+        now = time.monotonic()
+        if now - self._last_decrease < self.penalty:
+            return
+        self._last_decrease = now
+        old = self.rpm
+        self.bucket.set_rate(max(self.min_rate, self.bucket.rate / 2))
+        self.decreases += 1
+        logger.warning(f"⚠️ {self.name} limiter: rate limited (429), {old:.1f} -> {self.rpm:.1f} rpm")
+
+    @asynccontextmanager
+    async def slot(self):
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+            try:
+                await self.bucket.acquire()
+            except BaseException:
+                self._slots.release()
+                raise
+        finally:
+            self._waiting -= 1
+        self._in_flight += 1
+        try:
+            yield
+        except Exception as e:
+            if is_rate_limit_error(e):
+                self.on_throttle()
+            else:
+                self.errors += 1
+            raise
+        else:
+            self.on_success()
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "rpm": round(self.rpm, 2),
+            "max_rpm": round(self.max_rate * 60.0, 2),
+            "burst": self.bucket.capacity,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "successes": self.successes,
+            "throttled": self.throttled,
+            "errors": self.errors,
+            "decreases": self.decreases,
+            "bucket": self.bucket.stats(),
+        }
+
+
+# Shared by every Imagen generate_images call in the process
+imagen_limiter = RateLimiter(IMAGEN_RPM, IMAGEN_BURST, IMAGEN_MAX_IN_FLIGHT, name="imagen")
@@ -0,0 +1,183 @@
+import os
+import random
+import asyncio
+import logging
+import importlib.util
+from typing import Dict, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+# HTTP/2 needs the optional `h2` package (pip install httpx[http2])
+HTTP2_ENABLED = (
+    os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+    and importlib.util.find_spec("h2") is not None
+)
+
+# Image generation calls routinely take tens of seconds
+IMAGE_PROVIDER_TIMEOUT = float(os.getenv("IMAGE_PROVIDER_TIMEOUT", "120"))
+
+TELEGRAM = "telegram"
+INTERNAL_API = "internal_api"
+IMAGE_PROVIDERS = "image_providers"
+
+# Per-client httpx.AsyncClient arguments
+CLIENT_CONFIGS = {
+    TELEGRAM: {"timeout": httpx.Timeout(10.0, connect=5.0)},
+    INTERNAL_API: {"timeout": httpx.Timeout(30.0, connect=10.0), "follow_redirects": True},
+    IMAGE_PROVIDERS: {"timeout": httpx.Timeout(IMAGE_PROVIDER_TIMEOUT, connect=10.0), "follow_redirects": True},
+}
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+# For requests that must not run twice, only failures where the server
+# certainly did not act on the request: throttling, and errors raised before
+# the request was sent
+NOT_SENT_STATUS = {429}
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class _ConnectionStats:
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+        self.http2_requests = 0
+        self.errors = 0
+
+    def as_dict(self):
+        return {
+            "requests": self.requests,
+            "connections": self.connections,
+            "tls_handshakes": self.tls_handshakes,
+            # Requests served on an already open connection
+            "reused": max(0, self.requests - self.connections),
+            "http2_requests": self.http2_requests,
+            "errors": self.errors,
+        }
+
+
+class _TracedTransport(httpx.AsyncHTTPTransport):
+    """Counts requests, new TCP connections and TLS handshakes via httpcore's trace hook."""
+
+    def __init__(self, stats: _ConnectionStats, **kwargs):
+        super().__init__(**kwargs)
+        self._stats = stats
+
+    async def _trace(self, event: str, info: dict):
+        if event == "connection.connect_tcp.complete":
+            self._stats.connections += 1
+        elif event == "connection.start_tls.complete":
+            self._stats.tls_handshakes += 1
+        elif event == "http2.send_request_headers.started":
+            self._stats.http2_requests += 1
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self._stats.requests += 1
+        request.extensions["trace"] = self._trace
+        try:
+            return await super().handle_async_request(request)
+        except Exception:
+            self._stats.errors += 1
+            raise
+
+
+class HttpClientRegistry:
+    """Process-wide long-lived httpx clients, one per upstream.
+
+    Created on first use (or eagerly by start()) and closed from the app
+    lifespan, so keep-alive connections are reused across requests instead
+    of paying TCP/TLS setup on every call.
+    """
+
+    def __init__(self, configs: Dict[str, dict] = CLIENT_CONFIGS):
+        self._configs = configs
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, _ConnectionStats] = {}
+
+    def _create(self, name: str) -> httpx.AsyncClient:
+        if name not in self._configs:
+            raise ValueError(f"Unknown HTTP client: {name}")
+        stats = self._stats.setdefault(name, _ConnectionStats())
+        limits = httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )
+        transport = _TracedTransport(stats, http2=HTTP2_ENABLED, limits=limits)
+        logger.info(f"Created shared HTTP client '{name}' (http2={HTTP2_ENABLED})")
+        return httpx.AsyncClient(transport=transport, **self._configs[name])
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._create(name)
+            self._clients[name] = client
+        return client
+
+    def start(self, names=(TELEGRAM, INTERNAL_API, IMAGE_PROVIDERS)):
+        for name in names:
+            self.get(name)
+
+    async def aclose(self):
+        clients = list(self._clients.items())
+        self._clients.clear()
+        for name, client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"Error closing HTTP client '{name}': {e}")
+
+    def stats(self) -> Dict[str, dict]:
+        return {
+            "http2_enabled": HTTP2_ENABLED,
+            "clients": {name: stats.as_dict() for name, stats in self._stats.items()},
+        }
+
+
+http_clients = HttpClientRegistry()
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+async def request_with_retries(client: httpx.AsyncClient, method: str, url: str, max_attempts: int = 3,
+                               base_delay: float = 1.0, max_delay: float = 30.0, idempotent: bool = True,
+                               **kwargs) -> httpx.Response:
+    """Send a request, retrying timeouts, network errors, 429 and 5xx with jittered backoff.
+
+    With idempotent=False (paid or otherwise non-repeatable POSTs) only 429
+    and connection errors are retried; a read timeout or 5xx may mean the
+    server did the work, so it is raised instead of repeated.
+
+    A Retry-After header takes precedence over the backoff. Returns the
+    successful response; raises httpx.HTTPStatusError for any other status
+    or once attempts run out, and the last httpx.TransportError for network
+    failures.
+    """
+    retryable_status = RETRYABLE_STATUS if idempotent else NOT_SENT_STATUS
+    retryable_errors = httpx.TransportError if idempotent else NOT_SENT_ERRORS
+    for attempt in range(1, max_attempts + 1):
+        delay = random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
+        try:
+            response = await client.request(method, url, **kwargs)
+            if response.status_code not in retryable_status or attempt == max_attempts:
+                response.raise_for_status()
+                return response
+            delay = min(max_delay, _retry_after(response) or delay)
+            logger.warning(f"{method} {url} returned {response.status_code}; retry {attempt}/{max_attempts - 1} in {delay:.1f}s")
+        except retryable_errors as e:
+            if attempt == max_attempts:
+                raise
+            logger.warning(f"{method} {url} failed ({type(e).__name__}: {e}); retry {attempt}/{max_attempts - 1} in {delay:.1f}s")
+        await asyncio.sleep(delay)
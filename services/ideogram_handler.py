@@ -1,18 +1,35 @@
 import os
-import asyncio
-import requests
+import logging
+from typing import Optional
+
+import httpx
 from dotenv import load_dotenv
 
+from services.http_clients import http_clients, request_with_retries, IMAGE_PROVIDERS
+
 load_dotenv()
 
+IDEOGRAM_API_URL = os.getenv("IDEOGRAM_API_URL", "https://api.ideogram.ai").rstrip("/")
+IDEOGRAM_MAX_ATTEMPTS = int(os.getenv("IDEOGRAM_MAX_ATTEMPTS", "3"))
+IDEOGRAM_MODEL = "V_2_TURBO"
+
+
 async def generate_and_upload_ideogram(
-    prompt: str, 
+    prompt: str,
     aspect_ratio: str = "ASPECT_9_16"
-):
+) -> Optional[str]:
+    """Generate an image with Ideogram and return its URL, or None on failure.
+
+    Runs on the shared image-provider client, so concurrent generations
+    overlap instead of blocking the event loop.
+    """
+    api_key = os.getenv("IDEO_API_KEY")
+    if not api_key:
+        logging.error("IDEO_API_KEY environment variable not set.")
+        return None
     try:
-        url = "https://api.ideogram.ai/generate"
         headers = {
-            "Api-Key": os.getenv("IDEO_API_KEY"),
+            "Api-Key": api_key,
             "Content-Type": "application/json"
         }
         
@@ -20,14 +37,16 @@ async def generate_and_upload_ideogram(
             "image_request": {
                 "prompt": prompt,
                 "aspect_ratio": aspect_ratio,
-                "model": "V_2_TURBO",
+                "model": IDEOGRAM_MODEL,
                 "magic_prompt_option": "AUTO"
             }
         }
 
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
-        
+        response = await request_with_retries(
+            http_clients.get(IMAGE_PROVIDERS), "POST", f"{IDEOGRAM_API_URL}/generate",
+            # Every call that reaches Ideogram is billed, so never repeat one that may have
+            max_attempts=IDEOGRAM_MAX_ATTEMPTS, idempotent=False, headers=headers, json=payload,
+        )
         response_data = response.json()
         
         # Handle direct image URL response
@@ -38,6 +57,6 @@ async def generate_and_upload_ideogram(
         
         raise ValueError(f"No image URL found in response: {response_data}")
 
-    except Exception as e:
-        print(f"Error generating image: {str(e)}")
+    except (httpx.HTTPError, ValueError) as e:
+        logging.error(f"Error generating image: {str(e)}")
         return None
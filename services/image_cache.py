@@ -0,0 +1,177 @@
+"""Content-addressed cache of generated images.
+
+An image is identified by the sha256 of its provider, model, English
+prompt, aspect ratio and style, so a redo, a retried batch or a re-run of
+generate_images_real with the same prompts costs one indexed UPDATE instead
+of a paid, multi-second provider call.
+
+The index lives in the image_cache table and the objects in GCS. Gemini
+images are already uploaded by their handler. Other providers return URLs
+on their own hosts, which may be temporary (Ideogram's are), so those
+images are copied to IMAGE_CACHE_BUCKET under image-cache/ before being
+indexed. If the copy fails, the image is used but not cached.
+
+Entries expire IMAGE_CACHE_TTL_HOURS after creation. Every
+IMAGE_CACHE_EVICT_EVERY stores, expired rows are deleted and then the least
+recently used ones, down to IMAGE_CACHE_MAX_ENTRIES. Eviction only drops
+index rows, because posts may still link to the objects.
+"""
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from dotenv import load_dotenv
+
+from database.db import AsyncSessionLocal
+from database.models import ImageCacheEntry
+from services.gcs_uploader import gcs_uploader
+from services.http_clients import http_clients, request_with_retries, IMAGE_PROVIDERS
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+IMAGE_CACHE_ENABLED = os.getenv("IMAGE_CACHE_ENABLED", "true").lower() == "true"
+IMAGE_CACHE_TTL_HOURS = float(os.getenv("IMAGE_CACHE_TTL_HOURS", str(24 * 30)))
+IMAGE_CACHE_MAX_ENTRIES = int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "50000"))
+IMAGE_CACHE_EVICT_EVERY = int(os.getenv("IMAGE_CACHE_EVICT_EVERY", "100"))
+IMAGE_CACHE_BUCKET = os.getenv("IMAGE_CACHE_BUCKET", "bucket_nextcopy_content")
+
+CONTENT_TYPE_EXTENSIONS = {"image/png": "png", "image/jpeg": "jpg", "image/webp": "webp"}
+
+
+def cache_key(provider: str, model: str, prompt: str, aspect_ratio: Optional[str], style: Optional[str]) -> str:
+    # Whitespace and case of the prompt matter to the providers, so they are kept
+    material = json.dumps([provider, model, prompt, aspect_ratio, style], ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ImageCache:
+    def __init__(self, db_factory=AsyncSessionLocal, ttl_hours: float = IMAGE_CACHE_TTL_HOURS,
+                 max_entries: int = IMAGE_CACHE_MAX_ENTRIES, evict_every: int = IMAGE_CACHE_EVICT_EVERY,
+                 bucket_name: str = IMAGE_CACHE_BUCKET, enabled: bool = IMAGE_CACHE_ENABLED):
+        self.db_factory = db_factory
+        self.ttl = timedelta(hours=ttl_hours)
+        self.max_entries = max_entries
+        self.evict_every = max(1, evict_every)
+        self.bucket_name = bucket_name
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.copy_failures = 0
+        self.errors = 0
+        self.evicted = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        """The cached URL for `key`, marking it used; None on a miss or a database error."""
+        now = datetime.now()
+        try:
+            async with self.db_factory() as db:
+                url = (await db.execute(
+                    update(ImageCacheEntry)
+                    .where(ImageCacheEntry.key == key, ImageCacheEntry.expires_at > now)
+                    .values(hits=ImageCacheEntry.hits + 1, last_used_at=now)
+                    .returning(ImageCacheEntry.url)
+                )).scalar()
+                await db.commit()
+        except SQLAlchemyError as e:
+            self.errors += 1
+            logger.warning(f"Image cache lookup failed: {e}")
+            return None
+        if url:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return url
+
+    async def copy_to_storage(self, key: str, url: str) -> Optional[str]:
+        """Download a provider-hosted image into our bucket; None if that fails."""
+        try:
+            response = await request_with_retries(http_clients.get(IMAGE_PROVIDERS), "GET", url)
+            content_type = response.headers.get("content-type", "image/png").split(";")[0].strip()
+            extension = CONTENT_TYPE_EXTENSIONS.get(content_type, "png")
+            return await gcs_uploader.upload(
+                response.content, self.bucket_name, f"image-cache/{key}.{extension}", content_type
+            )
+        except Exception as e:
+            self.copy_failures += 1
+            logger.warning(f"Could not copy {url} to the image cache: {e}")
+            return None
+
+    async def put(self, key: str, url: str, provider: str, model: str, prompt: str,
+                  aspect_ratio: Optional[str], style: Optional[str]):
+        now = datetime.now()
+        try:
+            async with self.db_factory() as db:
+                await db.merge(ImageCacheEntry(
+                    key=key, provider=provider, model=model, prompt=prompt,
+                    aspect_ratio=aspect_ratio, style=style, url=url, hits=0,
+                    created_at=now, last_used_at=now, expires_at=now + self.ttl,
+                ))
+                await db.commit()
+                self.stores += 1
+                if self.stores % self.evict_every == 0:
+                    await self.evict(db)
+        except SQLAlchemyError as e:
+            # Two workers storing the same key at once; either row will do
+            self.errors += 1
+            logger.warning(f"Image cache store failed: {e}")
+
+    async def evict(self, db: AsyncSession) -> int:
+        """Delete expired entries, then the least recently used ones above max_entries."""
+        expired = (await db.execute(
+            delete(ImageCacheEntry).where(ImageCacheEntry.expires_at <= datetime.now())
+        )).rowcount
+        excess = (await db.execute(select(func.count()).select_from(ImageCacheEntry))).scalar() - self.max_entries
+        lru = 0
+        if excess > 0:
+            oldest = select(ImageCacheEntry.key).order_by(ImageCacheEntry.last_used_at).limit(excess)
+            lru = (await db.execute(
+                delete(ImageCacheEntry).where(ImageCacheEntry.key.in_(oldest.scalar_subquery()))
+            )).rowcount
+        await db.commit()
+        self.evicted += expired + lru
+        if expired or lru:
+            logger.info(f"Image cache evicted {expired} expired and {lru} least recently used entries")
+        return expired + lru
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "bypassed": self.bypassed,
+            "stores": self.stores,
+            "copy_failures": self.copy_failures,
+            "errors": self.errors,
+            "evicted": self.evicted,
+        }
+
+
+async def image_cache_counts(db: AsyncSession) -> dict:
+    """Live entries, total hits and the oldest last use, from the index table."""
+    row = (await db.execute(
+        select(
+            func.count(),
+            func.coalesce(func.sum(ImageCacheEntry.hits), 0),
+            func.min(ImageCacheEntry.last_used_at),
+        ).where(ImageCacheEntry.expires_at > datetime.now())
+    )).one()
+    return {
+        "entries": row[0],
+        "total_hits": row[1],
+        "oldest_last_used_at": row[2].isoformat() if row[2] else None,
+    }
+
+
+image_cache = ImageCache()
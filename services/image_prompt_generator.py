@@ -1,10 +1,9 @@
 from dotenv import load_dotenv
-from google import genai
 from google.genai import types
 from pydantic import BaseModel
 from typing import List, Tuple
+from services.gemini_client import generate_content
 import json
-import os
 
 load_dotenv()
 
@@ -16,8 +15,6 @@ class ImagePrompt(BaseModel):
 class ImagePromptGenerate(BaseModel):
     story_prompts: List[ImagePrompt]
 
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-
 async def generate_image_prompts(text: str, style: str = "realistic", num_prompts: int = 1) -> List[Tuple[str, str, str]]:
     """Generate image prompts from post content using Gemini API.
 
@@ -57,7 +54,7 @@ async def generate_image_prompts(text: str, style: str = "realistic", num_prompt
     "A group of Vietnamese farmers in conical hats work together in a vibrant green rice field under the afternoon sun. Wide shot captures the sweeping landscape with mountains in the distance, showcasing Vietnam's natural beauty. Earthy tones dominate with pops of color from the farmers' clothing, conveying a sense of community and hard work. Cinematic lighting enhances the dramatic shadows and textures. 16:9 aspect ratio, 4K resolution."
     """
 
-    response = await client.aio.models.generate_content(
+    response = await generate_content(
         model='gemini-2.0-flash',
         contents=f"Trả thông tin cho nội dung sau đây: {text}",
         config=types.GenerateContentConfig(
@@ -1,38 +1,119 @@
-import os
 import logging
-from typing import Optional
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
 
-from services.gemini_image_handler import generate_and_upload_async as generate_gemini
-from services.ideogram_handler import generate_and_upload_ideogram as generate_ideogram
+from services.gemini_image_handler import generate_and_upload_async as generate_gemini, IMAGEN_MODEL
+from services.ideogram_handler import generate_and_upload_ideogram as generate_ideogram, IDEOGRAM_MODEL
 from services.flux_image_handler import generate_and_upload_flux as generate_flux
 from services.locaith_handler import generate_and_upload_locaith as generate_locaith
+from services.image_cache import image_cache, cache_key
 
-async def generate_image(prompt: str, service: str = "gemini", post_id: Optional[int] = None) -> str:
+PLACEHOLDER_IMAGE = "/placeholder.png"
+
+
+class ImageProvider(ABC):
+    """One image backend. generate() must not block the event loop, so jobs overlap."""
+
+    name: str = ""
+    # Part of the image cache key: a change of model or format must not reuse old images
+    model: str = ""
+    aspect_ratio: Optional[str] = None
+    # True when generate() already returns a URL in our GCS bucket
+    stores_in_gcs: bool = False
+
+    @abstractmethod
+    async def generate(self, prompt: str, post_id: Optional[int] = None) -> Optional[str]:
+        """Return the image URL, or None/placeholder when generation failed."""
+
+
+class GeminiProvider(ImageProvider):
+    name = "gemini"
+    model = IMAGEN_MODEL
+    aspect_ratio = "9:16"
+    stores_in_gcs = True
+
+    async def generate(self, prompt: str, post_id: Optional[int] = None) -> Optional[str]:
+        # Uploaded to GCS under posts/{post_id}/
+        return await generate_gemini(prompt, post_id)
+
+
+class IdeogramProvider(ImageProvider):
+    name = "ideogram"
+    model = IDEOGRAM_MODEL
+    aspect_ratio = "ASPECT_9_16"
+
+    async def generate(self, prompt: str, post_id: Optional[int] = None) -> Optional[str]:
+        return await generate_ideogram(prompt, self.aspect_ratio)
+
+
+class FluxProvider(ImageProvider):
+    name = "flux"
+    model = "black-forest-labs/FLUX.1-schnell"
+    aspect_ratio = "720x1280"
+
+    async def generate(self, prompt: str, post_id: Optional[int] = None) -> Optional[str]:
+        return await generate_flux(prompt)
+
+
+class LocaithProvider(ImageProvider):
+    name = "locaith"
+    model = "pollinations"
+    aspect_ratio = "576x1024"
+
+    async def generate(self, prompt: str, post_id: Optional[int] = None) -> Optional[str]:
+        return await generate_locaith(prompt, width=576, height=1024)
+
+
+IMAGE_PROVIDERS: Dict[str, ImageProvider] = {
+    provider.name: provider
+    for provider in (GeminiProvider(), IdeogramProvider(), FluxProvider(), LocaithProvider())
+}
+
+
+def get_provider(service: str) -> ImageProvider:
+    provider = IMAGE_PROVIDERS.get(service.lower())
+    if provider is None:
+        raise ValueError(f"Unsupported image service: {service}")
+    return provider
+
+
+async def generate_image(prompt: str, service: str = "gemini", post_id: Optional[int] = None,
+                         style: Optional[str] = None, force_regenerate: bool = False) -> str:
     """Generate image using specified service.
     
     Args:
         prompt (str): The image generation prompt
-        service (str): The service to use ("gemini", "ideogram", or "flux")
+        service (str): The service to use ("gemini", "ideogram", "flux" or "locaith")
         post_id (Optional[int]): Post ID for Gemini storage path (only used with Gemini)
+        style (Optional[str]): Style the prompt was written for; part of the cache key
+        force_regenerate (bool): Skip the image cache lookup and generate a fresh image
         
     Returns:
         str: The URL of the generated image or placeholder on failure
     """
     try:
-        service = service.lower()
-        if service == "gemini":
-            return await generate_gemini(prompt, post_id)
-        elif service == "ideogram":
-            result = await generate_ideogram(prompt)
-            return result if result else "/placeholder.png"
-        elif service == "flux":
-            result = await generate_flux(prompt)
-            return result if result else "/placeholder.png"
-        elif service == "locaith":
-            result = await generate_locaith(prompt)
-            return result if result else "/placeholder.png"
-        else:
-            raise ValueError(f"Unsupported image service: {service}")
+        provider = get_provider(service)
+        key = cache_key(provider.name, provider.model, prompt, provider.aspect_ratio, style)
+        if image_cache.enabled:
+            if force_regenerate:
+                image_cache.bypassed += 1
+            else:
+                cached = await image_cache.get(key)
+                if cached:
+                    logging.info(f"♻️ Reusing cached {provider.name} image: {cached}")
+                    return cached
+
+        result = await provider.generate(prompt, post_id)
+        if not result or result == PLACEHOLDER_IMAGE:
+            return PLACEHOLDER_IMAGE
+        if image_cache.enabled:
+            stored = result if provider.stores_in_gcs else await image_cache.copy_to_storage(key, result)
+            if stored:
+                await image_cache.put(key, stored, provider.name, provider.model, prompt,
+                                      provider.aspect_ratio, style)
+                # Hand out the durable copy, not the provider's possibly temporary URL
+                result = stored
+        return result
     except Exception as e:
         logging.error(f"❌ Error generating image with {service}: {e}")
-        return "/placeholder.png"
\ No newline at end of file
+        return PLACEHOLDER_IMAGE
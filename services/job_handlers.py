@@ -0,0 +1,74 @@
+"""Handlers for every queued job type.
+
+Importing this module registers them; both the web process (when
+RUN_JOB_WORKER is on) and the standalone `python -m worker` import it, so
+handlers only depend on the services layer, never on routers.
+"""
+import uuid
+from sqlalchemy import select, delete
+from database.db import AsyncSessionLocal
+from database.models import Theme, ContentPost
+from services.job_worker import job_handler
+from services.content_generator import generate_posts_background
+from services.post_image_generator import process_image_generation
+from services.video_generator import video_generation_task
+from services.campaign_meta_generator import CampaignInput, generate_campaign_meta
+from services.scheduler import run_daily_schedule, abandon_publishing_posts
+
+
+@job_handler("generate_posts", concurrency=2, max_attempts=2)
+async def run_generate_posts_job(payload: dict, attempt: int):
+    theme_id = payload["theme_id"]
+    if attempt > 1:
+        # A previous attempt failed or died mid-run; drop its partial posts before regenerating
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Theme.post_status).where(Theme.id == theme_id))
+            post_status = result.scalar_one_or_none()
+            if post_status and (post_status == "error" or post_status.startswith("generating")):
+                await db.execute(
+                    delete(ContentPost).where(
+                        ContentPost.theme_id == theme_id,
+                        ContentPost.status == "approved",
+                        ContentPost.image_status == "pending"
+                    )
+                )
+                await db.commit()
+    await generate_posts_background(theme_id, AsyncSessionLocal)
+    return {"theme_id": theme_id}
+
+
+@job_handler("generate_images", concurrency=3)
+async def run_generate_images_job(payload: dict, attempt: int):
+    await process_image_generation(
+        payload["post_id"],
+        payload.get("num_images", 1),
+        payload.get("style", "realistic"),
+        payload.get("image_service", "gemini"),
+        payload.get("force_regenerate", False)
+    )
+    return {"post_id": payload["post_id"]}
+
+
+@job_handler("generate_video", concurrency=1, max_attempts=2)
+async def run_generate_video_job(payload: dict, attempt: int):
+    await video_generation_task(payload["post_id"], payload["content"], payload.get("image_urls", []))
+    return {"post_id": payload["post_id"]}
+
+
+@job_handler("campaign_meta", concurrency=2)
+async def run_campaign_meta_job(payload: dict, attempt: int):
+    # The job owns its session; the request that queued it is long gone
+    async with AsyncSessionLocal() as db:
+        await generate_campaign_meta(CampaignInput(**payload), db)
+    return {"campaign_id": payload.get("id")}
+
+
+@job_handler("daily_schedule", concurrency=1, max_attempts=2)
+async def run_daily_schedule_job(payload: dict, attempt: int):
+    # Every attempt of one run shares its run_id, so a retry only settles its own claims
+    run_id = payload.get("run_id")
+    async with AsyncSessionLocal() as db:
+        if attempt > 1 and run_id:
+            # The attempt that died may already have published these; never resend them
+            await abandon_publishing_posts(db, run_id)
+        return await run_daily_schedule(db, run_id or uuid.uuid4().hex)
@@ -0,0 +1,174 @@
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import and_, or_, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from dotenv import load_dotenv
+
+from database.models import Job
+
+load_dotenv()
+
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "10"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "600"))
+
+# Default attempt budget per job type, filled in by job handler registration
+JOB_MAX_ATTEMPTS: Dict[str, int] = {}
+
+
+class ClaimedJob(NamedTuple):
+    id: int
+    job_type: str
+    payload: Dict[str, Any]
+    attempts: int
+
+
+# Hook set by an in-process worker so new jobs are picked up without waiting a poll
+_enqueue_listeners = []
+
+
+def add_enqueue_listener(callback):
+    _enqueue_listeners.append(callback)
+
+
+def remove_enqueue_listener(callback):
+    if callback in _enqueue_listeners:
+        _enqueue_listeners.remove(callback)
+
+
+def notify_job_enqueued(job_type: str):
+    """Wake in-process workers; call after committing a commit=False enqueue."""
+    for callback in list(_enqueue_listeners):
+        callback(job_type)
+
+
+async def enqueue_job(db: AsyncSession, job_type: str, payload: Optional[Dict[str, Any]] = None,
+                      max_attempts: Optional[int] = None, run_at: Optional[datetime] = None, commit: bool = True) -> Job:
+    """Insert a job row. With commit=False it joins the caller's transaction."""
+    job = Job(
+        job_type=job_type,
+        payload=payload or {},
+        status="queued",
+        max_attempts=max_attempts or JOB_MAX_ATTEMPTS.get(job_type, 3),
+        run_at=run_at or datetime.now(),
+    )
+    db.add(job)
+    if commit:
+        await db.commit()
+        notify_job_enqueued(job_type)
+    else:
+        # Assign the id now so callers can return it before committing
+        await db.flush()
+    return job
+
+
+async def claim_jobs(db: AsyncSession, job_type: str, worker_id: str, limit: int,
+               lease_seconds: int = JOB_LEASE_SECONDS) -> List[ClaimedJob]:
+    """Lease up to `limit` runnable jobs of `job_type` for `worker_id`.
+
+    Runnable means queued and due, or running with an expired lease (its
+    worker died). Rows locked by another claimer are skipped.
+    """
+    if limit <= 0:
+        return []
+    now = datetime.now()
+    result = await db.execute(
+        select(Job)
+        .where(
+            Job.job_type == job_type,
+            or_(
+                and_(Job.status == "queued", Job.run_at <= now),
+                and_(Job.status == "running", Job.locked_until < now),
+            ),
+        )
+        .order_by(Job.run_at, Job.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    jobs = result.scalars().all()
+
+    claimed = []
+    for job in jobs:
+        if job.status == "running" and job.attempts >= job.max_attempts:
+            # The last allowed attempt died with its worker
+            job.status = "failed"
+            job.last_error = f"Lease expired on {job.locked_by} after {job.attempts} attempt(s)"
+            job.locked_by = None
+            job.locked_until = None
+            job.finished_at = now
+            continue
+        job.status = "running"
+        job.attempts += 1
+        job.locked_by = worker_id
+        job.locked_until = now + timedelta(seconds=lease_seconds)
+        job.heartbeat_at = now
+        claimed.append(ClaimedJob(job.id, job.job_type, dict(job.payload or {}), job.attempts))
+    await db.commit()
+    return claimed
+
+
+async def heartbeat_jobs(db: AsyncSession, job_ids: List[int], worker_id: str,
+                   lease_seconds: int = JOB_LEASE_SECONDS) -> int:
+    """Extend the lease of jobs this worker still holds."""
+    if not job_ids:
+        return 0
+    now = datetime.now()
+    result = await db.execute(
+        update(Job)
+        .where(Job.id.in_(job_ids), Job.locked_by == worker_id, Job.status == "running")
+        .values(heartbeat_at=now, locked_until=now + timedelta(seconds=lease_seconds))
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def complete_job(db: AsyncSession, job_id: int, worker_id: str, result: Optional[Dict[str, Any]] = None):
+    await db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.locked_by == worker_id)
+        .values(status="succeeded", result=result, locked_by=None, locked_until=None, finished_at=datetime.now())
+    )
+    await db.commit()
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter, capped at JOB_RETRY_MAX_SECONDS."""
+    ceiling = min(JOB_RETRY_MAX_SECONDS, JOB_RETRY_BASE_SECONDS * (2 ** max(0, attempts - 1)))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+async def fail_job(db: AsyncSession, job_id: int, worker_id: str, error: str):
+    """Requeue the job with backoff, or mark it failed once attempts run out."""
+    result = await db.execute(select(Job).where(Job.id == job_id, Job.locked_by == worker_id))
+    job = result.scalars().first()
+    if not job:
+        return
+    job.last_error = error[:2000]
+    job.locked_by = None
+    job.locked_until = None
+    if job.attempts < job.max_attempts:
+        job.status = "queued"
+        job.run_at = datetime.now() + timedelta(seconds=retry_delay(job.attempts))
+    else:
+        job.status = "failed"
+        job.finished_at = datetime.now()
+    await db.commit()
+
+
+async def get_job(db: AsyncSession, job_id: int) -> Optional[Job]:
+    return await db.get(Job, job_id)
+
+
+async def queue_counts(db: AsyncSession) -> Dict[str, Dict[str, int]]:
+    """Job counts grouped by type and status."""
+    counts: Dict[str, Dict[str, int]] = {}
+    result = await db.execute(
+        select(Job.job_type, Job.status, func.count(Job.id)).group_by(Job.job_type, Job.status)
+    )
+    rows = result.all()
+    for job_type, status, count in rows:
+        counts.setdefault(job_type, {})[status] = count
+    return counts
@@ -0,0 +1,215 @@
+import os
+import socket
+import asyncio
+import logging
+import traceback
+import uuid
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from dotenv import load_dotenv
+
+from database.db import AsyncSessionLocal
+from services.job_queue import (
+    JOB_LEASE_SECONDS,
+    JOB_MAX_ATTEMPTS,
+    claim_jobs,
+    heartbeat_jobs,
+    complete_job,
+    fail_job,
+    add_enqueue_listener,
+    remove_enqueue_listener,
+)
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2.0"))
+
+# handler(payload, attempt) -> optional JSON-serializable result
+JobHandler = Callable[[Dict[str, Any], int], Awaitable[Optional[Dict[str, Any]]]]
+
+
+@dataclass
+class HandlerSpec:
+    handler: JobHandler
+    concurrency: int
+    max_attempts: int
+
+
+_handlers: Dict[str, HandlerSpec] = {}
+
+
+def job_handler(job_type: str, concurrency: int = 2, max_attempts: int = 3):
+    """Register an async function as the handler for `job_type`.
+
+    `concurrency` is the default per-process cap; see JobWorker for overrides.
+    """
+    def decorator(fn: JobHandler) -> JobHandler:
+        _handlers[job_type] = HandlerSpec(fn, concurrency, max_attempts)
+        JOB_MAX_ATTEMPTS[job_type] = max_attempts
+        return fn
+
+    return decorator
+
+
+def registered_job_types():
+    return list(_handlers)
+
+
+class JobWorker:
+    """Claims jobs from the jobs table and runs them under per-type caps.
+
+    One poll loop per job type leases at most as many jobs as it has free
+    slots; a heartbeat loop keeps leases alive while handlers run. A type's
+    cap is JOB_CONCURRENCY_<JOB_TYPE> if set, else `concurrency`, else the
+    default given to @job_handler.
+    """
+
+    def __init__(self, job_types: Optional[Iterable[str]] = None, db_factory=AsyncSessionLocal,
+                 worker_id: Optional[str] = None, poll_interval: float = JOB_POLL_INTERVAL,
+                 lease_seconds: int = JOB_LEASE_SECONDS, concurrency: Optional[int] = None):
+        self.job_types = list(job_types) if job_types else None
+        self.concurrency = concurrency
+        self.db_factory = db_factory
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self._active: Dict[str, Dict[int, asyncio.Task]] = {}
+        self._wake: Dict[str, asyncio.Event] = {}
+        self._caps: Dict[str, int] = {}
+        self._loops = []
+        self._running = False
+        self.completed = 0
+        self.failed = 0
+
+    def _cap(self, job_type: str) -> int:
+        override = os.getenv(f"JOB_CONCURRENCY_{job_type.upper()}")
+        if override:
+            return max(1, int(override))
+        return max(1, self.concurrency or _handlers[job_type].concurrency)
+
+    def _on_enqueue(self, job_type: str):
+        event = self._wake.get(job_type)
+        if event is not None:
+            event.set()
+
+    async def start(self):
+        if self._running:
+            return
+        self._running = True
+        types_to_run = self.job_types or list(_handlers)
+        for job_type in types_to_run:
+            if job_type not in _handlers:
+                logger.warning(f"No handler registered for job type '{job_type}'")
+                continue
+            self._active[job_type] = {}
+            self._caps[job_type] = self._cap(job_type)
+            self._wake[job_type] = asyncio.Event()
+            self._loops.append(asyncio.create_task(self._poll_loop(job_type)))
+        self._loops.append(asyncio.create_task(self._heartbeat_loop()))
+        add_enqueue_listener(self._on_enqueue)
+        logger.info(f"Job worker {self.worker_id} started for {list(self._active)}")
+
+    async def stop(self, drain_timeout: float = 30.0):
+        """Stop claiming, wait up to `drain_timeout` for running jobs, then cancel.
+
+        Cancelled jobs keep their lease until it expires and are then retried.
+        """
+        if not self._running:
+            return
+        self._running = False
+        remove_enqueue_listener(self._on_enqueue)
+        for event in self._wake.values():
+            event.set()
+        running = [task for tasks in self._active.values() for task in tasks.values()]
+        if running:
+            logger.info(f"Draining {len(running)} running job(s)")
+            _, pending = await asyncio.wait(running, timeout=drain_timeout)
+            for task in pending:
+                task.cancel()
+        for loop_task in self._loops:
+            loop_task.cancel()
+        await asyncio.gather(*self._loops, return_exceptions=True)
+        self._loops = []
+        logger.info(f"Job worker {self.worker_id} stopped")
+
+    async def _poll_loop(self, job_type: str):
+        spec = _handlers[job_type]
+        active = self._active[job_type]
+        wake = self._wake[job_type]
+        cap = self._caps[job_type]
+        while self._running:
+            free = cap - len(active)
+            jobs = []
+            if free > 0:
+                try:
+                    async with self.db_factory() as db:
+                        jobs = await claim_jobs(db, job_type, self.worker_id, free, self.lease_seconds)
+                except Exception as e:
+                    logger.error(f"Failed to claim '{job_type}' jobs: {e}")
+                for job in jobs:
+                    task = asyncio.create_task(self._run(job_type, spec, job.id, job.payload, job.attempts))
+                    active[job.id] = task
+                    task.add_done_callback(lambda _t, job_id=job.id: self._finished(job_type, job_id))
+            if jobs and len(active) < cap:
+                # There may be more due work; poll again right away
+                continue
+            wake.clear()
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _finished(self, job_type: str, job_id: int):
+        self._active.get(job_type, {}).pop(job_id, None)
+        event = self._wake.get(job_type)
+        if event is not None:
+            event.set()
+
+    async def _run(self, job_type: str, spec: HandlerSpec, job_id: int, payload: Dict[str, Any], attempt: int):
+        logger.info(f"▶️ Job {job_id} ({job_type}) attempt {attempt}")
+        try:
+            result = await spec.handler(payload, attempt)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"❌ Job {job_id} ({job_type}) failed: {e}")
+            try:
+                async with self.db_factory() as db:
+                    await fail_job(db, job_id, self.worker_id, f"{e}\n{traceback.format_exc()}")
+            except Exception as db_error:
+                logger.error(f"Failed to record failure of job {job_id}: {db_error}")
+            return
+        self.completed += 1
+        try:
+            async with self.db_factory() as db:
+                await complete_job(db, job_id, self.worker_id, result)
+        except Exception as e:
+            logger.error(f"Failed to mark job {job_id} complete: {e}")
+        logger.info(f"✅ Job {job_id} ({job_type}) done")
+
+    async def _heartbeat_loop(self):
+        interval = max(1.0, self.lease_seconds / 3)
+        while True:
+            await asyncio.sleep(interval)
+            job_ids = [job_id for tasks in self._active.values() for job_id in tasks]
+            if not job_ids:
+                continue
+            try:
+                async with self.db_factory() as db:
+                    await heartbeat_jobs(db, job_ids, self.worker_id, self.lease_seconds)
+            except Exception as e:
+                logger.error(f"Job heartbeat failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "running": self._running,
+            "active": {job_type: len(tasks) for job_type, tasks in self._active.items()},
+            "concurrency": dict(self._caps),
+            "completed": self.completed,
+            "failed": self.failed,
+        }
@@ -1,8 +1,32 @@
+import os
 import urllib.parse
 import logging
-import requests
 from typing import Optional
 
+import httpx
+
+from services.http_clients import http_clients, IMAGE_PROVIDERS
+
+POLLINATIONS_URL = os.getenv("POLLINATIONS_URL", "https://image.pollinations.ai").rstrip("/")
+TINYURL_API_URL = os.getenv("TINYURL_API_URL", "http://tinyurl.com/api-create.php")
+# Shortening is cosmetic; don't hold an image job up for it
+TINYURL_TIMEOUT = float(os.getenv("TINYURL_TIMEOUT", "5"))
+
+
+async def shorten_url(url: str) -> str:
+    """TinyURL link for `url` via the shared client; `url` itself if TinyURL fails."""
+    try:
+        response = await http_clients.get(IMAGE_PROVIDERS).get(
+            TINYURL_API_URL, params={"url": url}, timeout=TINYURL_TIMEOUT
+        )
+        if response.status_code == 200:
+            return response.text
+        logging.warning(f"⚠️ Could not shorten URL ({response.status_code}), using original")
+    except httpx.HTTPError as e:
+        logging.warning(f"⚠️ URL shortening failed: {e}, using original")
+    return url
+
+
 async def generate_and_upload_locaith(prompt: str, width: int = 576, height: int = 1024) -> Optional[str]:
     """Tạo và trả về URL ảnh từ Pollinations API.
     
@@ -18,25 +42,15 @@ async def generate_and_upload_locaith(prompt: str, width: int = 576, height: int
         encoded_prompt = urllib.parse.quote(safe_prompt)
 
         # Tạo URL ảnh với custom dimensions
-        image_url = f"https://image.pollinations.ai/prompt/{encoded_prompt}?nologo=true&width={width}&height={height}"
+        image_url = f"{POLLINATIONS_URL}/prompt/{encoded_prompt}?nologo=true&width={width}&height={height}"
         logging.info(f"🖼️ [Locaith] Ảnh đã sẵn sàng: '{safe_prompt[:60]}...'")
         logging.info(f"🔗 URL ảnh: {image_url}")
         # Shorten URL using TinyURL API
-        try:
-            tiny_url_api = f"http://tinyurl.com/api-create.php?url={urllib.parse.quote(image_url)}"
-            response = requests.get(tiny_url_api)
-            if response.status_code == 200:
-                short_url = response.text
-                logging.info(f"🖼️ [Locaith] Ảnh đã sẵn sàng: '{safe_prompt[:60]}...'")
-                logging.info(f"🔗 URL ảnh (shortened): {short_url}")
-                return short_url
-            else:
-                logging.warning(f"⚠️ [Locaith] Could not shorten URL, returning original")
-                return image_url
-        except Exception as e:
-            logging.warning(f"⚠️ [Locaith] URL shortening failed: {e}, returning original")
-            return image_url
+        short_url = await shorten_url(image_url)
+        if short_url != image_url:
+            logging.info(f"🔗 URL ảnh (shortened): {short_url}")
+        return short_url
 
     except Exception as e:
         logging.error(f"❌ [Locaith ERROR] Lỗi không xác định: {e}")
-        return None
\ No newline at end of file
+        return None
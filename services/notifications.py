@@ -0,0 +1,239 @@
+"""Transactional Telegram notification outbox.
+
+notify() adds a notification_outbox row on the caller's session, so the
+notification commits (or rolls back) together with the state change it
+describes and the request path never waits on Telegram. The
+NotificationDispatcher drains pending rows: rows for the same chat and kind
+are coalesced into one message ("📢 12 posts published to Facebook"), and
+sent in the telegram_sender's BULK lane, behind command replies and under
+Telegram's global and per-chat limits. Sends that still fail are retried
+with backoff up to NOTIFY_MAX_ATTEMPTS times.
+
+Rows are claimed with SKIP LOCKED, so every web and worker process can run
+a dispatcher. Claiming leases the rows (available_at moves NOTIFY_LEASE_SECONDS
+ahead and the attempt is counted) and commits before anything is sent; the
+outcome is written in a second transaction. Rows of a dispatcher that dies
+mid-send become due again when the lease runs out.
+"""
+import os
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event, func, select, update
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+
+from database.db import AsyncSessionLocal
+from database.models import NotificationOutbox
+from services.job_queue import retry_delay
+from services.telegram_sender import telegram_sender, TELEGRAM_TOKEN, BULK
+from services.telegram_handler import CHAT_ID
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_POLL_INTERVAL = float(os.getenv("NOTIFY_POLL_INTERVAL", "5"))
+NOTIFY_BATCH_LIMIT = int(os.getenv("NOTIFY_BATCH_LIMIT", "500"))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "5"))
+NOTIFY_LEASE_SECONDS = float(os.getenv("NOTIFY_LEASE_SECONDS", "300"))
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# Summary line used when several pending notifications of a kind go to one chat
+COALESCED_SUMMARIES = {
+    "post_published": "📢 {count} posts published to Facebook",
+    "publish_failed": "❌ {count} posts failed to publish to Facebook",
+    "posts_generated": "✨ Post generation finished for {count} themes",
+}
+
+
+def notify(db, message: str, kind: str = "info", chat_id: Optional[str] = None) -> Optional[NotificationOutbox]:
+    """Queue a Telegram message in the caller's transaction (Session or AsyncSession)."""
+    chat_id = chat_id or CHAT_ID
+    if not TELEGRAM_TOKEN or not chat_id:
+        logger.warning("Telegram token or chat_id not set")
+        return None
+    row = NotificationOutbox(
+        chat_id=str(chat_id),
+        kind=kind,
+        message=message,
+        status="pending",
+        attempts=0,
+        available_at=datetime.now(),
+    )
+    db.add(row)
+    getattr(db, "sync_session", db).info["notifications_written"] = True
+    return row
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_dispatcher(session):
+    if session.info.pop("notifications_written", False):
+        notification_dispatcher.wake()
+
+
+def _chunks(header: Optional[str], entries: List[Tuple[int, str]], separator: str) -> List[Tuple[str, List[int]]]:
+    """Pack (row id, text) entries into messages under Telegram's length limit."""
+    messages, lines, ids = [], [header] if header else [], []
+    size = len(header) if header else 0
+    for row_id, text in entries:
+        text = text[:TELEGRAM_MESSAGE_LIMIT]
+        if ids and size + len(text) + len(separator) > TELEGRAM_MESSAGE_LIMIT:
+            messages.append((separator.join(lines), ids))
+            lines, ids, size = [], [], 0
+        lines.append(text)
+        ids.append(row_id)
+        size += len(text) + len(separator)
+    if ids:
+        messages.append((separator.join(lines), ids))
+    return messages
+
+
+def coalesce(rows: List[NotificationOutbox]) -> List[Tuple[str, str, List[int]]]:
+    """Group pending rows into (chat_id, text, row ids) messages, oldest group first."""
+    groups = OrderedDict()
+    for row in rows:
+        groups.setdefault((row.chat_id, row.kind), []).append(row)
+
+    messages = []
+    for (chat_id, kind), group in groups.items():
+        summary = COALESCED_SUMMARIES.get(kind)
+        if len(group) > 1 and summary:
+            # One line per event under a count header
+            entries = [(row.id, "• " + row.message.strip().splitlines()[0][:300]) for row in group]
+            header = summary.format(count=len(group))
+            packed = _chunks(header, entries, "\n")
+        else:
+            packed = _chunks(None, [(row.id, row.message) for row in group], "\n\n")
+        messages.extend((chat_id, text, ids) for text, ids in packed)
+    return messages
+
+
+class NotificationDispatcher:
+    def __init__(self, db_factory=AsyncSessionLocal, poll_interval: float = NOTIFY_POLL_INTERVAL,
+                 batch_limit: int = NOTIFY_BATCH_LIMIT, max_attempts: int = NOTIFY_MAX_ATTEMPTS,
+                 lease_seconds: float = NOTIFY_LEASE_SECONDS, sender=telegram_sender):
+        self.db_factory = db_factory
+        self.poll_interval = poll_interval
+        self.batch_limit = batch_limit
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.sender = sender
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+        self.sent = 0
+        self.failed = 0
+        self.messages = 0
+
+    async def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        self._wake.set()
+        # Let an in-progress drain finish so its rows are marked
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def wake(self):
+        """Drain now instead of at the next poll; safe from any thread."""
+        if self._loop is not None and self._wake is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _run(self):
+        while self._running:
+            self._wake.clear()
+            try:
+                drained = await self.drain_once()
+            except Exception as e:
+                logger.error(f"Notification dispatch failed: {e}")
+                drained = 0
+            if drained >= self.batch_limit:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _deliver(self, chat_id: str, text: str) -> Optional[str]:
+        """Send one message; returns the error, if any."""
+        result = await self.sender.send(chat_id, {"text": text}, priority=BULK)
+        return result.error
+
+    async def _claim(self) -> List[NotificationOutbox]:
+        """Lease one batch of due rows and count the attempt, committed before sending."""
+        async with self.db_factory() as db:
+            now = datetime.now()
+            result = await db.execute(
+                select(NotificationOutbox)
+                .where(NotificationOutbox.status == "pending", NotificationOutbox.available_at <= now)
+                .order_by(NotificationOutbox.available_at, NotificationOutbox.id)
+                .limit(self.batch_limit)
+                .with_for_update(skip_locked=True)
+            )
+            rows = result.scalars().all()
+            for row in rows:
+                row.attempts += 1
+                row.available_at = now + timedelta(seconds=self.lease_seconds)
+            await db.commit()
+            return rows
+
+    async def drain_once(self) -> int:
+        """Send one batch of due notifications; returns how many rows were handled."""
+        rows = await self._claim()
+        if not rows:
+            return 0
+
+        by_id = {row.id: row for row in rows}
+        messages = coalesce(rows)
+        outcomes = await asyncio.gather(*[self._deliver(chat_id, text) for chat_id, text, _ in messages])
+        now = datetime.now()
+        updates = []
+        for (_, _, ids), error in zip(messages, outcomes):
+            self.messages += error is None
+            for row_id in ids:
+                attempts = by_id[row_id].attempts
+                if error is None:
+                    updates.append({"id": row_id, "status": "sent", "sent_at": now, "last_error": None})
+                    self.sent += 1
+                elif attempts >= self.max_attempts:
+                    updates.append({"id": row_id, "status": "failed", "last_error": error})
+                    self.failed += 1
+                else:
+                    updates.append({"id": row_id, "last_error": error,
+                                    "available_at": now + timedelta(seconds=retry_delay(attempts))})
+        async with self.db_factory() as db:
+            # Bulk UPDATE by primary key; rows with the same columns share an executemany
+            await db.execute(update(NotificationOutbox), updates)
+            await db.commit()
+        return len(rows)
+
+    def stats(self) -> dict:
+        return {
+            "running": self._running,
+            "sent": self.sent,
+            "failed": self.failed,
+            "messages": self.messages,
+        }
+
+
+async def outbox_counts(db) -> dict:
+    result = await db.execute(
+        select(NotificationOutbox.status, func.count(NotificationOutbox.id)).group_by(NotificationOutbox.status)
+    )
+    return dict(result.all())
+
+
+notification_dispatcher = NotificationDispatcher()
@@ -0,0 +1,110 @@
+import json
+import base64
+from datetime import date, datetime
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import Date, DateTime, tuple_
+from sqlalchemy.orm import load_only
+
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, (date, datetime)) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> List[Any]:
+    """Turn an opaque cursor back into values typed like `columns`."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("cursor does not match the sort key")
+        typed = []
+        for column, value in zip(columns, values):
+            if value is not None and isinstance(column.type, DateTime):
+                value = datetime.fromisoformat(value)
+            elif value is not None and isinstance(column.type, Date):
+                value = date.fromisoformat(value)
+            typed.append(value)
+        return typed
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+
+
+def keyset(stmt, columns: Sequence, cursor: Optional[str], limit: Optional[int], descending: bool = False):
+    """Order `stmt` by `columns` and start after `cursor`.
+
+    Fetches one extra row so `page()` can tell whether another page exists.
+    The comparison is a row-value one, which a composite index on the same
+    columns serves directly.
+    """
+    if cursor:
+        after = decode_cursor(cursor, columns)
+        key = tuple_(*columns)
+        stmt = stmt.where(key < tuple_(*after) if descending else key > tuple_(*after))
+    stmt = stmt.order_by(*[c.desc() if descending else c.asc() for c in columns])
+    if limit:
+        stmt = stmt.limit(limit + 1)
+    return stmt
+
+
+def page(rows: Sequence, columns: Sequence, limit: Optional[int]) -> Tuple[List, Optional[str]]:
+    """Trim the look-ahead row and build the cursor for the next page."""
+    rows = list(rows)
+    if not limit or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, c.key) for c in columns])
+
+
+def select_fields(model, fields: Optional[str], view: Optional[str], summary: Iterable[str],
+                  always: Iterable[str] = ("id",)) -> Optional[List[str]]:
+    """Resolve `fields=` / `view=summary` into the column names to load.
+
+    Returns None when the full row was asked for.
+    """
+    if fields:
+        names = [f.strip() for f in fields.split(",") if f.strip()]
+    elif view == "summary":
+        names = list(summary)
+    elif view in (None, "full"):
+        return None
+    else:
+        raise HTTPException(status_code=400, detail=f"Unknown view '{view}'")
+
+    columns = set(model.__table__.columns.keys())
+    unknown = [name for name in names if name not in columns]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(unknown)}")
+    return list(dict.fromkeys([*always, *names]))
+
+
+def load_fields(stmt, model, names: Optional[List[str]]):
+    if names is None:
+        return stmt
+    return stmt.options(load_only(*[getattr(model, name) for name in names]))
+
+
+def project(rows: Sequence, names: List[str]) -> list:
+    """Serialize only the loaded columns, so deferred ones are never fetched."""
+    return jsonable_encoder([{name: getattr(row, name) for name in names} for row in rows])
+
+
+def paginated(response, rows: Sequence, names: Optional[List[str]], next_cursor: Optional[str]):
+    """Return rows for a list route, with the next cursor in X-Next-Cursor.
+
+    Sparse results bypass the route's response_model, which would otherwise
+    require (and lazily load) every column.
+    """
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    if names is None:
+        if headers:
+            response.headers.update(headers)
+        return rows
+    return JSONResponse(project(rows, names), headers=headers)
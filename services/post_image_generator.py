@@ -0,0 +1,128 @@
+import asyncio
+import logging
+
+from database.db import AsyncSessionLocal
+from database.models import ContentPost
+from services.image_prompt_generator import generate_image_prompts
+from services.image_service_switcher import generate_image
+
+logger = logging.getLogger(__name__)
+
+
+async def process_image_generation(post_id: int, num_images: int, style: str, image_service: str,
+                                   force_regenerate: bool = False):
+    # Create a new session for database updates
+    async with AsyncSessionLocal() as async_db:
+        # Get fresh post instance in this session
+        post_instance = await async_db.get(ContentPost, post_id)
+        if not post_instance:
+            logger.error(f"Post {post_id} not found in background task")
+            return
+
+        try:
+            # Update progress
+            await update_progress(async_db, post_instance, 10, "Generating prompts")
+            
+            # Directly await the async function - no run_in_executor needed
+            prompt_tuples = await generate_image_prompts(
+                post_instance.content, 
+                style=style, 
+                num_prompts=num_images
+            )
+            
+            # Extract only english_prompts for image generation
+            prompts = [eng for _, eng, _ in prompt_tuples]
+            
+            logger.info(f"Generated {len(prompts)} prompts with style '{style}'")
+            
+            await update_progress(async_db, post_instance, 20, f"Starting generation of {len(prompts)} images")
+            
+            # Process images in parallel with semaphore to limit concurrency
+            semaphore = asyncio.Semaphore(3)  # Limit to 3 concurrent image generations
+            
+            async def process_single_image(idx, prompt):
+                async with semaphore:
+                    try:
+                        # Generate image
+                        url = await generate_image(
+                            prompt,
+                            service=image_service,
+                            post_id=post_id if image_service.lower() == "gemini" else None,
+                            style=style,
+                            force_regenerate=force_regenerate
+                        )
+                        
+                        if url:
+                            return {
+                                "url": url,
+                                "prompt": prompt,
+                                "order": idx + 1,
+                                "isSelected": True,
+                                "provider": image_service,
+                                "metadata": {
+                                    "width": 9,
+                                    "height": 16,
+                                    "style": style
+                                }
+                            }
+                        return None
+                    except Exception as e:
+                        logger.error(f"Error generating image {idx+1}: {str(e)}")
+                        await update_progress(
+                            async_db, 
+                            post_instance, 
+                            None,  # Don't update progress percentage
+                            f"Error with image {idx+1}: {str(e)[:100]}"
+                        )
+                        return None
+            
+            # Create tasks for all images
+            image_tasks = []
+            for i, prompt in enumerate(prompts):
+                task = process_single_image(i, prompt)
+                image_tasks.append(task)
+            
+            # Process images and maintain original order
+            results = await asyncio.gather(*image_tasks)
+            
+            # Filter out None results (failed generations) but preserve ordering
+            images = [img for img in results if img]
+            
+            # Update progress
+            await update_progress(
+                async_db,
+                post_instance,
+                90,
+                f"Generated {len(images)}/{len(prompts)} images successfully"
+            )
+            
+            # Update post with generated images
+            post_instance.images = {"images": images}
+            post_instance.image_status = "completed" if images else "failed"
+            post_instance.image_progress = 100
+            post_instance.image_status_detail = f"Completed with {len(images)} images" if images else "Failed to generate any images"
+            await async_db.commit()
+            
+            logger.info(f"Successfully completed image generation for post {post_id}")
+            
+        except Exception as e:
+            logger.exception(f"Error in image generation task: {str(e)}")
+            post_instance.image_status = "failed"
+            post_instance.image_status_detail = f"Error: {str(e)[:200]}"
+            post_instance.image_progress = 0
+            await async_db.commit()
+
+# Helper function to update progress
+async def update_progress(db, post, progress=None, status_detail=None):
+    # Concurrent image tasks share one AsyncSession, which allows a single operation at a time
+    async with db.info.setdefault("progress_lock", asyncio.Lock()):
+        try:
+            if progress is not None:
+                post.image_progress = progress
+            if status_detail is not None:
+                post.image_status_detail = status_detail
+            await db.commit()
+            logger.debug(f"Updated progress for post {post.id}: {progress}%, {status_detail}")
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Failed to update progress: {str(e)}")
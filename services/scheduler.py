@@ -1,32 +1,178 @@
-from sqlalchemy.orm import Session
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import Date, cast, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from database.models import ContentPost, Campaign
-from datetime import date
-from services.telegram_handler import send_telegram_message
-from fastapi import HTTPException
-import requests
-import os
+from services.facebook_publisher import facebook_publisher, PublishItem
+from services.notifications import notify
 from dotenv import load_dotenv
 load_dotenv()
 
-def run_daily_schedule(db: Session) -> int:
-    count = 0
-
-    active_campaigns = db.query(Campaign).filter(Campaign.is_active).all()
-    for campaign in active_campaigns:
-        # Find the next scheduled post
-        post = db.query(ContentPost).filter(
-            ContentPost.campaign_id == campaign.id,
-            ContentPost.status == "scheduled"
-        ).order_by(ContentPost.created_at.asc(), ContentPost.id.asc()).first()
-
-        if post:
-            # Post to Facebook
-            from services.facebook_handler import post_to_facebook
-            success = post_to_facebook(post.content, campaign.title)
-            if success:
-                post.status = "posted"
-                post.posted_at = date.today()
-                db.commit()
-                count += 1
-
-    return count
+# Claimed posts sit in this status while they are being published
+PUBLISHING_STATUS = "publishing"
+# Facebook may or may not have published these (timeout, 5xx); they are never re-sent automatically
+UNKNOWN_STATUS = "publish_unknown"
+
+# (last_run_date, next_run_date) of a campaign before a run claimed it
+CampaignDates = Tuple[Optional[date], Optional[date]]
+
+
+def campaign_due_on(today: date):
+    """Active campaigns whose next run is today or earlier.
+
+    The SQL twin of campaign_scheduler.campaign_due_date: next_run_date,
+    else last_run_date + repeat_every_days, else start_date. A campaign with
+    none of them is never due.
+    """
+    due_date = func.coalesce(
+        Campaign.next_run_date,
+        Campaign.last_run_date + Campaign.repeat_every_days,
+        Campaign.start_date,
+    )
+    return Campaign.is_active & (due_date <= today)
+
+
+async def claim_campaign_runs(db: AsyncSession, today: date,
+                              campaign_ids: Optional[List[int]] = None) -> Dict[int, CampaignDates]:
+    """Advance every due campaign (or the due ones among `campaign_ids`) to its next run.
+
+    Returns the claimed campaigns' previous dates, for restore_campaign_runs.
+    The daily trigger and the campaign scheduler both claim through this, so
+    a campaign publishes at most once per due date whichever path gets there
+    first; rows another run is claiming right now are skipped. Nothing is
+    committed here.
+    """
+    query = (
+        select(Campaign.id, Campaign.last_run_date, Campaign.next_run_date)
+        .where(campaign_due_on(today))
+        .with_for_update(skip_locked=True)
+    )
+    if campaign_ids is not None:
+        query = query.where(Campaign.id.in_(campaign_ids))
+    previous = {campaign_id: (last, next_) for campaign_id, last, next_ in (await db.execute(query)).all()}
+    if previous:
+        await db.execute(
+            update(Campaign)
+            .where(Campaign.id.in_(list(previous)))
+            .values(last_run_date=today, next_run_date=cast(today, Date) + Campaign.repeat_every_days)
+            .execution_options(synchronize_session=False)
+        )
+    return previous
+
+
+async def restore_campaign_runs(db: AsyncSession, today: date, previous: Dict[int, CampaignDates]):
+    """Make campaigns whose post certainly did not go out due again; nothing is committed.
+
+    Campaigns rescheduled since they were claimed are left alone.
+    """
+    for campaign_id, (last, next_) in previous.items():
+        await db.execute(
+            update(Campaign)
+            .where(Campaign.id == campaign_id, Campaign.last_run_date == today)
+            .values(last_run_date=last, next_run_date=next_)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def due_posts(campaign_ids: Optional[List[int]] = None):
+    """The oldest scheduled post of every active campaign (or of `campaign_ids`), in one statement.
+
+    DISTINCT ON keeps the first row per campaign in (created_at, id) order;
+    ix_content_posts_scheduled serves the scan.
+    """
+    query = (
+        select(ContentPost.id)
+        .join(Campaign, Campaign.id == ContentPost.campaign_id)
+        .where(Campaign.is_active, ContentPost.status == "scheduled")
+        .distinct(ContentPost.campaign_id)
+        .order_by(ContentPost.campaign_id, ContentPost.created_at, ContentPost.id)
+    )
+    if campaign_ids is not None:
+        query = query.where(ContentPost.campaign_id.in_(campaign_ids))
+    return query
+
+
+async def claim_due_posts(db: AsyncSession, run_id: str, campaign_ids: Optional[List[int]] = None) -> List:
+    """Move every due post to PUBLISHING_STATUS, tagged with `run_id`, and commit.
+
+    Returns (id, content, campaign title, campaign id) rows. The UPDATE takes
+    the row locks and re-checks the status, so two runs racing each other
+    never claim the same post.
+    """
+    due = due_posts(campaign_ids).subquery()
+    result = await db.execute(
+        update(ContentPost)
+        .where(
+            ContentPost.id.in_(select(due.c.id)),
+            ContentPost.status == "scheduled",
+            Campaign.id == ContentPost.campaign_id,
+        )
+        .values(status=PUBLISHING_STATUS, publish_claim=run_id)
+        .returning(ContentPost.id, ContentPost.content, Campaign.title, Campaign.id)
+        .execution_options(synchronize_session=False)
+    )
+    claimed = result.all()
+    await db.commit()
+    return claimed
+
+
+async def abandon_publishing_posts(db: AsyncSession, run_id: str) -> int:
+    """Mark posts an earlier attempt of run `run_id` left claimed as UNKNOWN_STATUS.
+
+    That attempt may have died after Facebook accepted them (e.g. while
+    writing the outcome), so they are never put back in the schedule and
+    their campaigns are not made due again. Posts claimed by other runs,
+    which may still be publishing them, are left alone.
+    """
+    result = await db.execute(
+        update(ContentPost)
+        .where(ContentPost.status == PUBLISHING_STATUS, ContentPost.publish_claim == run_id)
+        .values(status=UNKNOWN_STATUS, publish_claim=None,
+                publish_error=f"Run {run_id} stopped while publishing; outcome unknown, not retried")
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def run_daily_schedule(db: AsyncSession, run_id: str) -> Dict[str, int]:
+    # Only campaigns that are due publish, and claiming them advances their dates
+    today = date.today()
+    previous = await claim_campaign_runs(db, today)
+    claimed = await claim_due_posts(db, run_id, list(previous)) if previous else []
+    if not previous:
+        await db.commit()
+
+    items = [PublishItem(post_id, content) for post_id, content, _, _ in claimed]
+    results = await facebook_publisher.publish_batch(items)
+
+    # One executemany per outcome instead of a commit per post
+    now = datetime.now()
+    posted = [
+        {"id": item.post_id, "status": "posted", "posted_at": now,
+         "facebook_post_id": result.facebook_post_id, "publish_error": None, "publish_claim": None}
+        for item, result in zip(items, results) if result.ok
+    ]
+    # Failed posts stay first in line for the next run, unless they may have gone out
+    failed = [
+        {"id": item.post_id, "status": UNKNOWN_STATUS if result.outcome_unknown else "scheduled",
+         "publish_error": result.error, "publish_claim": None}
+        for item, result in zip(items, results) if not result.ok
+    ]
+    for rows in (posted, failed):
+        if rows:
+            await db.execute(update(ContentPost), rows)
+    # ...and their campaigns due again, so the next run or the campaign scheduler retries them
+    await restore_campaign_runs(db, today, {
+        campaign_id: previous[campaign_id]
+        for (_, _, _, campaign_id), result in zip(claimed, results)
+        if not result.ok and not result.outcome_unknown
+    })
+    # The dispatcher coalesces these into one "N posts published" message
+    for (_, content, campaign_title, _), result in zip(claimed, results):
+        if result.ok:
+            notify(db, f"📢 Post from campaign '{campaign_title}' sent to Facebook!\n\n{content}", kind="post_published")
+        else:
+            notify(db, f"❌ Failed to post to Facebook for campaign '{campaign_title}': {result.error}", kind="publish_failed")
+    await db.commit()
+
+    return {"claimed": len(claimed), "posted": len(posted), "failed": len(failed)}
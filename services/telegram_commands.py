@@ -0,0 +1,95 @@
+"""Routes one Telegram update (command or button click) to its bot command."""
+from typing import Optional
+
+from services.logger import logger
+from services.telegram_handler import (
+    send_telegram_message, start, list_campaigns, create_campaign,
+    generate_themes, list_themes, select_theme,
+    list_posts, view_post, redo_post
+)
+
+
+def update_chat_id(update: dict) -> Optional[int]:
+    """The chat an update belongs to, for messages and button clicks alike."""
+    if callback_query := update.get("callback_query"):
+        return (callback_query.get("message") or {}).get("chat", {}).get("id")
+    if message := update.get("message"):
+        return message.get("chat", {}).get("id")
+    return None
+
+
+async def handle_update(update: dict):
+    # Handle callback queries (button clicks)
+    if callback_query := update.get("callback_query"):
+        chat_id = callback_query["message"]["chat"]["id"]
+        callback_data = callback_query["data"]
+
+        if callback_data.startswith("select_theme_"):
+            theme_id = callback_data.split("_")[-1]
+            reply = await select_theme(theme_id)
+            await send_telegram_message(reply, chat_id)
+        return
+
+    message = update.get("message")
+    if not message:
+        return
+
+    chat_id = message["chat"]["id"]
+    text = message.get("text", "")
+    parts = text.strip().split(" ")
+    cmd = parts[0].lower()
+    args = parts[1:]
+
+    try:
+        if cmd == "/start":
+            reply = start()
+        elif cmd == "/campaigns":
+            reply = await list_campaigns()
+        elif cmd == "/create_campaign":
+            if len(args) < 5:
+                reply = "Usage: /create_campaign <title> <days> <target_customer> <insight> <desc>"
+            else:
+                title = args[0]
+                days = int(args[1])
+                target = args[2]
+                insight = args[3]
+                desc = " ".join(args[4:])
+                reply = await create_campaign(title, days, target, insight, desc)
+        elif cmd == "/generate_themes":
+            if not args:
+                reply = "Usage: /generate_themes <campaign_id> - Generate 5 unique themes for your campaign"
+            else:
+                reply = await generate_themes(args[0])
+        elif cmd == "/themes":
+            if not args:
+                reply = "Usage: /themes <campaign_id> - View all themes for your campaign"
+            else:
+                reply = await list_themes(args[0])
+        elif cmd == "/select_theme":
+            if not args:
+                reply = "Usage: /select_theme <theme_id> - Choose a theme and start generating posts"
+            else:
+                reply = await select_theme(args[0])
+        elif cmd == "/posts":
+            if not args:
+                reply = "Usage: /posts <campaign_id> - View all posts in your campaign"
+            else:
+                reply = await list_posts(args[0])
+        elif cmd == "/view_post":
+            if not args:
+                reply = "Usage: /view_post <post_id> - See the full content of a specific post"
+            else:
+                reply = await view_post(int(args[0]))
+        elif cmd == "/redo_post":
+            if not args:
+                reply = "Usage: /redo_post <post_id> - Not happy with a post? Regenerate it!"
+            else:
+                reply = await redo_post(args[0])
+        else:
+            reply = "Unknown command. Try /start"
+
+        await send_telegram_message(reply, chat_id)
+
+    except Exception as e:
+        logger.error(f"Command {cmd} failed: {e}")
+        await send_telegram_message(f"⚠️ Error: {str(e)}", chat_id)
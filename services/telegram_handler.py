@@ -2,83 +2,32 @@ import os
 import httpx
 from dotenv import load_dotenv
 from services.logger import logger
+from services.bot_api import BotApiError, get_bot_api
+from services.telegram_sender import telegram_sender, TELEGRAM_TOKEN, INTERACTIVE
 
 load_dotenv()
 
-TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")  # Set per-user in future
-API_BASE = os.getenv("API_BASE", "http://localhost:8000")
-BASE_URL = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}"
 
-# Initialize base URL for API endpoints
-base_url = API_BASE.rstrip('/')
-
-# Shared utility function for making API requests
-async def make_api_request(endpoint: str, method: str = 'get', data: dict = None):
-    # Normalize endpoint by removing trailing slashes for consistency
-    endpoint = endpoint.rstrip('/')
-    url = f"{base_url}/{endpoint}"
-    logger.info(f"Attempting {method.upper()} request to {url}")
-    
-    async with httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=10.0), follow_redirects=True) as client:
-        try:
-            if method.lower() == 'post':
-                res = await client.post(url, json=data) if data else await client.post(url)
-            else:
-                res = await client.get(url)
-            
-            logger.info(f"API Response status: {res.status_code}")
-            if res.history:
-                logger.info(f"Request was redirected. Final URL: {res.url}")
-            res.raise_for_status()
-            return res.json()
-        except httpx.ConnectTimeout:
-            logger.error(f"Connection timeout while connecting to {url}")
-            raise
-        except httpx.ReadTimeout:
-            logger.error("Read timeout while making API request")
-            raise
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP {e.response.status_code} error: {str(e)}")
-            raise
-        except httpx.RequestError as e:
-            logger.error(f"Request failed: {str(e)}")
-            raise
-        except Exception as e:
-            logger.error(f"Unexpected error: {str(e)}")
-            raise
-
-async def send_telegram_message(text: str, chat_id: str = CHAT_ID, reply_markup: dict = None):
+async def send_telegram_message(text: str, chat_id: str = CHAT_ID, reply_markup: dict = None,
+                                priority: int = INTERACTIVE):
     if not TELEGRAM_TOKEN or not chat_id:
         logger.warning("Telegram token or chat_id not set")
         return
 
-    async with httpx.AsyncClient(timeout=httpx.Timeout(10.0, connect=5.0)) as client:
-        try:
-            data = {"chat_id": chat_id}
-            if isinstance(text, dict) and "text" in text and "reply_markup" in text:
-                data.update(text)
-            else:
-                data["text"] = text
-                if reply_markup:
-                    data["reply_markup"] = reply_markup
-            response = await client.post(
-                f"{BASE_URL}/sendMessage",
-                json=data
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.ConnectTimeout:
-            logger.error("Telegram connection timed out")
-        except httpx.ReadTimeout:
-            logger.error("Telegram response timed out")
-        except httpx.TimeoutException:
-            logger.error("Telegram request timed out")
-        except httpx.HTTPError as e:
-            logger.error(f"Telegram message failed: {e}")
-        except Exception as e:
-            logger.error(f"Unexpected error: {e}")
+    data = {}
+    if isinstance(text, dict) and "text" in text and "reply_markup" in text:
+        data.update(text)
+    else:
+        data["text"] = text
+        if reply_markup:
+            data["reply_markup"] = reply_markup
+    # Paced under Telegram's global and per-chat limits; 429s are retried there
+    result = await telegram_sender.send(chat_id, data, priority=priority)
+    if not result.ok:
+        logger.error(f"Telegram message failed: {result.error}")
         return None
+    return {"ok": True, "result": result.result}
 
 # Command implementations
 def start():
@@ -131,7 +80,7 @@ async def create_campaign(title, repeat_days, target_customer, insight, descript
         "generation_mode": "pre-batch"
     }
     try:
-        campaign = await make_api_request('campaigns/', 'post', payload)
+        campaign = await get_bot_api().create_campaign(payload)
         success_msg = f"✅ Campaign created! ID: {campaign['id']}"
         example_msg = "\n\nCreate another campaign using this format:\n/create_campaign <title> <repeat_days> \"<target_customer>\" \"<insight>\" \"<description>\""
         logger.info(f"Campaign created successfully with ID: {campaign['id']}")
@@ -142,8 +91,8 @@ async def create_campaign(title, repeat_days, target_customer, insight, descript
             return "❌ Failed to create campaign: Connection timeout. Please try again."
         elif isinstance(e, httpx.ReadTimeout):
             return "❌ Failed to create campaign: Server took too long to respond. Please try again."
-        elif isinstance(e, httpx.HTTPStatusError):
-            return f"❌ Failed to create campaign: Server returned {e.response.status_code} error. Please try again later."
+        elif isinstance(e, BotApiError):
+            return f"❌ Failed to create campaign: Server returned {e.status_code} error. Please try again later."
         elif isinstance(e, httpx.RequestError):
             return "❌ Failed to create campaign: Network or connection error. Please check your connection."
         else:
@@ -151,7 +100,7 @@ async def create_campaign(title, repeat_days, target_customer, insight, descript
 
 async def list_campaigns():
     try:
-        campaigns = await make_api_request('campaigns/')
+        campaigns = await get_bot_api().list_campaigns()
         if not campaigns:
             return "📋 No campaigns found. Create one using /create_campaign"
         return "📋 Campaigns:\n" + "\n".join([f"{c['id']}: {c['title']}" for c in campaigns])
@@ -160,8 +109,8 @@ async def list_campaigns():
             return "❌ Failed to connect to campaigns API: Connection timeout. Please check if the API server is running."
         elif isinstance(e, httpx.ReadTimeout):
             return "❌ Failed to fetch campaigns: Server took too long to respond. Please try again."
-        elif isinstance(e, httpx.HTTPStatusError):
-            return f"❌ Failed to fetch campaigns: Server returned {e.response.status_code} error. Please try again later."
+        elif isinstance(e, BotApiError):
+            return f"❌ Failed to fetch campaigns: Server returned {e.status_code} error. Please try again later."
         elif isinstance(e, httpx.RequestError):
             return "❌ Failed to fetch campaigns: Network or connection error. Please check your connection."
         else:
@@ -171,21 +120,21 @@ async def generate_themes(campaign_id):
     try:
         # First check if campaign exists
         try:
-            campaign = await make_api_request(f'campaigns/{campaign_id}')
-        except httpx.HTTPStatusError as e:
-            if e.response.status_code == 404:
+            campaign = await get_bot_api().get_campaign(campaign_id)
+        except BotApiError as e:
+            if e.status_code == 404:
                 return f"⚠️ Campaign {campaign_id} not found. Use /campaigns to see available campaigns."
             raise
             
-        await make_api_request(f'themes/campaigns/{campaign_id}/generate_themes', 'post')
+        await get_bot_api().generate_themes(campaign_id)
         return f"🎯 5 themes generated for campaign {campaign_id}\n\nUse /themes {campaign_id} to view and select a theme."
     except Exception as e:
         if isinstance(e, httpx.ConnectTimeout):
             return "❌ Failed to generate themes: Connection timeout. Please try again."
         elif isinstance(e, httpx.ReadTimeout):
             return "❌ Failed to generate themes: Server took too long to respond. Please try again."
-        elif isinstance(e, httpx.HTTPStatusError):
-            return f"❌ Failed to generate themes: Server returned {e.response.status_code} error. Please try again later."
+        elif isinstance(e, BotApiError):
+            return f"❌ Failed to generate themes: Server returned {e.status_code} error. Please try again later."
         elif isinstance(e, httpx.RequestError):
             return "❌ Failed to generate themes: Network or connection error. Please check your connection."
         else:
@@ -195,13 +144,13 @@ async def list_themes(campaign_id):
     try:
         # First check if campaign exists
         try:
-            campaign = await make_api_request(f'campaigns/{campaign_id}')
-        except httpx.HTTPStatusError as e:
-            if e.response.status_code == 404:
+            campaign = await get_bot_api().get_campaign(campaign_id)
+        except BotApiError as e:
+            if e.status_code == 404:
                 return "⚠️ Campaign not found. Please check if the campaign ID exists or use /campaigns to see available campaigns."
             raise
 
-        themes = await make_api_request(f'themes/campaigns/{campaign_id}')
+        themes = await get_bot_api().list_themes(campaign_id)
         if not themes:
             return f"📋 No themes found for campaign '{campaign.get('title', 'Unknown')}'. Use /generate_themes {campaign_id} to create new themes."
         
@@ -224,8 +173,8 @@ async def list_themes(campaign_id):
             return "❌ Failed to fetch themes: Connection timeout. Please try again."
         elif isinstance(e, httpx.ReadTimeout):
             return "❌ Failed to fetch themes: Server took too long to respond. Please try again."
-        elif isinstance(e, httpx.HTTPStatusError):
-            return f"❌ Failed to fetch themes: Server returned {e.response.status_code} error. Please try again later."
+        elif isinstance(e, BotApiError):
+            return f"❌ Failed to fetch themes: Server returned {e.status_code} error. Please try again later."
         elif isinstance(e, httpx.RequestError):
             return "❌ Failed to fetch themes: Network or connection error. Please check your connection."
         else:
@@ -235,25 +184,24 @@ async def select_theme(theme_id):
     try:
         # First check if theme exists and get its details
         try:
-            # Remove trailing slash to ensure consistent URL format
-            theme = await make_api_request(f'themes/{theme_id}')
+            theme = await get_bot_api().get_theme(theme_id)
             if not theme:
                 logger.error(f"Theme {theme_id} returned empty response")
                 return "⚠️ Theme not found or invalid. Please check the theme ID and try again."
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP error accessing theme {theme_id}: {e.response.status_code}")
-            if e.response.status_code == 404:
+        except BotApiError as e:
+            logger.error(f"HTTP error accessing theme {theme_id}: {e.status_code}")
+            if e.status_code == 404:
                 # Try to get campaign themes to provide better guidance
                 try:
                     # Get all campaigns to suggest valid options
-                    campaigns = await make_api_request('campaigns')
+                    campaigns = await get_bot_api().list_campaigns(limit=5)
                     if campaigns:
                         campaign_list = "\n".join([f"- Campaign {c['id']}: {c['title']}" for c in campaigns[:5]])
                         return f"⚠️ Theme {theme_id} not found. Available campaigns:\n{campaign_list}\n\nUse /themes <campaign_id> to see available themes."
                 except Exception:
                     pass
                 return f"⚠️ Theme {theme_id} not found. Please check if the theme ID exists and try again."
-            return f"⚠️ Server error: {e.response.status_code}. Please try again later."
+            return f"⚠️ Server error: {e.status_code}. Please try again later."
         except Exception as e:
             logger.error(f"Unexpected error accessing theme {theme_id}: {e}")
             return "⚠️ Server error. Please try again later."
@@ -266,7 +214,7 @@ async def select_theme(theme_id):
             
         # Check if any theme is already selected for this campaign
         try:
-            campaign_themes = await make_api_request(f'themes/campaigns/{campaign_id}')
+            campaign_themes = await get_bot_api().list_themes(campaign_id)
             if not campaign_themes:
                 logger.error(f"No themes found for campaign {campaign_id}")
                 return "⚠️ No themes found for this campaign."
@@ -275,7 +223,7 @@ async def select_theme(theme_id):
                 if t.get('status') == 'selected':
                     logger.info(f"Theme {t.get('id')} is already selected for campaign {campaign_id}")
                     return f"⚠️ Theme {t.get('id')} is already selected for this campaign. To use a different theme, please create a new campaign first."
-        except httpx.HTTPStatusError as e:
+        except BotApiError as e:
             logger.error(f"HTTP error checking campaign themes: {e}")
             return f"⚠️ Error checking campaign themes. Please try again later."
         except Exception as e:
@@ -288,10 +236,10 @@ async def select_theme(theme_id):
             return f"⚠️ Theme '{theme.get('title', 'Unknown')}' has already been selected."
             
         try:
-            await make_api_request(f'themes/{theme_id}/select', 'post')
+            await get_bot_api().select_theme(theme_id)
             logger.info(f"Successfully selected theme {theme_id}")
             return f"✅ Theme '{theme.get('title', 'Unknown')}' has been selected successfully. Posts will be generated automatically."
-        except httpx.HTTPStatusError as e:
+        except BotApiError as e:
             logger.error(f"HTTP error selecting theme {theme_id}: {e}")
             return f"⚠️ Failed to select theme. Please try again later."
         except Exception as e:
@@ -302,8 +250,8 @@ async def select_theme(theme_id):
             return "❌ Failed to select theme: Connection timeout. Please try again."
         elif isinstance(e, httpx.ReadTimeout):
             return "❌ Failed to select theme: Server took too long to respond. Please try again."
-        elif isinstance(e, httpx.HTTPStatusError):
-            return f"❌ Failed to select theme: Server returned {e.response.status_code} error. Please try again later."
+        elif isinstance(e, BotApiError):
+            return f"❌ Failed to select theme: Server returned {e.status_code} error. Please try again later."
         elif isinstance(e, httpx.RequestError):
             return "❌ Failed to select theme: Network or connection error. Please check your connection."
         else:
@@ -311,7 +259,7 @@ async def select_theme(theme_id):
 
 async def list_posts(campaign_id):
     try:
-        posts = await make_api_request(f'content/campaigns/{campaign_id}/posts')
+        posts = await get_bot_api().list_posts(campaign_id)
         if not posts:
             return "📋 No posts found yet. They will be generated after theme selection."
         return "📝 Posts:\n" + "\n".join([f"{p['id']}: {p['title']} ({p['status']})" for p in posts])
@@ -320,8 +268,8 @@ async def list_posts(campaign_id):
             return "❌ Failed to fetch posts: Connection timeout. Please try again."
         elif isinstance(e, httpx.ReadTimeout):
             return "❌ Failed to fetch posts: Server took too long to respond. Please try again."
-        elif isinstance(e, httpx.HTTPStatusError):
-            return f"❌ Failed to fetch posts: Server returned {e.response.status_code} error. Please try again later."
+        elif isinstance(e, BotApiError):
+            return f"❌ Failed to fetch posts: Server returned {e.status_code} error. Please try again later."
         elif isinstance(e, httpx.RequestError):
             return "❌ Failed to fetch posts: Network or connection error. Please check your connection."
         else:
@@ -329,15 +277,15 @@ async def list_posts(campaign_id):
 
 async def view_post(post_id):
     try:
-        post = await make_api_request(f'content/posts/{post_id}')
+        post = await get_bot_api().get_post(post_id)
         return f"📄 Post {post['id']}:\n{post['content']}\n\nStatus: {post['status']}"
     except Exception as e:
         if isinstance(e, httpx.ConnectTimeout):
             return "❌ Failed to fetch post: Connection timeout. Please try again."
         elif isinstance(e, httpx.ReadTimeout):
             return "❌ Failed to fetch post: Server took too long to respond. Please try again."
-        elif isinstance(e, httpx.HTTPStatusError):
-            return f"❌ Failed to fetch post: Server returned {e.response.status_code} error. Please try again later."
+        elif isinstance(e, BotApiError):
+            return f"❌ Failed to fetch post: Server returned {e.status_code} error. Please try again later."
         elif isinstance(e, httpx.RequestError):
             return "❌ Failed to fetch post: Network or connection error. Please check your connection."
         else:
@@ -345,7 +293,7 @@ async def view_post(post_id):
 
 async def redo_post(post_id):
     try:
-        await make_api_request(f'content/{post_id}/redo', 'post')
+        await get_bot_api().redo_post(post_id)
         # After successful regeneration, fetch and return the updated post content
         updated_post = await view_post(post_id)
         return f"🔁 Post {post_id} regenerated.\n\nUpdated content:\n{updated_post}"
@@ -354,8 +302,8 @@ async def redo_post(post_id):
             return "❌ Failed to regenerate post: Connection timeout. Please try again."
         elif isinstance(e, httpx.ReadTimeout):
             return "❌ Failed to regenerate post: Server took too long to respond. Please try again."
-        elif isinstance(e, httpx.HTTPStatusError):
-            return f"❌ Failed to regenerate post: Server returned {e.response.status_code} error. Please try again later."
+        elif isinstance(e, BotApiError):
+            return f"❌ Failed to regenerate post: Server returned {e.status_code} error. Please try again later."
         elif isinstance(e, httpx.RequestError):
             return "❌ Failed to regenerate post: Network or connection error. Please check your connection."
         else:
@@ -0,0 +1,186 @@
+"""Long-polling alternative to the Telegram webhook (TELEGRAM_MODE=polling).
+
+Useful where Telegram cannot reach us: a worker behind NAT, a laptop, or a
+load test against benchmarks/fake_telegram_api.py. The poller removes any
+webhook, then repeatedly long-polls getUpdates for up to
+TELEGRAM_POLL_LIMIT updates. It hands each update to the same UpdateQueue
+the webhook feeds, so a batch is processed concurrently across chats and
+in order within each chat.
+
+The next offset is stored in telegram_poll_offsets after every batch, so a
+restarted poller neither replays nor skips updates. Telegram allows one
+getUpdates consumer per bot, so a Postgres advisory lock elects the single
+polling replica, as for the campaign scheduler.
+"""
+import os
+import asyncio
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+import httpx
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from dotenv import load_dotenv
+
+from database.db import AsyncSessionLocal, leader_engine
+from database.models import TelegramPollOffset
+from services.http_clients import http_clients, TELEGRAM
+from services.job_queue import retry_delay
+from services.telegram_sender import TELEGRAM_TOKEN, BASE_URL
+from services.telegram_updates import telegram_updates, FULL
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# webhook: Telegram calls /webhook/telegram; polling: this module calls getUpdates
+TELEGRAM_MODE = os.getenv("TELEGRAM_MODE", "webhook").lower()
+TELEGRAM_POLL_TIMEOUT = int(os.getenv("TELEGRAM_POLL_TIMEOUT", "30"))
+TELEGRAM_POLL_LIMIT = int(os.getenv("TELEGRAM_POLL_LIMIT", "100"))
+TELEGRAM_POLL_LEADER_RETRY = float(os.getenv("TELEGRAM_POLL_LEADER_RETRY", "30"))
+# Arbitrary key shared by every replica; see services/campaign_scheduler.py
+TELEGRAM_POLL_LOCK_ID = 72_001_020
+ALLOWED_UPDATES = ["message", "callback_query"]
+
+
+class TelegramPoller:
+    def __init__(self, engine: AsyncEngine = leader_engine, db_factory=AsyncSessionLocal,
+                 updates=telegram_updates, base_url: str = BASE_URL,
+                 bot_id: Optional[str] = None, poll_timeout: int = TELEGRAM_POLL_TIMEOUT,
+                 limit: int = TELEGRAM_POLL_LIMIT, leader_retry: float = TELEGRAM_POLL_LEADER_RETRY):
+        self.engine = engine
+        self.db_factory = db_factory
+        self.updates = updates
+        self.base_url = base_url.rstrip("/")
+        # The numeric part of the token, so bots sharing a database keep separate offsets
+        self.bot_id = bot_id or (TELEGRAM_TOKEN or "").split(":")[0]
+        self.poll_timeout = poll_timeout
+        self.limit = min(max(1, limit), 100)
+        self.leader_retry = leader_retry
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+        self.is_leader = False
+        self.offset: Optional[int] = None
+        self.polls = 0
+        self.received = 0
+        self.errors = 0
+        self.queue_full = 0
+        self.last_poll_at: Optional[datetime] = None
+
+    async def start(self):
+        if self._running:
+            return
+        if not self.bot_id:
+            logger.warning("TELEGRAM_BOT_TOKEN not set; Telegram polling disabled")
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._elect_loop())
+
+    async def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _elect_loop(self):
+        while self._running:
+            try:
+                async with self.engine.connect() as conn:
+                    conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                    acquired = (await conn.execute(
+                        text("SELECT pg_try_advisory_lock(:id)"), {"id": TELEGRAM_POLL_LOCK_ID}
+                    )).scalar()
+                    if acquired:
+                        self.is_leader = True
+                        logger.info("Telegram poller elected leader")
+                        try:
+                            await self._poll(conn)
+                        finally:
+                            self.is_leader = False
+                            # Unlock explicitly in case a pooled engine was passed in
+                            await conn.execute(
+                                text("SELECT pg_advisory_unlock(:id)"), {"id": TELEGRAM_POLL_LOCK_ID}
+                            )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Telegram poller leadership lost: {e}")
+            await asyncio.sleep(self.leader_retry)
+
+    async def _call(self, method: str, payload: dict, timeout=httpx.USE_CLIENT_DEFAULT):
+        response = await http_clients.get(TELEGRAM).post(f"{self.base_url}/{method}", json=payload, timeout=timeout)
+        response.raise_for_status()
+        return response.json().get("result")
+
+    async def _load_offset(self) -> Optional[int]:
+        async with self.db_factory() as db:
+            row = await db.get(TelegramPollOffset, self.bot_id)
+            return row.next_offset if row else None
+
+    async def _save_offset(self, offset: int):
+        async with self.db_factory() as db:
+            await db.merge(TelegramPollOffset(bot_id=self.bot_id, next_offset=offset, updated_at=datetime.now()))
+            await db.commit()
+
+    async def get_updates(self) -> List[dict]:
+        payload = {"timeout": self.poll_timeout, "limit": self.limit, "allowed_updates": ALLOWED_UPDATES}
+        if self.offset is not None:
+            payload["offset"] = self.offset
+        # The long poll itself may take poll_timeout seconds
+        return await self._call("getUpdates", payload, timeout=self.poll_timeout + 10) or []
+
+    async def _poll(self, conn):
+        # getUpdates is refused while a webhook is set
+        await self._call("deleteWebhook", {"drop_pending_updates": False})
+        self.offset = await self._load_offset()
+        logger.info(f"Telegram polling from offset {self.offset}")
+        failures = 0
+        while self._running:
+            # Also proves the lock-holding connection is still alive
+            await conn.execute(text("SELECT 1"))
+            try:
+                updates = await self.get_updates()
+                failures = 0
+            except (httpx.HTTPError, ValueError) as e:
+                failures += 1
+                self.errors += 1
+                # 409: another consumer or a webhook took over the bot
+                logger.error(f"getUpdates failed: {e}")
+                await asyncio.sleep(retry_delay(failures))
+                continue
+            self.polls += 1
+            self.last_poll_at = datetime.now()
+            self.received += len(updates)
+
+            next_offset = self.offset
+            for update in updates:
+                # Duplicates count as handled; a full queue stops the batch here
+                if self.updates.accept(update) == FULL:
+                    self.queue_full += 1
+                    break
+                next_offset = update["update_id"] + 1
+            if next_offset != self.offset:
+                await self._save_offset(next_offset)
+                self.offset = next_offset
+            if len(updates) and next_offset != updates[-1]["update_id"] + 1:
+                # Let the queue drain; the rest is fetched again from the saved offset
+                await asyncio.sleep(1)
+
+    def stats(self) -> dict:
+        return {
+            "mode": TELEGRAM_MODE,
+            "running": self._running,
+            "is_leader": self.is_leader,
+            "offset": self.offset,
+            "polls": self.polls,
+            "received": self.received,
+            "errors": self.errors,
+            "queue_full": self.queue_full,
+            "last_poll_at": self.last_poll_at.isoformat() if self.last_poll_at else None,
+        }
+
+
+telegram_poller = TelegramPoller()
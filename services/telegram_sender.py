@@ -0,0 +1,272 @@
+"""Paced delivery of every outgoing Telegram Bot API call.
+
+Telegram allows about TELEGRAM_GLOBAL_RPS messages per second per bot and
+TELEGRAM_CHAT_RPS per chat, and answers anything faster with a 429 and a
+retry_after. TelegramSender keeps one global and one per-chat token bucket
+and only sends a message once both have a token, so broadcasts go out at
+the allowed rate instead of being throttled and dropped.
+
+Messages wait in two lanes. INTERACTIVE (command replies) always goes
+before BULK (notifications, summaries) once a chat may send, so a user's
+answer is not stuck behind a broadcast. A chat has at most one send in
+flight, so its messages arrive in order. A 429 pushes the chat back by
+retry_after and the message is retried, up to TELEGRAM_SEND_MAX_ATTEMPTS
+attempts in total.
+"""
+import os
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+import httpx
+from dotenv import load_dotenv
+
+from services.http_clients import http_clients, TELEGRAM
+from services.job_queue import retry_delay
+from services.rate_limit import KeyedTokenBuckets, TokenBucket
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+# Point at a local Bot API server or benchmarks/fake_telegram_api.py
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org").rstrip("/")
+BASE_URL = f"{TELEGRAM_API_URL}/bot{TELEGRAM_TOKEN}"
+TELEGRAM_GLOBAL_RPS = float(os.getenv("TELEGRAM_GLOBAL_RPS", "30"))
+TELEGRAM_CHAT_RPS = float(os.getenv("TELEGRAM_CHAT_RPS", "1"))
+TELEGRAM_SEND_MAX_ATTEMPTS = int(os.getenv("TELEGRAM_SEND_MAX_ATTEMPTS", "3"))
+
+# Lanes; lower goes first
+INTERACTIVE = 0
+BULK = 1
+LANES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+
+@dataclass
+class SendResult:
+    ok: bool
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    attempts: int = 0
+
+
+class _Outgoing:
+    __slots__ = ("chat_id", "method", "payload", "priority", "seq", "future", "attempts", "queued_at")
+
+    def __init__(self, chat_id: str, method: str, payload: dict, priority: int, seq: int, future):
+        self.chat_id = chat_id
+        self.method = method
+        self.payload = payload
+        self.priority = priority
+        self.seq = seq
+        self.future = future
+        self.attempts = 0
+        self.queued_at = time.monotonic()
+
+
+class TelegramSender:
+    def __init__(self, base_url: str = BASE_URL, global_rps: float = TELEGRAM_GLOBAL_RPS,
+                 chat_rps: float = TELEGRAM_CHAT_RPS, max_attempts: int = TELEGRAM_SEND_MAX_ATTEMPTS):
+        self.base_url = base_url.rstrip("/")
+        self.max_attempts = max_attempts
+        # No burst allowance: a full bucket followed by the steady rate would put
+        # up to twice the limit into one second
+        self.global_bucket = TokenBucket(global_rps, capacity=1)
+        self.chat_buckets = KeyedTokenBuckets(chat_rps)
+        self._seq = itertools.count()
+        # chat -> heap of (priority, seq, message) not yet sent
+        self._chats: Dict[str, List] = {}
+        # chat -> generation of its live _waiting/_ready entry; older entries are stale
+        self._scheduled: Dict[str, int] = {}
+        self._waiting: List = []  # (ready_at, generation, chat) until the chat's bucket has a token
+        self._ready: List = []    # (priority, seq, generation, chat) of the chat's next message
+        self._in_flight: Set[str] = set()
+        self._sends: Set[asyncio.Task] = set()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+        self.sent = 0
+        self.failed = 0
+        self.throttled = 0
+        self.retries = 0
+        self._lane_waits = {lane: [0, 0.0] for lane in LANES}
+
+    async def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, drain_timeout: float = 5.0):
+        if not self._running:
+            return
+        deadline = time.monotonic() + drain_timeout
+        while self.queued and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        self._running = False
+        self._task.cancel()
+        await asyncio.gather(self._task, *self._sends, return_exceptions=True)
+        self._task = None
+        for heap in self._chats.values():
+            for _, _, message in heap:
+                if not message.future.done():
+                    message.future.set_result(SendResult(False, error="Telegram sender stopped",
+                                                         attempts=message.attempts))
+        self._chats.clear()
+        self._scheduled.clear()
+        self._waiting, self._ready = [], []
+
+    @property
+    def queued(self) -> int:
+        return sum(len(heap) for heap in self._chats.values()) + len(self._in_flight)
+
+    async def send(self, chat_id, payload: dict, priority: int = INTERACTIVE,
+                   method: str = "sendMessage") -> SendResult:
+        """Queue one Bot API call for `chat_id` and wait for its outcome."""
+        if not self._running:
+            await self.start()
+        chat_id = str(chat_id)
+        future = asyncio.get_running_loop().create_future()
+        message = _Outgoing(chat_id, method, {**payload, "chat_id": chat_id}, priority, next(self._seq), future)
+        heap = self._chats.setdefault(chat_id, [])
+        heapq.heappush(heap, (priority, message.seq, message))
+        # Reschedule when the chat is idle or this message jumps ahead of its queue
+        if chat_id not in self._in_flight and (chat_id not in self._scheduled or heap[0][2] is message):
+            self._schedule(chat_id)
+        return await future
+
+    def _schedule(self, chat_id: str):
+        generation = next(self._seq)
+        self._scheduled[chat_id] = generation
+        ready_at = time.monotonic() + self.chat_buckets.get(chat_id).delay()
+        heapq.heappush(self._waiting, (ready_at, generation, chat_id))
+        self._wake.set()
+
+    async def _sleep(self, seconds: Optional[float]):
+        self._wake.clear()
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        while self._running:
+            now = time.monotonic()
+            while self._waiting and self._waiting[0][0] <= now:
+                _, generation, chat_id = heapq.heappop(self._waiting)
+                if self._scheduled.get(chat_id) == generation:
+                    priority, seq, _ = self._chats[chat_id][0]
+                    heapq.heappush(self._ready, (priority, seq, generation, chat_id))
+            while self._ready and self._scheduled.get(self._ready[0][3]) != self._ready[0][2]:
+                heapq.heappop(self._ready)
+
+            if not self._ready:
+                await self._sleep(self._waiting[0][0] - now if self._waiting else None)
+                continue
+            wait = self.global_bucket.delay()
+            if wait > 0:
+                # Look again afterwards: a more urgent message may have arrived
+                await asyncio.sleep(wait)
+                continue
+
+            _, _, _, chat_id = heapq.heappop(self._ready)
+            del self._scheduled[chat_id]
+            _, _, message = heapq.heappop(self._chats[chat_id])
+            self.global_bucket.try_acquire()
+            self.chat_buckets.get(chat_id).try_acquire()
+            self._in_flight.add(chat_id)
+            task = asyncio.create_task(self._send(message))
+            self._sends.add(task)
+            task.add_done_callback(self._sends.discard)
+
+    async def _send(self, message: _Outgoing):
+        chat_id = message.chat_id
+        if message.attempts == 0:
+            lane = self._lane_waits[message.priority]
+            lane[0] += 1
+            lane[1] += time.monotonic() - message.queued_at
+        message.attempts += 1
+        result, error, retry_after = None, None, None
+        try:
+            response = await http_clients.get(TELEGRAM).post(
+                f"{self.base_url}/{message.method}", json=message.payload
+            )
+            if response.status_code == 200:
+                result = SendResult(True, response.json().get("result"), attempts=message.attempts)
+            else:
+                error = f"HTTP {response.status_code}: {response.text[:500]}"
+                if response.status_code == 429:
+                    self.throttled += 1
+                    retry_after = self._retry_after(response)
+                    self.chat_buckets.get(chat_id).penalize(retry_after)
+                elif response.status_code >= 500:
+                    retry_after = retry_delay(message.attempts)
+                else:
+                    # 400/403: bad request, chat not found or bot blocked; retrying won't help
+                    result = SendResult(False, error=error, attempts=message.attempts)
+        except (httpx.HTTPError, ValueError) as e:
+            error = f"{type(e).__name__}: {e}"
+            retry_after = retry_delay(message.attempts)
+        except asyncio.CancelledError:
+            result = SendResult(False, error="Telegram sender stopped", attempts=message.attempts)
+            raise
+        finally:
+            if result is None and (message.attempts >= self.max_attempts or not self._running):
+                result = SendResult(False, error=error, attempts=message.attempts)
+            if result is not None:
+                if result.ok:
+                    self.sent += 1
+                else:
+                    self.failed += 1
+                    logger.error(f"Telegram {message.method} to {chat_id} failed: {result.error}")
+                if not message.future.done():
+                    message.future.set_result(result)
+            else:
+                self.retries += 1
+                if retry_after and self.chat_buckets.get(chat_id).delay() < retry_after:
+                    self.chat_buckets.get(chat_id).penalize(retry_after)
+                # Back at the head of the chat's queue
+                heapq.heappush(self._chats[chat_id], (message.priority, message.seq, message))
+            self._in_flight.discard(chat_id)
+            if self._chats.get(chat_id):
+                if self._running:
+                    self._schedule(chat_id)
+            else:
+                self._chats.pop(chat_id, None)
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> float:
+        try:
+            return float(response.json().get("parameters", {}).get("retry_after", 1))
+        except (ValueError, AttributeError):
+            return float(response.headers.get("Retry-After", 1))
+
+    def stats(self) -> dict:
+        queued = {name: 0 for name in LANES.values()}
+        for heap in self._chats.values():
+            for priority, _, _ in heap:
+                queued[LANES[priority]] += 1
+        return {
+            "running": self._running,
+            "queued": queued,
+            "in_flight": len(self._in_flight),
+            "chats": len(self.chat_buckets),
+            "sent": self.sent,
+            "failed": self.failed,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "avg_wait_seconds": {
+                LANES[lane]: round(total / count, 3) if count else None
+                for lane, (count, total) in self._lane_waits.items()
+            },
+            "global_bucket": self.global_bucket.stats(),
+        }
+
+
+telegram_sender = TelegramSender()
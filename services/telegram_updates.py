@@ -0,0 +1,169 @@
+"""Background processing of incoming Telegram updates.
+
+The webhook only validates an update, drops repeats by update_id and hands
+it to the UpdateQueue, so Telegram gets its 200 within milliseconds even
+when a command waits on Gemini (a slow answer makes Telegram redeliver).
+
+Each chat has its own FIFO and at most one of its updates runs at a time,
+so a chat's commands are answered in the order they were sent. Chats with
+pending updates wait in a shared ready queue served by
+TELEGRAM_UPDATE_WORKERS consumers, which caps how many commands run at
+once across all chats. A chat with a backlog goes to the back of the ready
+queue after each update, so one busy chat cannot starve the others.
+
+The queue and the dedupe window are per process; updates still queued
+when the process stops are lost, like the inline handling before it.
+"""
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from services.telegram_commands import handle_update, update_chat_id
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_UPDATE_WORKERS = int(os.getenv("TELEGRAM_UPDATE_WORKERS", "8"))
+TELEGRAM_UPDATE_QUEUE_MAX = int(os.getenv("TELEGRAM_UPDATE_QUEUE_MAX", "1000"))
+TELEGRAM_UPDATE_DEDUPE_SIZE = int(os.getenv("TELEGRAM_UPDATE_DEDUPE_SIZE", "10000"))
+TELEGRAM_UPDATE_DRAIN_TIMEOUT = float(os.getenv("TELEGRAM_UPDATE_DRAIN_TIMEOUT", "10"))
+
+# accept() outcomes
+ACCEPTED = "accepted"
+DUPLICATE = "duplicate"
+FULL = "full"
+
+
+def _percentile(samples, fraction: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[int(fraction * (len(ordered) - 1))], 3)
+
+
+class UpdateQueue:
+    def __init__(self, handler: Callable[[dict], Awaitable] = handle_update,
+                 workers: int = TELEGRAM_UPDATE_WORKERS, max_pending: int = TELEGRAM_UPDATE_QUEUE_MAX,
+                 dedupe_size: int = TELEGRAM_UPDATE_DEDUPE_SIZE, sample_size: int = 500):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.dedupe_size = dedupe_size
+        self._seen: OrderedDict = OrderedDict()
+        # chat key -> pending (update, accepted_at); a key is present while the chat is queued or running
+        self._chats: Dict[object, Deque] = {}
+        self._ready: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._pending = 0
+        self._running = False
+        self._wait_times = deque(maxlen=sample_size)
+        self._handle_times = deque(maxlen=sample_size)
+        self.accepted = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+        self.in_progress = 0
+
+    async def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._ready = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._consume()) for _ in range(self.workers)]
+        logger.info(f"Telegram update queue started with {self.workers} consumers")
+
+    async def stop(self, drain_timeout: float = TELEGRAM_UPDATE_DRAIN_TIMEOUT):
+        if not self._running:
+            return
+        self._running = False
+        # Give queued and running commands a chance to answer before cancelling
+        deadline = time.monotonic() + drain_timeout
+        while (self._pending or self.in_progress) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._pending:
+            logger.warning(f"Dropped {self._pending} queued Telegram update(s) on shutdown")
+
+    def _remember(self, update_id):
+        self._seen[update_id] = None
+        if len(self._seen) > self.dedupe_size:
+            self._seen.popitem(last=False)
+
+    def accept(self, update: dict) -> str:
+        """Queue an update without waiting; returns ACCEPTED, DUPLICATE or FULL."""
+        update_id = update.get("update_id")
+        if update_id is not None and update_id in self._seen:
+            self._seen.move_to_end(update_id)
+            self.duplicates += 1
+            return DUPLICATE
+        if not self._running or self._pending >= self.max_pending:
+            # Not remembered, so Telegram's redelivery is accepted once there is room
+            self.rejected += 1
+            return FULL
+        if update_id is not None:
+            self._remember(update_id)
+
+        chat_id = update_chat_id(update)
+        key = chat_id if chat_id is not None else ("update", update_id)
+        pending = self._chats.get(key)
+        if pending is None:
+            pending = self._chats[key] = deque()
+            self._ready.put_nowait(key)
+        pending.append((update, time.monotonic()))
+        self._pending += 1
+        self.accepted += 1
+        return ACCEPTED
+
+    async def _consume(self):
+        while True:
+            key = await self._ready.get()
+            pending = self._chats[key]
+            update, accepted_at = pending.popleft()
+            self._pending -= 1
+            self.in_progress += 1
+            started = time.monotonic()
+            self._wait_times.append(started - accepted_at)
+            try:
+                await self.handler(update)
+                self.processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Telegram update {update.get('update_id')} failed: {e}")
+            finally:
+                self.in_progress -= 1
+                self._handle_times.append(time.monotonic() - started)
+                if pending:
+                    self._ready.put_nowait(key)
+                else:
+                    del self._chats[key]
+
+    def stats(self) -> dict:
+        return {
+            "running": self._running,
+            "workers": self.workers,
+            "queue_depth": self._pending,
+            "in_progress": self.in_progress,
+            "active_chats": len(self._chats),
+            "accepted": self.accepted,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "processed": self.processed,
+            "failed": self.failed,
+            "wait_seconds": {"p50": _percentile(self._wait_times, 0.5), "p95": _percentile(self._wait_times, 0.95)},
+            "handle_seconds": {"p50": _percentile(self._handle_times, 0.5), "p95": _percentile(self._handle_times, 0.95)},
+        }
+
+
+telegram_updates = UpdateQueue()
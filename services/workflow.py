@@ -0,0 +1,163 @@
+"""Campaign → theme → post operations shared by the HTTP routers and the Telegram bot.
+
+Every function takes the caller's AsyncSession and raises HTTPException
+like the routes did, so the routers just return the result and the bot's
+in-process backend (services/bot_api.py) maps the status code to a reply.
+"""
+import time
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import Campaign, Theme, ThemeStatus, ContentPost
+from schemas import CampaignCreate
+from services.campaign_scheduler import campaign_scheduler
+from services.content_generator import generate_theme_title_and_story
+from services.job_queue import enqueue_job, notify_job_enqueued
+from services.notifications import notify
+from services.pagination import keyset, page, load_fields
+
+CAMPAIGN_SUMMARY_FIELDS = ("title", "is_active", "current_step", "start_date", "last_run_date", "next_run_date")
+THEME_SUMMARY_FIELDS = ("campaign_id", "title", "is_selected", "status", "post_status", "created_at")
+POST_SUMMARY_FIELDS = (
+    "campaign_id", "theme_id", "title", "status", "created_at", "scheduled_date",
+    "posted_at", "image_status", "video_status"
+)
+
+
+async def list_campaigns(db: AsyncSession, names: Optional[List[str]] = None, cursor: str = None,
+                         limit: int = None) -> Tuple[List[Campaign], Optional[str]]:
+    """Newest first; returns (rows, next cursor)."""
+    order = [Campaign.id]
+    stmt = load_fields(keyset(select(Campaign), order, cursor, limit, descending=True), Campaign, names)
+    result = await db.execute(stmt)
+    return page(result.scalars().all(), order, limit)
+
+
+async def get_campaign(db: AsyncSession, campaign_id: int) -> Campaign:
+    campaign = await db.get(Campaign, campaign_id)
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return campaign
+
+
+async def create_campaign(db: AsyncSession, payload: CampaignCreate) -> Campaign:
+    campaign = Campaign(**payload.model_dump())
+    db.add(campaign)
+    await db.commit()
+    await db.refresh(campaign)
+    campaign_scheduler.campaigns_changed()
+    return campaign
+
+
+async def generate_themes(db: AsyncSession, campaign_id: int) -> List[Theme]:
+    """Replace the campaign's themes with freshly generated ones."""
+    start_time = time.time()
+    campaign = await get_campaign(db, campaign_id)
+
+    await db.execute(delete(Theme).where(Theme.campaign_id == campaign_id))
+
+    # Get themes data concurrently
+    themes_data = await generate_theme_title_and_story(
+        campaign.title, campaign.insight, campaign.description, campaign.target_customer,
+        campaign.repeat_every_days, campaign.content_type
+    )
+
+    new_themes = []
+    for theme_data in themes_data:
+        theme = Theme(
+            campaign_id=campaign_id,
+            title=theme_data["title"],
+            story=theme_data["story"],
+            content_plan=theme_data["content_plan"],
+            status=ThemeStatus.pending
+        )
+        db.add(theme)
+        await db.flush()
+        new_themes.append(theme)
+
+    campaign.current_step = 2
+    await db.commit()
+
+    execution_time = time.time() - start_time
+    print(f"⏱️ Theme generation completed in {execution_time:.2f} seconds")
+    return new_themes
+
+
+async def list_themes(db: AsyncSession, campaign_id: int, names: Optional[List[str]] = None,
+                      cursor: str = None, limit: int = None) -> Tuple[List[Theme], Optional[str]]:
+    """Creation order (id); returns (rows, next cursor)."""
+    order = [Theme.id]
+    stmt = select(Theme).where(Theme.campaign_id == campaign_id)
+    stmt = load_fields(keyset(stmt, order, cursor, limit), Theme, names)
+    result = await db.execute(stmt)
+    return page(result.scalars().all(), order, limit)
+
+
+async def get_theme(db: AsyncSession, theme_id: int) -> Theme:
+    theme = await db.get(Theme, theme_id)
+    if not theme:
+        raise HTTPException(status_code=404, detail=f"Theme {theme_id} not found")
+    return theme
+
+
+async def select_theme(db: AsyncSession, theme_id: int) -> Theme:
+    """Select the theme, discard its siblings and queue post generation."""
+    theme = await get_theme(db, theme_id)
+
+    try:
+        await db.execute(
+            update(Theme)
+            .where(Theme.campaign_id == theme.campaign_id, Theme.id != theme.id)
+            .values(is_selected=False, status=ThemeStatus.discarded)
+        )
+
+        theme.is_selected = True
+        theme.status = ThemeStatus.selected
+
+        campaign = await db.get(Campaign, theme.campaign_id)
+        campaign.current_step = 3
+
+        # Queue post generation in the same transaction as the selection
+        await enqueue_job(db, "generate_posts", {"theme_id": theme.id}, commit=False)
+        await db.commit()
+        notify_job_enqueued("generate_posts")
+        return theme
+    except Exception as e:
+        await db.rollback()
+        error_msg = f"An error occurred: {str(e)}"
+        notify(db, f"❌ Failed to select theme: {error_msg}", kind="theme_selection_failed")
+        await db.commit()
+        raise HTTPException(status_code=500, detail=error_msg)
+
+
+async def list_posts(db: AsyncSession, campaign_id: int, names: Optional[List[str]] = None,
+                     cursor: str = None, limit: int = None) -> Tuple[List[ContentPost], Optional[str]]:
+    """Oldest first on (created_at, id); returns (rows, next cursor)."""
+    order = [ContentPost.created_at, ContentPost.id]
+    stmt = select(ContentPost).where(ContentPost.campaign_id == campaign_id)
+    stmt = load_fields(keyset(stmt, order, cursor, limit), ContentPost, names)
+    result = await db.execute(stmt)
+    return page(result.scalars().all(), order, limit)
+
+
+async def get_post(db: AsyncSession, post_id: int) -> ContentPost:
+    post = await db.get(ContentPost, post_id)
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
+    return post
+
+
+async def redo_post(db: AsyncSession, post_id: int) -> ContentPost:
+    post = await get_post(db, post_id)
+    theme = await db.get(Theme, post.theme_id)
+    if not theme:
+        raise HTTPException(status_code=404, detail="Theme not found")
+
+    post.content = f"[REGENERATED] Content based on theme '{theme.title}': {theme.story}"
+    post.status = "scheduled"
+    notify(db, f"🔁 Post {post.id} has been regenerated and rescheduled.", kind="post_redone")
+    await db.commit()
+    return post
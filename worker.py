@@ -0,0 +1,99 @@
+"""Standalone job worker.
+
+Runs queued post, image, video and campaign-meta jobs without loading the
+FastAPI app, so generation can scale separately from the API:
+
+    python -m worker
+    WORKER_JOB_TYPES=generate_images WORKER_CONCURRENCY=6 python -m worker
+
+Set RUN_JOB_WORKER=false on the web process once dedicated workers run.
+With RUN_CAMPAIGN_SCHEDULER=true the campaign scheduler also runs here;
+only the replica holding its advisory lock publishes. With
+TELEGRAM_MODE=polling the worker also answers bot commands via getUpdates,
+so the bot works where Telegram cannot reach a webhook.
+SIGTERM/SIGINT stop claiming new jobs and give running ones
+WORKER_DRAIN_TIMEOUT seconds to finish; anything still running is picked up
+again by another worker once its lease expires.
+"""
+import os
+import signal
+import asyncio
+import logging
+
+from dotenv import load_dotenv
+
+from database.db import async_engine, leader_engine
+from database.migrate import ensure_migrated
+from services.init_gemini import init_vertexai
+from services.gemini_client import gemini_clients
+from services.facebook_publisher import facebook_publisher
+from services.job_worker import JobWorker
+from services.campaign_scheduler import campaign_scheduler
+from services.notifications import notification_dispatcher
+from services.http_clients import http_clients
+from services.executors import executors
+from services.gcs_uploader import gcs_uploader
+from services.telegram_sender import telegram_sender
+from services.telegram_updates import telegram_updates
+from services.telegram_polling import telegram_poller, TELEGRAM_MODE
+import services.job_handlers  # noqa: F401  registers handlers
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("worker")
+
+WORKER_JOB_TYPES = [t.strip() for t in os.getenv("WORKER_JOB_TYPES", "").split(",") if t.strip()]
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "0")) or None
+WORKER_DRAIN_TIMEOUT = float(os.getenv("WORKER_DRAIN_TIMEOUT", "60"))
+RUN_CAMPAIGN_SCHEDULER = os.getenv("RUN_CAMPAIGN_SCHEDULER", "false").lower() == "true"
+
+
+async def main():
+    await ensure_migrated(async_engine)
+    init_vertexai()
+    gemini_clients.start()
+    http_clients.start()
+    worker = JobWorker(job_types=WORKER_JOB_TYPES or None, concurrency=WORKER_CONCURRENCY)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows: fall back to KeyboardInterrupt for Ctrl+C
+            pass
+
+    await worker.start()
+    if RUN_CAMPAIGN_SCHEDULER:
+        await campaign_scheduler.start()
+    await telegram_sender.start()
+    await notification_dispatcher.start()
+    if TELEGRAM_MODE == "polling":
+        await telegram_updates.start()
+        await telegram_poller.start()
+    try:
+        await stop.wait()
+        logger.info("Shutdown requested, draining running jobs")
+    finally:
+        await telegram_poller.stop()
+        await telegram_updates.stop()
+        await campaign_scheduler.stop()
+        await worker.stop(drain_timeout=WORKER_DRAIN_TIMEOUT)
+        await notification_dispatcher.stop()
+        await telegram_sender.stop()
+        await gemini_clients.aclose()
+        await facebook_publisher.aclose()
+        await http_clients.aclose()
+        await executors.shutdown()
+        gcs_uploader.close()
+        await async_engine.dispose()
+        await leader_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())